@@ -1,9 +1,22 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 import os
 from src.llm_client import QwenCoderClient
+from src.usage import UsageTracker, api_usage
+from src.singleflight import SingleFlight, request_key
+from src.project_jobs import JobStore, ProjectJobRunner, TERMINAL_STATUSES
+from src.metrics import REGISTRY, IN_FLIGHT_REQUESTS
+from src.micro_batch import MicroBatcher
+from src.rag_engine import EMBEDDING_MODEL
+from src.admission import (AdmissionController, AdmissionRejected, ClientDisconnected,
+                           admission_key, cancel_on_disconnect)
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -15,7 +28,68 @@ load_dotenv(verbose=True)  # Add verbose flag
 api_key = os.getenv('API_KEY')
 print("API Key loaded:", bool(api_key))  # Print bool instead of actual key
 
-app = FastAPI()
+usage_tracker = UsageTracker()
+# Upstream completions allowed in flight per worker; extra requests wait their turn
+MAX_CONCURRENT_COMPLETIONS = int(os.getenv('MAX_CONCURRENT_COMPLETIONS', '32'))
+PROJECT_LLM_WORKERS = int(os.getenv('PROJECT_LLM_WORKERS', '4'))
+PROJECT_COMPILE_WORKERS = int(os.getenv('PROJECT_COMPILE_WORKERS', '2'))
+# Admission control: requests beyond active + queue are rejected instead of piling up
+ADMISSION_MAX_ACTIVE = int(os.getenv('ADMISSION_MAX_ACTIVE', str(MAX_CONCURRENT_COMPLETIONS * 2)))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '128'))
+ADMISSION_PER_KEY_LIMIT = int(os.getenv('ADMISSION_PER_KEY_LIMIT', '8'))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '10'))
+PROJECT_JOBS_MAX_PENDING = int(os.getenv('PROJECT_JOBS_MAX_PENDING', '100'))
+# Concurrent embedding/retrieval requests are merged into one encode + one index search
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '64'))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', '5'))
+
+def retrieve_many(kb, items):
+    """Batch function for /v1/retrieve: items are (query, top_k) pairs"""
+    matches = kb.retrieve_batch([query for query, _ in items], top_k=max(top_k for _, top_k in items))
+    return [found[:top_k] for found, (_, top_k) in zip(matches, items)]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One client (embedder, knowledge base and index included) for the whole process
+    llm_client = QwenCoderClient(usage_tracker=usage_tracker)
+    llm_client.warm_up()
+    print(f"Using API endpoint: {llm_client.base_url}")
+    app.state.llm_client = llm_client
+    app.state.completion_slots = asyncio.Semaphore(MAX_CONCURRENT_COMPLETIONS)
+    app.state.admission = AdmissionController(
+        max_active=ADMISSION_MAX_ACTIVE,
+        max_queue=ADMISSION_MAX_QUEUE,
+        per_key_limit=ADMISSION_PER_KEY_LIMIT,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT
+    )
+    app.state.embedding_batcher = MicroBatcher(
+        lambda texts: list(llm_client.kb.embed_batch(texts)), 'embeddings',
+        max_batch_size=EMBEDDING_BATCH_MAX_SIZE, max_wait=EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+        executor=llm_client.executor
+    )
+    app.state.retrieval_batcher = MicroBatcher(
+        lambda items: retrieve_many(llm_client.kb, items), 'retrieve',
+        max_batch_size=EMBEDDING_BATCH_MAX_SIZE, max_wait=EMBEDDING_BATCH_MAX_WAIT_MS / 1000,
+        executor=llm_client.executor
+    )
+    # Identical concurrent requests share a single upstream call
+    app.state.singleflight = SingleFlight()
+    # Project generation jobs persist in SQLite and survive restarts
+    app.state.project_jobs = ProjectJobRunner(
+        llm_client,
+        JobStore(Path(os.getenv('PROJECT_JOBS_DB', '.cache/project_jobs.db'))),
+        jobs_dir=Path(os.getenv('PROJECT_JOBS_DIR', 'generated_projects')),
+        llm_workers=PROJECT_LLM_WORKERS,
+        compile_workers=PROJECT_COMPILE_WORKERS
+    )
+    resumed = app.state.project_jobs.resume()
+    if resumed:
+        print(f"Resumed {resumed} unfinished project jobs")
+    yield
+    app.state.project_jobs.shutdown()
+    await llm_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -26,6 +100,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class InFlightMiddleware:
+    """Plain ASGI middleware so request.is_disconnected() still sees the real receive channel"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with IN_FLIGHT_REQUESTS.track():
+            await self.app(scope, receive, send)
+
+app.add_middleware(InFlightMiddleware)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected(request: Request, exc: ClientDisconnected):
+    # Nobody is listening any more; 499 only shows up in access logs
+    request.app.state.admission.stats['disconnected'] += 1
+    return JSONResponse({"detail": "Client closed request"}, status_code=499)
+
 class Message(BaseModel):
     role: str
     content: str
@@ -35,6 +134,22 @@ class ChatCompletionRequest(BaseModel):
     messages: List[Message]
     temperature: Optional[float] = 1.0
     max_tokens: Optional[int] = None
+    user: Optional[str] = None
+    stream: Optional[bool] = False
+
+class ProjectJobRequest(BaseModel):
+    description: str
+    user: Optional[str] = None
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str]]
+    model: Optional[str] = None
+    user: Optional[str] = None
+
+class RetrieveRequest(BaseModel):
+    query: str
+    top_k: int = 3
+    user: Optional[str] = None
 
 class ChatCompletionResponse(BaseModel):
     id: str
@@ -45,17 +160,31 @@ class ChatCompletionResponse(BaseModel):
     usage: dict
 
 @app.post("/v1/chat/completions")
-async def create_chat_completion(request: ChatCompletionRequest):
+async def create_chat_completion(request: ChatCompletionRequest, http_request: Request):
+    if request.stream:
+        return await stream_chat_completion(request, http_request)
     try:
-        # Initialize client for each request
-        llm_client = QwenCoderClient()
-        print("Debug - API Key:", llm_client.api_key)  # Add this line
-        print(f"Using API endpoint: {llm_client.base_url}")  # Add this line
-        response = llm_client.generate(request.messages[-1].content, [])
-        
+        llm_client = http_request.app.state.llm_client
+        slots = http_request.app.state.completion_slots
+
+        async def upstream():
+            async with slots:
+                return await llm_client.agenerate_with_usage(
+                    request.messages[-1].content, [], stage='chat_completion', user=request.user,
+                    temperature=request.temperature, max_tokens=request.max_tokens
+                )
+
+        admission = http_request.app.state.admission
+        async with admission.admit(admission_key(http_request, request.user)):
+            # Coalesced callers keep the upstream call alive; it is cancelled once all have left
+            response, usage = await cancel_on_disconnect(
+                http_request,
+                http_request.app.state.singleflight.do(request_key(request.model_dump()), upstream)
+            )
+
         return ChatCompletionResponse(
             id="chatcmpl-" + os.urandom(4).hex(),
-            created=int(__import__('time').time()),
+            created=int(time.time()),
             model=request.model,
             choices=[{
                 "index": 0,
@@ -65,12 +194,168 @@ async def create_chat_completion(request: ChatCompletionRequest):
                 },
                 "finish_reason": "stop"
             }],
-            usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            usage=api_usage(usage)
         )
+    except (AdmissionRejected, ClientDisconnected):
+        raise
     except Exception as e:
         print(f"Debug - Error details: {str(e)}")  # Add this line
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_chat_completion(request: ChatCompletionRequest, http_request: Request):
+    """Proxy upstream SSE chunks to the caller as ``chat.completion.chunk`` events"""
+    llm_client = http_request.app.state.llm_client
+    slots = http_request.app.state.completion_slots
+    completion_id = "chatcmpl-" + os.urandom(4).hex()
+    created = int(time.time())
+
+    async def upstream_chunks():
+        async with slots:
+            async for chunk in llm_client.astream_with_usage(
+                request.messages[-1].content, [], stage='chat_completion', user=request.user,
+                temperature=request.temperature, max_tokens=request.max_tokens
+            ):
+                yield chunk
+
+    # The admission slot is held until the stream ends or the client disconnects
+    admitted = AsyncExitStack()
+    await admitted.enter_async_context(
+        http_request.app.state.admission.admit(admission_key(http_request, request.user))
+    )
+
+    # Concurrent duplicates subscribe to the same upstream stream
+    chunks = http_request.app.state.singleflight.stream(request_key(request.model_dump()), upstream_chunks)
+    try:
+        # Wait for the first chunk so upstream errors still surface as an HTTP error
+        first_chunk = await cancel_on_disconnect(http_request, chunks.__anext__())
+    except StopAsyncIteration:
+        first_chunk = None
+    except ClientDisconnected:
+        await chunks.aclose()
+        await admitted.aclose()
+        raise
+    except Exception as e:
+        await chunks.aclose()
+        await admitted.aclose()
+        print(f"Debug - Error details: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def event(chunk: dict) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": request.model,
+            "choices": chunk.get("choices", [])
+        }
+        if chunk.get("usage"):
+            body["usage"] = chunk["usage"]
+        return f"data: {json.dumps(body)}\n\n"
+
+    async def events():
+        try:
+            if first_chunk is not None:
+                yield event(first_chunk)
+                async for chunk in chunks:
+                    yield event(chunk)
+            yield "data: [DONE]\n\n"
+        finally:
+            await chunks.aclose()
+            await admitted.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: EmbeddingRequest, http_request: Request):
+    """OpenAI-style embeddings from the knowledge base's sentence embedder"""
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    if not texts:
+        raise HTTPException(status_code=400, detail="input must not be empty")
+    batcher = http_request.app.state.embedding_batcher
+    async with http_request.app.state.admission.admit(admission_key(http_request, request.user)):
+        vectors = await asyncio.gather(*(batcher.submit(text) for text in texts))
+    tokens = sum(len(text.split()) for text in texts)
+    return {
+        "object": "list",
+        "data": [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                 for i, vector in enumerate(vectors)],
+        "model": EMBEDDING_MODEL,
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    }
+
+@app.post("/v1/retrieve")
+async def retrieve(request: RetrieveRequest, http_request: Request):
+    """Most similar knowledge base entries for a query, best first"""
+    if request.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+    batcher = http_request.app.state.retrieval_batcher
+    async with http_request.app.state.admission.admit(admission_key(http_request, request.user)):
+        results = await batcher.submit((request.query, request.top_k))
+    return {"query": request.query, "results": results}
+
+@app.post("/v1/projects", status_code=202)
+async def create_project_job(request: ProjectJobRequest, http_request: Request):
+    """Queue a full generate/parse/save/compile run and return its job id"""
+    project_jobs = http_request.app.state.project_jobs
+    if project_jobs.pending() >= PROJECT_JOBS_MAX_PENDING:
+        raise AdmissionRejected(503, "Too many project jobs in progress", retry_after=30)
+    job_id = project_jobs.submit(request.description, request.user)
+    return {"id": job_id, "status": "queued"}
+
+@app.get("/v1/projects/{job_id}")
+async def get_project_job(job_id: str, http_request: Request):
+    job = http_request.app.state.project_jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/v1/projects/{job_id}/events")
+async def stream_project_job(job_id: str, http_request: Request):
+    """Server-sent events with the job record each time it changes, until it finishes"""
+    store = http_request.app.state.project_jobs.store
+    if store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        last_update = None
+        while True:
+            job = store.get(job_id)
+            if job['updated_at'] != last_update:
+                last_update = job['updated_at']
+                yield f"data: {json.dumps(job, default=str)}\n\n"
+            if job['status'] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/v1/usage")
+async def get_usage():
+    """Token, cost and latency aggregates per user, model and stage"""
+    return usage_tracker.summary()
+
+@app.get("/v1/stats")
+async def get_stats(http_request: Request):
+    """Request coalescing and admission control counters"""
+    singleflight = http_request.app.state.singleflight
+    return {
+        "singleflight": {**singleflight.stats, "in_flight": singleflight.in_flight()},
+        "admission": http_request.app.state.admission.snapshot(),
+        "micro_batching": {
+            "embeddings": http_request.app.state.embedding_batcher.stats,
+            "retrieve": http_request.app.state.retrieval_batcher.stats
+        },
+        "project_jobs": {
+            "pending": http_request.app.state.project_jobs.pending(),
+            "compile": http_request.app.state.project_jobs.compile_executor.stats()
+        }
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus exposition of pipeline latency histograms and counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
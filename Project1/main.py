@@ -2,7 +2,9 @@ from pathlib import Path
 from src.llm_client import QwenCoderClient
 from src.project_generator import ProjectGenerator 
 from src.rust_compiler import RustCompiler
+from src.diagnostics import compact as compact_diagnostics
 from src.rag_engine import RustKnowledgeBase
+from src.metrics import PARSE_SAVE_SECONDS
 from pymongo import MongoClient
 import logging
 from typing import Optional, Dict, List
@@ -80,62 +82,37 @@ class RustAssistant:
             }]
             
             # Generate code with clearer template
-            code_response = self.llm_client.generate(
-                input=f"""
-                Create a complete Rust project for: {description}
-                
-                Use these patterns and best practices:
-                {kb_context}
-                
-                Format the response as:
-                // FILE:Cargo.toml
-                [package]
-                name = "rust_project"
-                version = "0.1.0"
-                edition = "2021"
-                
-                [dependencies]
-                ...
-                
-                // FILE:src/main.rs
-                // Main implementation
-                ...
-                
-                // FILE:src/lib.rs
-                // Library code
-                ...
-                
-                // FILE:README.md
-                # Project Documentation
-                ...
-                """,
-                context=context_list
+            code_response, usage = self.llm_client.generate_with_usage(
+                input=ProjectGenerator.build_project_prompt(description, kb_context),
+                context=context_list,
+                stage='generate_project',
+                user=self.config.username
             )
             
-            # Ensure project directory exists and is clean
-            if self.config.project_dir.exists():
-                import shutil
-                shutil.rmtree(self.config.project_dir)
-            self.config.project_dir.mkdir()
-            (self.config.project_dir / 'src').mkdir()
-            
-            # Parse and save generated files
-            files = self.project_generator.parse_llm_response(code_response)
-            self.project_generator.save_files(files, str(self.config.project_dir))
+            # Parse and save generated files; unchanged files keep their mtimes and
+            # stale ones are removed, so cargo only rebuilds what actually changed
+            with PARSE_SAVE_SECONDS.time():
+                files = self.project_generator.parse_llm_response(code_response)
+                self.project_generator.save_files(files, str(self.config.project_dir))
             
             # Compile and verify
-            success, error = self.compiler.compile_project(str(self.config.project_dir))
+            success, report = self.compiler.verify_project(str(self.config.project_dir))
             
-            # Store interaction
-            self._store_interaction(description, code_response, success, error)
+            # Store interaction with the distinct errors only, not the full compiler output
+            self._store_interaction(
+                description, code_response, success,
+                None if success else self.compiler.fix_context(report, str(self.config.project_dir)),
+                usage, diagnostics=compact_diagnostics(report['diagnostics'])
+            )
             
-            return success, error if not success else "Project generated successfully"
+            return success, report['output'] if not success else "Project generated successfully"
                 
         except Exception as e:
             logger.error(f"Project generation failed: {str(e)}")
             return False, str(e)
 
-    def _store_interaction(self, prompt: str, response: str, success: bool, error: Optional[str]):
+    def _store_interaction(self, prompt: str, response: str, success: bool, error: Optional[str],
+                           usage: Optional[Dict] = None, diagnostics: Optional[List[Dict]] = None):
         """Store interaction data for future improvements"""
         self.db.interactions.insert_one({
             'timestamp': datetime.utcnow(),
@@ -144,7 +121,9 @@ class RustAssistant:
             'response': response,
             'success': success,
             'error': error,
-            'rust_version': self.compiler.get_rust_version()
+            'rust_version': self.compiler.get_rust_version(),
+            'usage': usage,
+            'diagnostics': diagnostics or []
         })
 
 def main():
@@ -0,0 +1,169 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Serves recorded cassettes (or a canned project) with configurable latency
+and error injection so the generation pipelines can be load-tested offline.
+Point clients at it with ``LLM_API_URL=http://localhost:8001/v1/chat/completions``.
+
+Environment:
+    MOCK_LLM_LATENCY      fixed:<s> | uniform:<lo>,<hi> | lognormal:<mu>,<sigma> | exponential:<mean>
+    MOCK_LLM_ERROR_RATE   probability in [0, 1] of returning an error
+    MOCK_LLM_ERROR_CODES  comma separated status codes to pick from (default 429,500,503)
+    MOCK_LLM_CASSETTE_DIR directory of recordings made with LLM_CASSETTE_MODE=record
+    MOCK_LLM_SEED         seed for the latency/error random generator
+    MOCK_LLM_CHUNK_DELAY  seconds between streamed chunks (stream=true requests)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from src.llm_cassette import LLMCassette
+
+CANNED_PROJECT = """[FILE: Cargo.toml]
+[package]
+name = "mock_project"
+version = "0.1.0"
+edition = "2021"
+
+[dependencies]
+[END FILE]
+
+[FILE: src/main.rs]
+fn main() {
+    println!("Hello from the mock LLM server");
+}
+[END FILE]
+
+[FILE: README.md]
+# mock_project
+Generated by mock_llm_server.py
+[END FILE]
+"""
+
+
+def parse_latency_spec(spec: str) -> Callable[[random.Random], float]:
+    """Turn a latency spec such as ``lognormal:0.5,0.4`` into a sampler"""
+    kind, _, args = spec.partition(':')
+    params = [float(p) for p in args.split(',') if p]
+    if kind == 'fixed':
+        return lambda rng: params[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(params[0], params[1])
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1.0 / params[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockLLMConfig:
+    def __init__(self):
+        self.sample_latency = parse_latency_spec(os.getenv('MOCK_LLM_LATENCY', 'fixed:0'))
+        self.error_rate = float(os.getenv('MOCK_LLM_ERROR_RATE', '0'))
+        self.error_codes = [int(c) for c in os.getenv('MOCK_LLM_ERROR_CODES', '429,500,503').split(',')]
+        cassette_dir = os.getenv('MOCK_LLM_CASSETTE_DIR')
+        self.cassette = LLMCassette('replay', Path(cassette_dir)) if cassette_dir else None
+        self.rng = random.Random(os.getenv('MOCK_LLM_SEED'))
+        self.chunk_delay = float(os.getenv('MOCK_LLM_CHUNK_DELAY', '0.01'))
+
+
+config = MockLLMConfig()
+app = FastAPI()
+stats: Dict[str, int] = {'requests': 0, 'errors': 0, 'replayed': 0, 'canned': 0}
+
+
+def _canned_completion(model: str) -> Dict:
+    return {
+        "id": "chatcmpl-mock-" + os.urandom(4).hex(),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": CANNED_PROJECT},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": 0,
+            "completion_tokens": len(CANNED_PROJECT.split()),
+            "total_tokens": len(CANNED_PROJECT.split())
+        }
+    }
+
+
+async def _stream_completion(completion: Dict):
+    """Replay a whole completion as SSE chunks, one line of content per chunk"""
+    content = completion["choices"][0]["message"]["content"]
+    for piece in content.splitlines(keepends=True):
+        chunk = {
+            "id": completion["id"],
+            "object": "chat.completion.chunk",
+            "created": completion["created"],
+            "model": completion["model"],
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(config.chunk_delay)
+    final = {
+        "id": completion["id"],
+        "object": "chat.completion.chunk",
+        "created": completion["created"],
+        "model": completion["model"],
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        "usage": completion.get("usage")
+    }
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+async def _stream_recorded(body: str):
+    for line in body.splitlines():
+        yield line + "\n"
+        if line.startswith("data:"):
+            await asyncio.sleep(config.chunk_delay)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    stats['requests'] += 1
+
+    await asyncio.sleep(max(0.0, config.sample_latency(config.rng)))
+
+    if config.rng.random() < config.error_rate:
+        stats['errors'] += 1
+        status = config.rng.choice(config.error_codes)
+        headers = {'Retry-After': '1'} if status in (429, 503) else {}
+        return JSONResponse({"error": {"message": "injected failure", "code": status}},
+                            status_code=status, headers=headers)
+
+    if config.cassette is not None:
+        interactions = config.cassette.load(LLMCassette.request_key(payload))
+        if interactions:
+            stats['replayed'] += 1
+            recorded = config.cassette.post(str(request.url), json=payload)
+            if payload.get('stream') and recorded.status_code == 200:
+                return StreamingResponse(_stream_recorded(recorded.text), media_type="text/event-stream")
+            return JSONResponse(recorded.json(), status_code=recorded.status_code)
+
+    stats['canned'] += 1
+    completion = _canned_completion(payload.get('model', 'mock'))
+    if payload.get('stream'):
+        return StreamingResponse(_stream_completion(completion), media_type="text/event-stream")
+    return JSONResponse(completion)
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv('MOCK_LLM_PORT', '8001')))
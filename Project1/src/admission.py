@@ -0,0 +1,124 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Dict, Optional
+
+from .metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTIONS
+
+
+class AdmissionRejected(Exception):
+    """Request turned away before any work was started"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    """The caller went away while its request was still being served"""
+
+
+class AdmissionController:
+    """Bounded admission queue with per-key concurrency quotas.
+
+    At most ``max_active`` requests run at once and at most ``max_queue`` wait
+    behind them; anything beyond that is rejected with 503 instead of piling
+    up. A single key may hold at most ``per_key_limit`` active or queued
+    requests (429 otherwise), and a request that waits longer than
+    ``queue_timeout`` seconds gives up with 503.
+    """
+
+    def __init__(self, max_active: int = 64, max_queue: int = 128,
+                 per_key_limit: int = 8, queue_timeout: float = 10.0):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.per_key_limit = per_key_limit
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_active)
+        self._per_key: Dict[str, int] = {}
+        self.active = 0
+        self.queued = 0
+        # Moving average of how long admitted requests hold their slot
+        self._service_time = 1.0
+        self.stats = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_quota': 0,
+                      'rejected_timeout': 0, 'disconnected': 0}
+
+    def retry_after(self) -> int:
+        """Seconds until the queue in front of a new request should have drained"""
+        waves = (self.queued + 1) / self.max_active
+        return max(1, math.ceil(waves * self._service_time))
+
+    def _reject(self, status_code: int, reason: str, detail: str):
+        self.stats[f'rejected_{reason}'] += 1
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        raise AdmissionRejected(status_code, detail, self.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, key: str):
+        if self._per_key.get(key, 0) >= self.per_key_limit:
+            self._reject(429, 'quota', f"Too many concurrent requests for this key (limit {self.per_key_limit})")
+        # queued is counted before the first await, so a burst cannot all slip past this check
+        if self.active + self.queued >= self.max_active + self.max_queue:
+            self._reject(503, 'queue_full', "Server is overloaded, admission queue is full")
+
+        self._per_key[key] = self._per_key.get(key, 0) + 1
+        try:
+            self.queued += 1
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject(503, 'timeout', f"Request waited more than {self.queue_timeout}s for a slot")
+            finally:
+                self.queued -= 1
+                ADMISSION_QUEUE_SECONDS.observe(time.perf_counter() - start)
+
+            self.active += 1
+            self.stats['admitted'] += 1
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.active -= 1
+                self._slots.release()
+                self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - start)
+        finally:
+            self._per_key[key] -= 1
+            if not self._per_key[key]:
+                del self._per_key[key]
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, 'active': self.active, 'queued': self.queued,
+                'keys': len(self._per_key), 'retry_after': self.retry_after()}
+
+
+async def cancel_on_disconnect(request, work: Awaitable, poll_interval: float = 0.25):
+    """Await ``work``, cancelling it as soon as the HTTP client disconnects"""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            # Let the cancellation land before the caller cleans up what the work was using
+            await asyncio.wait({task})
+
+
+def admission_key(request, user: Optional[str] = None) -> str:
+    """Quota key for a request: its API key, else the ``user`` field, else the client address"""
+    auth = request.headers.get('authorization', '')
+    if auth.lower().startswith('bearer '):
+        return 'key:' + auth[7:].strip()
+    if request.headers.get('x-api-key'):
+        return 'key:' + request.headers['x-api-key']
+    if user:
+        return 'user:' + user
+    return 'ip:' + (request.client.host if request.client else 'unknown')
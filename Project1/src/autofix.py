@@ -0,0 +1,187 @@
+import logging
+import re
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from .project_writer import write_project
+
+logger = logging.getLogger(__name__)
+
+# Paths in `use` that never name a dependency
+BUILTIN_CRATES = {'std', 'core', 'alloc', 'proc_macro', 'test', 'crate', 'self', 'super', 'Self'}
+DEPENDENCY_TABLES = ('dependencies', 'dev-dependencies', 'build-dependencies')
+# Requirements for crates generated code uses most; others come from the crate index, or "*"
+KNOWN_CRATES = {
+    'anyhow': '"1"',
+    'thiserror': '"1"',
+    'serde': '{ version = "1", features = ["derive"] }',
+    'serde_json': '"1"',
+    'tokio': '{ version = "1", features = ["full"] }',
+    'futures': '"0.3"',
+    'clap': '{ version = "4", features = ["derive"] }',
+    'rand': '"0.8"',
+    'regex': '"1"',
+    'chrono': '"0.4"',
+    'log': '"0.4"',
+    'env_logger': '"0.11"',
+    'reqwest': '{ version = "0.12", features = ["json"] }',
+    'axum': '"0.7"',
+    'uuid': '{ version = "1", features = ["v4"] }',
+    'once_cell': '"1"',
+    'lazy_static': '"1"',
+    'itertools': '"0.13"',
+}
+USED_CRATE = re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:use\s+(?:::)?|extern\s+crate\s+)([A-Za-z_]\w*)',
+                        re.MULTILINE)
+MOD_DECLARATION = re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?mod\s+([A-Za-z_]\w*)', re.MULTILINE)
+DEPENDENCY_LINE = re.compile(r'^\s*([A-Za-z0-9_-]+)\s*=')
+
+
+def _declared_dependencies(manifest: str) -> set:
+    """Names code can refer to dependencies by, across all dependency tables"""
+    names = set()
+    if tomllib is not None:
+        try:
+            parsed = tomllib.loads(manifest)
+            tables = [parsed.get(table, {}) for table in DEPENDENCY_TABLES]
+            tables += [spec.get(table, {}) for spec in parsed.get('target', {}).values() for table in DEPENDENCY_TABLES]
+            return {name.replace('-', '_') for table in tables for name in table}
+        except tomllib.TOMLDecodeError:
+            pass
+    section = None
+    for line in manifest.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('['):
+            section = stripped.strip('[]').strip()
+        elif section in DEPENDENCY_TABLES:
+            match = DEPENDENCY_LINE.match(stripped)
+            if match:
+                names.add(match.group(1).replace('-', '_'))
+    return names
+
+
+def _package_name(manifest: str) -> str:
+    match = re.search(r'^\s*name\s*=\s*"([^"]+)"', manifest, re.MULTILINE)
+    return match.group(1).replace('-', '_') if match else ''
+
+
+def missing_dependencies(project_dir, index=None) -> Dict[str, str]:
+    """Crates named in ``use``/``extern crate`` that no dependency table declares, with a requirement.
+
+    Crates not in KNOWN_CRATES get the newest version ``index`` (a
+    CrateIndex) knows of, and ``"*"`` failing that. Names are spelled as
+    the index has them, since ``use tokio_util`` means the ``tokio-util``
+    crate.
+    """
+    project_path = Path(project_dir)
+    manifest_path = project_path / 'Cargo.toml'
+    if not manifest_path.is_file():
+        return {}
+    manifest = manifest_path.read_text(encoding='utf-8')
+    sources = [p.read_text(encoding='utf-8', errors='replace') for p in project_path.glob('src/**/*.rs')]
+
+    local = {p.stem for p in project_path.glob('src/**/*.rs')} | {p.name for p in project_path.glob('src/*/')}
+    for source in sources:
+        local.update(MOD_DECLARATION.findall(source))
+    known = BUILTIN_CRATES | local | _declared_dependencies(manifest) | {_package_name(manifest)}
+
+    used = {name for source in sources for name in USED_CRATE.findall(source)}
+    missing = {}
+    # Lower-case only: an upper-case first segment is an enum or type brought in by a glob
+    for name in sorted(used - known):
+        if name.islower():
+            crate = (index and index.name(name)) or name
+            missing[crate] = KNOWN_CRATES.get(name) or (index and index.requirement(name)) or '"*"'
+    return missing
+
+
+def add_dependencies(manifest: str, dependencies: Dict[str, str]) -> str:
+    """Append ``name = requirement`` lines to ``[dependencies]``, creating the table if needed"""
+    lines = manifest.rstrip('\n').splitlines()
+    entries = [f'{name} = {requirement}' for name, requirement in dependencies.items()]
+    section, insert_at = None, None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith('['):
+            section = stripped.strip('[]').strip()
+            if section == 'dependencies':
+                insert_at = i + 1
+        elif section == 'dependencies' and stripped:
+            insert_at = i + 1
+    if insert_at is None:
+        lines += ['', '[dependencies]']
+        insert_at = len(lines)
+    lines[insert_at:insert_at] = entries
+    return '\n'.join(lines) + '\n'
+
+
+def apply_suggestions(project_dir, diagnostics: List[Dict]) -> Dict[str, str]:
+    """New contents of project files after rustc's machine-applicable suggestions, as ``cargo fix`` would"""
+    project_path = Path(project_dir).resolve()
+    by_file: Dict[str, set] = {}
+    for diagnostic in diagnostics:
+        for suggestion in diagnostic.get('suggestions') or []:
+            if suggestion['applicability'] == 'MachineApplicable':
+                by_file.setdefault(suggestion['file'], set()).add(
+                    (suggestion['byte_start'], suggestion['byte_end'], suggestion['replacement']))
+
+    patched = {}
+    for file, edits in by_file.items():
+        path = (project_path / file).resolve()
+        # Diagnostics can point into the registry or the toolchain; only the project is ours to edit
+        if project_path not in path.parents or not path.is_file():
+            continue
+        data = path.read_bytes()
+        limit = len(data)
+        # From the end backwards so earlier offsets stay valid; an edit overlapping a later one is skipped
+        for start, end, replacement in sorted(edits, reverse=True):
+            if end > limit:
+                continue
+            data = data[:start] + replacement.encode('utf-8') + data[end:]
+            limit = start
+        patched[path.relative_to(project_path).as_posix()] = data.decode('utf-8')
+    return patched
+
+
+def autofix(project_dir, diagnostics: List[Dict], index=None) -> List[str]:
+    """Apply the fixes that need no model: rustc suggestions and missing dependencies.
+
+    Returns a description of each fix applied; empty when nothing changed,
+    in which case re-verifying would only repeat the same errors.
+    """
+    applied = []
+    patched = apply_suggestions(project_dir, diagnostics)
+    if patched:
+        changes = write_project(patched, project_dir, remove_stale=False)
+        if changes['written']:
+            applied.append(f"compiler suggestions in {', '.join(changes['written'])}")
+
+    dependencies = missing_dependencies(project_dir, index)
+    if dependencies:
+        manifest_path = Path(project_dir) / 'Cargo.toml'
+        manifest = add_dependencies(manifest_path.read_text(encoding='utf-8'), dependencies)
+        write_project({'Cargo.toml': manifest}, project_dir, remove_stale=False)
+        applied.append(f"missing dependencies {', '.join(dependencies)}")
+
+    if applied:
+        logger.info(f"Autofix applied {'; '.join(applied)}")
+    return applied
+
+
+def format_project(project_dir) -> bool:
+    """Run ``cargo fmt`` in place; returns whether rustfmt could format every file"""
+    try:
+        result = subprocess.run(['cargo', 'fmt', '--all'], cwd=project_dir, capture_output=True,
+                                text=True, timeout=120)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"cargo fmt failed: {e}")
+        return False
+    if result.returncode != 0:
+        logger.warning(f"cargo fmt failed: {result.stderr.strip()}")
+    return result.returncode == 0
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from .vendored_registry import VendoredRegistry, copy_target
+
+logger = logging.getLogger(__name__)
+
+# Manifest tables that decide how dependencies are compiled; [package] and the crate's own code do not
+DEPENDENCY_TABLES = ('dependencies', 'dev-dependencies', 'build-dependencies', 'target',
+                     'features', 'profile', 'patch', 'replace')
+LAST_USED_MARKER = '.last-used'
+
+
+def dependency_fingerprint(manifest_text: str) -> str:
+    """Normalized dependency/profile tables of a Cargo.toml, or the raw text if it does not parse"""
+    if tomllib is not None:
+        try:
+            manifest = tomllib.loads(manifest_text)
+            return json.dumps({table: manifest.get(table) for table in DEPENDENCY_TABLES}, sort_keys=True)
+        except tomllib.TOMLDecodeError:
+            pass
+    return manifest_text
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class BuildCache:
+    """Shared cargo target directories for generated projects.
+
+    Projects whose dependency tables match (same crates, versions, features
+    and profiles) on the same toolchain build into one target directory, so
+    tokio, serde and friends are compiled once per machine rather than once
+    per project. sccache is used as ``RUSTC_WRAPPER`` when it is installed,
+    which also shares crate outputs across different dependency sets. The
+    least recently used directories are evicted once the cache outgrows
+    ``max_bytes``, on a background thread at most every ``evict_interval``
+    seconds so builds never wait on the size scan. With a ``vendor``
+    registry, projects it covers resolve crates from it offline and their
+    new target directories start from its warm cache.
+    """
+
+    def __init__(self, root: Path = Path('.cache/cargo-target'), max_bytes: int = 10 * 1024 ** 3,
+                 use_sccache: bool = True, min_idle: float = 60.0, evict_interval: float = 300.0,
+                 vendor: Optional[VendoredRegistry] = None):
+        self.root = root
+        self.vendor = vendor
+        self.max_bytes = max_bytes
+        self.min_idle = min_idle
+        self.evict_interval = evict_interval
+        self.sccache = shutil.which('sccache') if use_sccache else None
+        self._toolchain: Optional[str] = None
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Entry name -> (last-used time when measured, bytes); only entries used since are walked again
+        self._sizes: Dict[str, Tuple[float, int]] = {}
+        self._evict_lock = threading.Lock()
+        self._last_evict = float('-inf')
+
+    @classmethod
+    def from_env(cls) -> Optional['BuildCache']:
+        """Configure from BUILD_CACHE_* variables; ``BUILD_CACHE=off`` disables sharing"""
+        if os.getenv('BUILD_CACHE', 'on').lower() in ('off', '0', 'false'):
+            return None
+        return cls(
+            root=Path(os.getenv('BUILD_CACHE_DIR', '.cache/cargo-target')),
+            max_bytes=int(float(os.getenv('BUILD_CACHE_MAX_GB', '10')) * 1024 ** 3),
+            use_sccache=os.getenv('BUILD_CACHE_SCCACHE', 'on').lower() not in ('off', '0', 'false'),
+            evict_interval=float(os.getenv('BUILD_CACHE_EVICT_INTERVAL', '300')),
+            vendor=VendoredRegistry.from_env()
+        )
+
+    @property
+    def toolchain(self) -> str:
+        if self._toolchain is None:
+            try:
+                self._toolchain = subprocess.run(['rustc', '-vV'], capture_output=True,
+                                                 text=True, check=True).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                self._toolchain = 'unknown'
+        return self._toolchain
+
+    def cache_key(self, project_dir: Path) -> str:
+        manifest = project_dir / 'Cargo.toml'
+        text = manifest.read_text(encoding='utf-8') if manifest.exists() else ''
+        digest = hashlib.sha256(f"{self.toolchain}\n{dependency_fingerprint(text)}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def target_dir(self, project_dir: Path, lane: int = 0) -> Path:
+        key = self.cache_key(Path(project_dir))
+        return self.root / (f"{key}.{lane}" if lane else key)
+
+    @contextmanager
+    def cargo_env(self, project_dir, lane: int = 0) -> Iterator[Dict[str, str]]:
+        """Environment for cargo commands run in ``project_dir``; old entries are evicted afterwards.
+
+        Cargo locks a target directory for the whole of a build, so builds
+        that must run side by side with the same dependencies (parallel
+        candidates, say) each use their own ``lane``. A new lane starts as a
+        copy of lane 0, so its first build does not compile every dependency
+        again; units lane 0 is still building when copied are just rebuilt.
+        """
+        target_dir = self.target_dir(Path(project_dir), lane)
+        if self.configure(project_dir):
+            self.vendor.seed_target(target_dir)
+        if lane and copy_target(self.target_dir(Path(project_dir)), target_dir):
+            logger.info(f"Seeded lane {lane} target dir {target_dir.name} from lane 0")
+        target_dir.mkdir(parents=True, exist_ok=True)
+        (target_dir / LAST_USED_MARKER).touch()
+        key = target_dir.name
+
+        env = dict(os.environ, CARGO_TARGET_DIR=str(target_dir.resolve()))
+        if self.sccache and 'RUSTC_WRAPPER' not in os.environ:
+            env['RUSTC_WRAPPER'] = self.sccache
+
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            yield env
+        finally:
+            (target_dir / LAST_USED_MARKER).touch()
+            with self._lock:
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+            self.schedule_evict()
+
+    def configure(self, project_dir) -> bool:
+        """Point the project at the vendored registry if it covers it; returns whether it does.
+
+        :meth:`cargo_env` does this too. Callers that hash the project tree
+        first (the compile cache) do it beforehand, so the hash sees the
+        cargo config the build will run with.
+        """
+        return self.vendor is not None and self.vendor.configure(project_dir)
+
+    def schedule_evict(self) -> bool:
+        """Start :meth:`evict` on a background thread unless it ran within ``evict_interval`` seconds"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_evict < self.evict_interval:
+                return False
+            self._last_evict = now
+        threading.Thread(target=self._evict_in_background, name='build-cache-evict', daemon=True).start()
+        return True
+
+    def _evict_in_background(self):
+        try:
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Build cache eviction failed: {e}")
+
+    def _entry_size(self, path: Path, last_used: float) -> int:
+        cached = self._sizes.get(path.name)
+        if cached is not None and cached[0] == last_used:
+            return cached[1]
+        size = _dir_size(path)
+        self._sizes[path.name] = (last_used, size)
+        return size
+
+    def evict(self) -> List[str]:
+        """Remove least recently used target directories until the cache fits in ``max_bytes``.
+
+        Sizes are remembered per entry and only measured again for entries
+        used since, so a pass over an unchanged cache does not walk it.
+        """
+        if not self.root.exists():
+            return []
+        with self._evict_lock:
+            entries = []
+            for path in self.root.iterdir():
+                if not path.is_dir():
+                    continue
+                marker = path / LAST_USED_MARKER
+                last_used = marker.stat().st_mtime if marker.exists() else 0.0
+                entries.append((last_used, path, self._entry_size(path, last_used)))
+            present = {path.name for _, path, _ in entries}
+            for name in set(self._sizes) - present:
+                del self._sizes[name]
+
+            total = sum(size for _, _, size in entries)
+            evicted = []
+            now = time.time()
+            for last_used, path, size in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                with self._lock:
+                    busy = path.name in self._in_use
+                # Another process may be building in a directory we are not tracking
+                if busy or now - last_used < self.min_idle:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                self._sizes.pop(path.name, None)
+                total -= size
+                evicted.append(path.name)
+                logger.info(f"Evicted build cache entry {path.name} ({size / 1024 ** 2:.0f} MiB)")
+            return evicted
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+# Everything cargo reads when checking, building or testing a generated project; the lock file
+# and cargo config decide which crate versions, and from which registry, get compiled
+TREE_FILES = ('Cargo.toml', 'Cargo.lock', 'build.rs', '.cargo/config.toml', '.cargo/config')
+TREE_DIRS = ('src', 'tests', 'benches', 'examples')
+
+
+def tree_hash(project_dir: Path, toolchain: str, levels: Sequence[str]) -> str:
+    """Hash of the normalized source tree, the toolchain and the verification levels run"""
+    project_dir = Path(project_dir)
+    files = [project_dir / name for name in TREE_FILES if (project_dir / name).is_file()]
+    for name in TREE_DIRS:
+        if (project_dir / name).is_dir():
+            files.extend(path for path in (project_dir / name).rglob('*') if path.is_file())
+
+    digest = hashlib.sha256()
+    digest.update(f"{toolchain}\n{','.join(levels)}\n".encode('utf-8'))
+    for path in sorted(files, key=lambda p: p.relative_to(project_dir).as_posix()):
+        # Line endings and trailing blank lines do not change what rustc sees
+        content = path.read_bytes().replace(b'\r\n', b'\n').rstrip(b'\n')
+        digest.update(path.relative_to(project_dir).as_posix().encode('utf-8') + b'\0')
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """Persistent, size-bounded memo of verification verdicts keyed on tree_hash.
+
+    Identical trees (retries and regenerations often reproduce a project
+    byte for byte) get their verdict and diagnostics back without running
+    cargo. Entries beyond ``max_entries`` are evicted least recently used
+    first.
+    """
+
+    def __init__(self, db_path: Path = Path('.cache/compile_results.db'), max_entries: int = 5000):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS compile_results (
+                    key TEXT PRIMARY KEY,
+                    success INTEGER NOT NULL,
+                    report TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+    @classmethod
+    def from_env(cls) -> Optional['CompileCache']:
+        """Configure from COMPILE_CACHE_* variables; ``COMPILE_CACHE=off`` disables memoization"""
+        if os.getenv('COMPILE_CACHE', 'on').lower() in ('off', '0', 'false'):
+            return None
+        return cls(
+            db_path=Path(os.getenv('COMPILE_CACHE_DB', '.cache/compile_results.db')),
+            max_entries=int(os.getenv('COMPILE_CACHE_MAX_ENTRIES', '5000'))
+        )
+
+    def get(self, key: str) -> Optional[Tuple[bool, Dict]]:
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT success, report FROM compile_results WHERE key = ?",
+                                    (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self.conn.execute("UPDATE compile_results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.stats['hits'] += 1
+        return bool(row[0]), json.loads(row[1])
+
+    def put(self, key: str, success: bool, report: Dict):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO compile_results (key, success, report, last_used) VALUES (?, ?, ?, ?)",
+                (key, int(success), json.dumps(report, default=str), time.time())
+            )
+            self.conn.execute(
+                "DELETE FROM compile_results WHERE key IN ("
+                "SELECT key FROM compile_results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
@@ -0,0 +1,147 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+from .metrics import COMPILE_QUEUE_SECONDS, COMPILES_RUNNING
+from .rust_compiler import DEFAULT_VERIFY_LEVELS, RustCompiler, new_report
+from .sandbox import arun_sandboxed
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBudget:
+    """Jobserver-style pool of CPU tokens shared by every build of the executor"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.available = total
+        self._changed = asyncio.Condition()
+
+    async def acquire(self, tokens: int):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.available >= tokens)
+            self.available -= tokens
+
+    async def release(self, tokens: int):
+        async with self._changed:
+            self.available += tokens
+            self._changed.notify_all()
+
+
+class CompileExecutor:
+    """Runs project verifications concurrently as async cargo subprocesses.
+
+    Each build takes ``jobs_per_build`` tokens from a budget of
+    ``total_jobs`` (the CPU count by default) and is started with that
+    ``-j``, so concurrent builds never ask for more parallel rustc than the
+    machine has cores. Builds that cannot get their tokens wait in FIFO
+    order; reports separate that ``queue_wait`` from ``build_time``.
+
+    The executor owns an event loop on a background thread, so it can be
+    used from worker threads via :meth:`submit` as well as from async code
+    via :meth:`verify`.
+    """
+
+    def __init__(self, compiler: Optional[RustCompiler] = None, max_concurrent: int = 2,
+                 total_jobs: Optional[int] = None):
+        self.compiler = compiler or RustCompiler()
+        self.total_jobs = total_jobs or os.cpu_count() or 1
+        self.max_concurrent = max(1, min(max_concurrent, self.total_jobs))
+        self.jobs_per_build = max(1, self.total_jobs // self.max_concurrent)
+        self.loop = asyncio.new_event_loop()
+        self.budget: Optional[TokenBudget] = None
+        self.queued = 0
+        self.running = 0
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name='compile-executor', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        # Created on the executor's own loop so its Condition binds there
+        self.budget = TokenBudget(self.total_jobs)
+        self._ready.set()
+        self.loop.run_forever()
+
+    def submit(self, project_path: str, levels: Sequence[str] = None) -> concurrent.futures.Future:
+        """Queue a verification from any thread; the future resolves to ``(success, report)``"""
+        return asyncio.run_coroutine_threadsafe(self._verify(project_path, levels), self.loop)
+
+    async def verify(self, project_path: str, levels: Sequence[str] = None) -> tuple[bool, Dict]:
+        """Awaitable form of :meth:`submit` for callers on another event loop"""
+        return await asyncio.wrap_future(self.submit(project_path, levels))
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self.queued,
+            'running': self.running,
+            'total_jobs': self.total_jobs,
+            'jobs_per_build': self.jobs_per_build,
+            'tokens_available': self.budget.available if self.budget else None,
+        }
+
+    def shutdown(self):
+        for task in asyncio.all_tasks(self.loop):
+            self.loop.call_soon_threadsafe(task.cancel)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _verify(self, project_path: str, levels: Sequence[str] = None) -> tuple[bool, Dict]:
+        levels = levels or DEFAULT_VERIFY_LEVELS
+        report = new_report()
+        project_dir = Path(project_path)
+        if not (project_dir / 'Cargo.toml').exists():
+            report['output'] = "Cargo.toml not found"
+            return False, report
+
+        # Identical trees are answered from the memo without taking CPU tokens. Hashing the tree,
+        # SQLite and preparing the shared target dir all block, so they run off the event loop
+        key, cached = await self.loop.run_in_executor(None, self.compiler.lookup, project_dir, levels)
+        if cached is not None:
+            return cached
+
+        self.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await self.budget.acquire(self.jobs_per_build)
+        finally:
+            self.queued -= 1
+        report['queue_wait'] = time.perf_counter() - queued_at
+        COMPILE_QUEUE_SECONDS.observe(report['queue_wait'])
+
+        self.running += 1
+        started_at = time.perf_counter()
+        try:
+            with COMPILES_RUNNING.track():
+                cargo_env = self.compiler.cargo_env(project_dir)
+                env = await self.loop.run_in_executor(None, cargo_env.__enter__)
+                success = True
+                try:
+                    for level in levels:
+                        if not await self._run_level(report, project_dir, level, env):
+                            success = False
+                            break
+                finally:
+                    await self.loop.run_in_executor(None, cargo_env.__exit__, None, None, None)
+            if success:
+                self.compiler.record_success()
+            await self.loop.run_in_executor(None, self.compiler.remember, key, success, report)
+            return success, report
+        except Exception as e:
+            report['output'] = f"Unexpected error: {e}"
+            report['status'] = 'error'
+            return False, report
+        finally:
+            report['build_time'] = time.perf_counter() - started_at
+            self.running -= 1
+            await self.budget.release(self.jobs_per_build)
+
+    async def _run_level(self, report: Dict, project_dir: Path, level: str, env) -> bool:
+        result = await arun_sandboxed(self.compiler.command(level, jobs=self.jobs_per_build),
+                                      str(project_dir), env, self.compiler.limits)
+        return self.compiler.record_level(report, level, result)
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODES = ('off', 'record', 'replay')
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when no recording matches a request"""
+
+
+class CassetteResponse:
+    """Minimal stand-in for requests.Response built from a recording"""
+
+    def __init__(self, status_code: int, text: str, elapsed: float = 0.0):
+        self.status_code = status_code
+        self.text = text
+        self.elapsed_seconds = elapsed
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class LLMCassette:
+    """Record/replay layer for chat completion traffic.
+
+    In ``record`` mode every request is forwarded upstream and the
+    request/response pair is appended to ``<cassette_dir>/<key>.json``.
+    In ``replay`` mode the recorded responses are served back in the order
+    they were recorded, without touching the network. ``off`` is a plain
+    passthrough to a pooled ``requests.Session``.
+    """
+
+    def __init__(self, mode: str = 'off', cassette_dir: Path = Path('.cassettes'),
+                 replay_latency: bool = False):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.mode = mode
+        self.cassette_dir = Path(cassette_dir)
+        self.replay_latency = replay_latency
+        self._replay_positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Keep-alive connection pool, so long-lived clients skip the TLS handshake
+        self.session = requests.Session()
+        self._async_client = None
+        if self.mode != 'off':
+            self.cassette_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> 'LLMCassette':
+        """Build a cassette from LLM_CASSETTE_* environment variables"""
+        return cls(
+            mode=os.getenv('LLM_CASSETTE_MODE', 'off').lower(),
+            cassette_dir=Path(os.getenv('LLM_CASSETTE_DIR', '.cassettes')),
+            replay_latency=os.getenv('LLM_CASSETTE_REPLAY_LATENCY', '0') == '1'
+        )
+
+    @staticmethod
+    def request_key(payload: Dict) -> str:
+        """Stable hash of a request payload, independent of key order"""
+        normalized = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]
+
+    def _path_for(self, key: str) -> Path:
+        return self.cassette_dir / f"{key}.json"
+
+    def load(self, key: str) -> List[Dict]:
+        """Return the recorded interactions for a key, oldest first"""
+        path = self._path_for(key)
+        if not path.exists():
+            return []
+        return json.loads(path.read_text(encoding='utf-8'))['interactions']
+
+    def post(self, url: str, headers: Optional[Dict] = None, json: Optional[Dict] = None,
+             timeout: Optional[float] = None):
+        """Drop-in replacement for ``requests.post(url, headers=..., json=...)``"""
+        if self.mode == 'replay':
+            return self._replay(json)
+
+        start = time.perf_counter()
+        response = self.session.post(url, headers=headers, json=json, timeout=timeout)
+        elapsed = time.perf_counter() - start
+
+        if self.mode == 'record':
+            self._record(json, response.status_code, response.text, elapsed)
+        return response
+
+    async def apost(self, url: str, headers: Optional[Dict] = None, json: Optional[Dict] = None,
+                    timeout: Optional[float] = None):
+        """Awaitable ``post`` backed by a pooled httpx.AsyncClient"""
+        if self.mode == 'replay':
+            response = self._replay(json, sleep=False)
+            if self.replay_latency:
+                await asyncio.sleep(response.elapsed_seconds)
+            return response
+
+        start = time.perf_counter()
+        response = await self.async_client.post(url, headers=headers, json=json, timeout=timeout)
+        elapsed = time.perf_counter() - start
+
+        if self.mode == 'record':
+            self._record(json, response.status_code, response.text, elapsed)
+        return response
+
+    async def astream(self, url: str, headers: Optional[Dict] = None, json: Optional[Dict] = None,
+                      timeout: Optional[float] = None):
+        """Stream a ``stream: true`` chat completion, yielding each decoded SSE chunk"""
+        if self.mode == 'replay':
+            interaction = self._next_interaction(json)
+            if interaction['status_code'] != 200:
+                raise Exception(f"API Error: {interaction['status_code']}, {interaction['body']}")
+            chunks = [c for c in map(parse_sse_line, interaction['body'].splitlines()) if c is not None]
+            for chunk in chunks:
+                if self.replay_latency:
+                    await asyncio.sleep(interaction.get('elapsed', 0.0) / len(chunks))
+                yield chunk
+            return
+
+        lines = []
+        start = time.perf_counter()
+        async with self.async_client.stream('POST', url, headers=headers, json=json,
+                                            timeout=timeout) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode('utf-8', errors='replace')
+                if self.mode == 'record':
+                    self._record(json, response.status_code, body, time.perf_counter() - start)
+                raise Exception(f"API Error: {response.status_code}, {body}")
+            async for line in response.aiter_lines():
+                lines.append(line)
+                chunk = parse_sse_line(line)
+                if chunk is not None:
+                    yield chunk
+
+        if self.mode == 'record':
+            self._record(json, 200, '\n'.join(lines), time.perf_counter() - start)
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            # Only the async path needs httpx
+            import httpx
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', '100')))
+            )
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def _record(self, payload: Dict, status_code: int, text: str, elapsed: float):
+        key = self.request_key(payload)
+        with self._lock:
+            interactions = self.load(key)
+            interactions.append({
+                'recorded_at': datetime.utcnow().isoformat(),
+                'status_code': status_code,
+                'body': text,
+                'elapsed': elapsed
+            })
+            data = {'request': payload, 'interactions': interactions}
+            tmp_path = self._path_for(key).with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, self._path_for(key))
+        logger.info(f"Recorded cassette {key} ({len(interactions)} interactions)")
+
+    def _next_interaction(self, payload: Dict) -> Dict:
+        key = self.request_key(payload)
+        interactions = self.load(key)
+        if not interactions:
+            raise CassetteMiss(f"No recording for request {key} in {self.cassette_dir}")
+
+        with self._lock:
+            position = self._replay_positions.get(key, 0)
+            self._replay_positions[key] = position + 1
+        # Once the recording is exhausted keep serving the last interaction
+        return interactions[min(position, len(interactions) - 1)]
+
+    def _replay(self, payload: Dict, sleep: bool = True) -> CassetteResponse:
+        interaction = self._next_interaction(payload)
+        if self.replay_latency and sleep:
+            time.sleep(interaction.get('elapsed', 0.0))
+        return CassetteResponse(interaction['status_code'], interaction['body'],
+                                interaction.get('elapsed', 0.0))
+
+
+def parse_sse_line(line: str) -> Optional[Dict]:
+    """Decode one ``data:`` line of an OpenAI-style event stream.
+
+    Returns None for keep-alive comments, blank lines and the ``[DONE]`` marker.
+    """
+    if not line.startswith('data:'):
+        return None
+    data = line[len('data:'):].strip()
+    if not data or data == '[DONE]':
+        return None
+    return json.loads(data)
@@ -1,17 +1,30 @@
-import requests
-from typing import Dict
-import json 
+from typing import Dict, Optional, Tuple
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from src.project_generator import ProjectGenerator
 from .rag_engine import RustKnowledgeBase
+from .llm_cassette import LLMCassette
+from .usage import UsageTracker, extract_usage
+from .metrics import IN_FLIGHT_LLM_CALLS, LLM_REQUEST_SECONDS, LLM_TTFT_SECONDS
 load_dotenv()
 import os
 class QwenCoderClient:
-    def __init__(self, model_config: Dict = None):
-        self.base_url = "https://openrouter.ai/api/v1/chat/completions"
+    def __init__(self, model_config: Dict = None, usage_tracker: UsageTracker = None):
+        self.base_url = os.getenv('LLM_API_URL', "https://openrouter.ai/api/v1/chat/completions")
         self.model = "deepseek/deepseek-r1-distill-llama-70b"
         self.api_key = os.getenv('API_KEY')
         self.kb = RustKnowledgeBase()
+        # Record/replay layer, passthrough unless LLM_CASSETTE_MODE is set
+        self.http = LLMCassette.from_env()
+        self.usage_tracker = usage_tracker or UsageTracker()
+        self.timeout = float(os.getenv('LLM_TIMEOUT', '300'))
+        # Bounded pool for CPU-bound embedding work issued from async callers
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('EMBEDDING_WORKERS', '2')),
+            thread_name_prefix='embedding'
+        )
         self.model_config = model_config or {
             'temperature': 0.7,
             'top_p': 0.95,
@@ -45,8 +58,11 @@ class QwenCoderClient:
             # Add more patterns as needed
         ]
         
-        for pattern in rust_patterns:
-            self.kb.add_knowledge(pattern)
+        self.kb.add_knowledge_batch([{'content': pattern} for pattern in rust_patterns])
+
+    def warm_up(self):
+        """Load model weights and exercise the index once, ahead of the first request"""
+        self.kb.warm_up()
 
     def _prepare_headers(self) -> Dict[str, str]:
         headers = {
@@ -59,7 +75,85 @@ class QwenCoderClient:
         return headers
     
  
-    def generate(self,input:str,context:list[dict]) -> str:
+    def generate(self, input: str, context: list[dict], stage: str = 'generate',
+                 user: Optional[str] = None, temperature: Optional[float] = None,
+                 max_tokens: Optional[int] = None) -> str:
+        return self.generate_with_usage(input, context, stage=stage, user=user, temperature=temperature,
+                                        max_tokens=max_tokens)[0]
+
+    def generate_with_usage(self, input: str, context: list[dict], stage: str = 'generate',
+                            user: Optional[str] = None, temperature: Optional[float] = None,
+                            max_tokens: Optional[int] = None) -> Tuple[str, Dict]:
+        """Generate a completion and return it with the call's usage record"""
+        payload = self.build_payload(input, context, temperature, max_tokens)
+        start = time.perf_counter()
+        with IN_FLIGHT_LLM_CALLS.track():
+            response = self.http.post(self.base_url, headers=self._prepare_headers(), json=payload,
+                                      timeout=self.timeout)
+        latency = time.perf_counter() - start
+        return self._handle_response(response, latency, user, stage)
+
+    async def agenerate_with_usage(self, input: str, context: list[dict], stage: str = 'generate',
+                                   user: Optional[str] = None, temperature: Optional[float] = None,
+                                   max_tokens: Optional[int] = None) -> Tuple[str, Dict]:
+        """Non-blocking generate_with_usage for use on an event loop.
+
+        Retrieval (sentence-transformer encoding) runs on the bounded embedding
+        executor and the upstream call is awaited with an async HTTP client.
+        """
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(self.executor, self.build_payload, input, context,
+                                             temperature, max_tokens)
+        start = time.perf_counter()
+        with IN_FLIGHT_LLM_CALLS.track():
+            response = await self.http.apost(self.base_url, headers=self._prepare_headers(), json=payload,
+                                             timeout=self.timeout)
+        latency = time.perf_counter() - start
+        return self._handle_response(response, latency, user, stage)
+
+    async def astream_with_usage(self, input: str, context: list[dict], stage: str = 'generate',
+                                 user: Optional[str] = None, temperature: Optional[float] = None,
+                                 max_tokens: Optional[int] = None):
+        """Stream upstream ``chat.completion.chunk`` dicts for a request.
+
+        Uses the same retrieval augmentation as generate(); the usage record,
+        including time to first token, is stored when the stream finishes.
+        """
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(self.executor, self.build_payload, input, context,
+                                             temperature, max_tokens)
+        payload["stream"] = True
+        start = time.perf_counter()
+        time_to_first_token = None
+        final = {'model': self.model, 'usage': {}}
+        with IN_FLIGHT_LLM_CALLS.track():
+            async for chunk in self.http.astream(self.base_url, headers=self._prepare_headers(), json=payload,
+                                                 timeout=self.timeout):
+                if time_to_first_token is None and any(
+                        choice.get('delta', {}).get('content') for choice in chunk.get('choices', [])):
+                    time_to_first_token = time.perf_counter() - start
+                    LLM_TTFT_SECONDS.observe(time_to_first_token, stage=stage)
+                if chunk.get('usage'):
+                    final = chunk
+                yield chunk
+
+        latency = time.perf_counter() - start
+        LLM_REQUEST_SECONDS.observe(latency, stage=stage)
+        usage = extract_usage(final, self.model, latency, time_to_first_token=time_to_first_token,
+                              user=user, stage=stage)
+        self.usage_tracker.record(usage)
+
+    async def aclose(self):
+        await self.http.aclose()
+        self.executor.shutdown(wait=False)
+
+    def build_payload(self, input: str, context: list[dict], temperature: Optional[float] = None,
+                      max_tokens: Optional[int] = None) -> Dict:
+        """Retrieve knowledge for the request and assemble the chat completion payload.
+
+        ``temperature`` and ``max_tokens`` are sent only when the caller sets
+        them; otherwise the upstream defaults apply.
+        """
         # Retrieve relevant knowledge
         relevant_knowledge = self.kb.retrieve_relevant(input)
         
@@ -72,7 +166,6 @@ class QwenCoderClient:
         Original request: {input}
         """
         
-        endpoint = f"{self.base_url}"
         messages= [
             {"role": "system", "content": """You are an expert Rust developer specializing in project generation and error resolution. 
                         Your task is to create fully functional Rust projects based on user input while strictly following Rust best practices.
@@ -142,23 +235,33 @@ class QwenCoderClient:
         
     
         messages.append({"role": "user", "content": enhanced_prompt})
-        payload = json.dumps({
-    "model": "deepseek/deepseek-r1-distill-llama-70b",
-    "messages": messages
-    
-})
-        
-        
-        response = requests.post(endpoint, headers=self._prepare_headers(), data=payload)
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            # Ask OpenRouter to include token counts and cost in the response
+            "usage": {"include": True}
+        }
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    def _handle_response(self, response, latency: float, user: Optional[str], stage: str) -> Tuple[str, Dict]:
+        LLM_REQUEST_SECONDS.observe(latency, stage=stage)
         if response.status_code == 200:
             response_json = response.json()
-            print('response_json', response_json)
+            usage = extract_usage(response_json, self.model, latency, user=user, stage=stage)
+            self.usage_tracker.record(usage)
+            print(f"Usage - {stage}: {usage['prompt_tokens']} prompt / {usage['completion_tokens']} completion "
+                  f"/ {usage['reasoning_tokens']} reasoning tokens in {latency:.2f}s")
             if "choices" in response_json and len(response_json["choices"]) > 0:
                 response_text = response_json["choices"][0]["message"]["content"]
                 print("Raw response:", response_text)
-                return response_text
+                return response_text, usage
             else:
                 print("Error: No valid response content from the API.")
+                return None, usage
         else:
             print(f"API Error: {response.status_code}, {response.text}")
             # Should raise an exception here
@@ -0,0 +1,159 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: List['_Metric'] = []
+
+    def register(self, metric: '_Metric'):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self._labels(k))} {v}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Increment for the duration of a block"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of a block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, state in self._values.items():
+                labels = self._labels(key)
+                for bound, count in zip(self.buckets, state['counts']):
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {state['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {state['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {state['count']}")
+        return lines
+
+
+# Pipeline metrics shared by the API server, the CLI and the job runner
+RETRIEVAL_SECONDS = Histogram('rust_assistant_retrieval_seconds',
+                              'Knowledge base retrieval latency, query embedding included')
+EMBEDDING_SECONDS = Histogram('rust_assistant_embedding_seconds',
+                              'Time spent in SentenceTransformer.encode', ('operation',))
+LLM_REQUEST_SECONDS = Histogram('rust_assistant_llm_request_seconds',
+                                'Upstream chat completion latency', ('stage',))
+LLM_TTFT_SECONDS = Histogram('rust_assistant_llm_time_to_first_token_seconds',
+                             'Time to first streamed token from upstream', ('stage',))
+PARSE_SAVE_SECONDS = Histogram('rust_assistant_parse_save_seconds',
+                               'Time to parse an LLM response and write the project files')
+CARGO_SECONDS = Histogram('rust_assistant_cargo_seconds', 'Duration of cargo runs by verification level', ('level',))
+CACHE_HITS = Counter('rust_assistant_cache_hits_total', 'Cache hits by cache', ('cache',))
+RETRIES = Counter('rust_assistant_retries_total', 'Repair/regeneration retries by component', ('component',))
+COMPILE_RESULTS = Counter('rust_assistant_compile_results_total', 'Compilation outcomes', ('result',))
+IN_FLIGHT_REQUESTS = Gauge('rust_assistant_in_flight_requests', 'HTTP requests currently being handled')
+IN_FLIGHT_LLM_CALLS = Gauge('rust_assistant_in_flight_llm_calls', 'Upstream LLM calls currently open')
+ADMISSION_QUEUE_SECONDS = Histogram('rust_assistant_admission_queue_seconds',
+                                    'Time requests waited in the admission queue')
+ADMISSION_REJECTIONS = Counter('rust_assistant_admission_rejections_total',
+                               'Requests rejected by admission control', ('reason',))
+MICRO_BATCH_SIZE = Histogram('rust_assistant_micro_batch_size', 'Items per micro-batched call', ('batcher',),
+                             buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+COMPILE_QUEUE_SECONDS = Histogram('rust_assistant_compile_queue_seconds',
+                                  'Time builds waited for CPU tokens in the compile executor')
+COMPILES_RUNNING = Gauge('rust_assistant_compiles_running', 'Builds currently holding CPU tokens')
@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Tuple
+
+from .metrics import MICRO_BATCH_SIZE
+
+
+class MicroBatcher:
+    """Group items submitted concurrently into one call of a batch function.
+
+    The first item of a batch waits at most ``max_wait`` seconds for others
+    to join (or until ``max_batch_size`` items are queued), then the whole
+    batch runs as a single ``batch_fn(items)`` call on ``executor``.
+    ``batch_fn`` must return one result per item, in order.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], name: str,
+                 max_batch_size: int = 64, max_wait: float = 0.005, executor: Optional[Executor] = None):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self._queue: List[Tuple[Any, asyncio.Future]] = []
+        self._full = asyncio.Event()
+        # True while a batch is gathering items; running batches do not block the next one
+        self._collecting = False
+        self._tasks = set()
+        self.stats = {'items': 0, 'batches': 0}
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((item, future))
+        if len(self._queue) >= self.max_batch_size:
+            self._full.set()
+        if not self._collecting:
+            self._start_collecting()
+        return await future
+
+    def _start_collecting(self):
+        self._collecting = True
+        task = asyncio.ensure_future(self._collect())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _collect(self):
+        try:
+            await asyncio.wait_for(self._full.wait(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        batch, self._queue = self._queue[:self.max_batch_size], self._queue[self.max_batch_size:]
+        self._full.clear()
+        self._collecting = False
+        if self._queue:
+            # Whatever did not fit starts the next batch right away
+            if len(self._queue) >= self.max_batch_size:
+                self._full.set()
+            self._start_collecting()
+
+        # Callers that went away while queued do not need to be computed
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        self.stats['items'] += len(batch)
+        self.stats['batches'] += 1
+        MICRO_BATCH_SIZE.observe(len(batch), batcher=self.name)
+
+        items = [item for item, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.batch_fn, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,138 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .response_parser import parse_files
+
+FILE_HEADER = re.compile(r'^\+\+\+ (?:b/)?(\S+)')
+OLD_HEADER = re.compile(r'^--- (?:a/)?(\S+)')
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@')
+
+
+def parse_patches(response: str) -> Dict[str, List[Dict]]:
+    """Unified-diff hunks in an LLM response, grouped by the file they apply to.
+
+    Each hunk is ``{'start': <old line, 1-based>, 'lines': [(op, text), ...]}``
+    with ``op`` one of ``' '``, ``'-'`` and ``'+'``. Fences, prose between
+    diffs and ``diff --git`` / ``index`` lines are ignored.
+    """
+    patches: Dict[str, List[Dict]] = {}
+    current_file: Optional[str] = None
+    hunk: Optional[Dict] = None
+    for line in response.splitlines():
+        if line.startswith('```'):
+            hunk = None
+            continue
+        header = FILE_HEADER.match(line)
+        if header:
+            current_file = header.group(1)
+            patches.setdefault(current_file, [])
+            hunk = None
+            continue
+        if OLD_HEADER.match(line):
+            continue
+        header = HUNK_HEADER.match(line)
+        if header and current_file:
+            hunk = {'start': int(header.group(1)), 'lines': []}
+            patches[current_file].append(hunk)
+            continue
+        if hunk is None:
+            continue
+        if line[:1] in (' ', '-', '+'):
+            hunk['lines'].append((line[0], line[1:]))
+        elif line == '':
+            # Editors and models often strip the single space of blank context lines
+            hunk['lines'].append((' ', ''))
+        elif line.startswith('\\'):
+            continue
+        else:
+            hunk = None
+    return {path: hunks for path, hunks in patches.items() if hunks}
+
+
+def parse_file_blocks(response: str) -> Dict[str, str]:
+    """Whole files given as ``[FILE: path] ... [END FILE]`` blocks, for new or fully rewritten files"""
+    return parse_files(response)
+
+
+def _find(lines: List[str], needle: List[str], hint: int) -> Optional[int]:
+    """Index where ``needle`` occurs in ``lines``, preferring the match closest to ``hint``"""
+    if not needle:
+        return min(max(hint, 0), len(lines))
+    stripped = [line.rstrip() for line in lines]
+    needle = [line.rstrip() for line in needle]
+    matches = [i for i in range(len(lines) - len(needle) + 1) if stripped[i:i + len(needle)] == needle]
+    if not matches:
+        return None
+    return min(matches, key=lambda i: abs(i - hint))
+
+
+def apply_hunks(content: str, hunks: List[Dict]) -> Tuple[str, List[str]]:
+    """Apply hunks to ``content``; returns the new text and a message per hunk that did not apply.
+
+    Hunks are located by their context and removed lines rather than by
+    line number alone, since model-written line numbers are often off.
+    """
+    lines = content.splitlines()
+    failures = []
+    offset = 0
+    for number, hunk in enumerate(hunks, 1):
+        old = [text for op, text in hunk['lines'] if op in (' ', '-')]
+        new = [text for op, text in hunk['lines'] if op in (' ', '+')]
+        # Trailing blank context is usually an artifact of the response format
+        while old and new and old[-1] == '' and new[-1] == '':
+            old.pop()
+            new.pop()
+        position = _find(lines, old, hunk['start'] - 1 + offset)
+        if position is None:
+            failures.append(f"hunk {number} (@@ -{hunk['start']}) does not match the current file")
+            continue
+        lines[position:position + len(old)] = new
+        offset += len(new) - len(old)
+    return '\n'.join(lines) + '\n', failures
+
+
+def _outside(project_path: Path, filepath: str) -> bool:
+    """True when ``filepath`` would resolve to somewhere outside the project, e.g. via ``../``"""
+    root = project_path.resolve()
+    target = (root / filepath.strip()).resolve()
+    return target != root and root not in target.parents
+
+
+def apply_response(response: str, project_dir) -> Tuple[Dict[str, str], List[str]]:
+    """New contents of every file touched by a fix response, plus messages for what failed to apply.
+
+    Unified diffs are applied to the files on disk; ``[FILE: ...]`` blocks
+    replace a file wholesale. Nothing is written here. Paths that escape the
+    project directory are reported as failures rather than raised, so one
+    garbled patch cannot abort a fix round.
+    """
+    project_path = Path(project_dir)
+    files = {}
+    failures = []
+    for filepath, content in parse_file_blocks(response).items():
+        if _outside(project_path, filepath):
+            failures.append(f"{filepath}: path is outside the project directory")
+            continue
+        files[filepath] = content
+    for filepath, hunks in parse_patches(response).items():
+        path = project_path / filepath
+        if filepath in files:
+            continue
+        if _outside(project_path, filepath):
+            failures.append(f"{filepath}: path is outside the project directory")
+            continue
+        if not path.is_file():
+            # A diff against /dev/null creates the file from its added lines
+            if all(op == '+' for hunk in hunks for op, _ in hunk['lines']):
+                files[filepath] = '\n'.join(text for hunk in hunks for _, text in hunk['lines']) + '\n'
+            else:
+                failures.append(f"{filepath}: file does not exist")
+            continue
+        content, hunk_failures = apply_hunks(path.read_text(encoding='utf-8'), hunks)
+        if hunk_failures:
+            # A partly applied patch leaves the file in a state nobody asked for
+            failures.extend(f"{filepath}: {message}" for message in hunk_failures)
+            continue
+        files[filepath] = content
+    return files, failures
@@ -1,24 +1,131 @@
-from  src.project_generator import ProjectGenerator
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.autofix import autofix
+from src.metrics import RETRIES
+from src.patches import apply_response
+from src.project_writer import write_project
+from src.rust_compiler import DEFAULT_VERIFY_LEVELS
+from src import diagnostics as rustc_diagnostics
+
+logger = logging.getLogger(__name__)
+
+FIX_MAX_ITERATIONS = int(os.getenv('FIX_MAX_ITERATIONS', '5'))
+FIX_TIME_BUDGET = float(os.getenv('FIX_TIME_BUDGET', '600'))
+# Rounds in a row without progress before the loop gives up
+FIX_PATIENCE = int(os.getenv('FIX_PATIENCE', '2'))
+# Files shown to the model when the errors do not point at any source file
+ENTRY_FILES = ('Cargo.toml', 'src/main.rs', 'src/lib.rs')
+
+FIX_INSTRUCTIONS = """Reply only with unified diffs against the files above, one per changed file:
+
+```diff
+--- a/src/main.rs
++++ b/src/main.rs
+@@ -12,3 +12,4 @@
+ unchanged line
+-removed line
++added line
+ unchanged line
+```
+
+Keep a few unchanged context lines around every change and do not repeat unchanged files.
+To create a new file, use a [FILE: path] ... [END FILE] block with its full content."""
+
+
 class ProjectFixer:
-    def __init__(self, llm_client, compiler):
+    """Bounded repair loop that asks the LLM for patches against the compiler's errors.
+
+    Each round verifies the project, applies the fixes that need no model,
+    sends the remaining top errors with the affected files, and applies the
+    returned diffs in place. The loop stops when the project verifies, after
+    ``max_iterations`` rounds, when ``time_budget`` seconds have passed, or
+    when ``patience`` rounds in a row did not shrink the set of errors (or
+    get the project past a verification level).
+    """
+
+    def __init__(self, llm_client, compiler, max_iterations: int = FIX_MAX_ITERATIONS,
+                 time_budget: float = FIX_TIME_BUDGET, patience: int = FIX_PATIENCE):
         self.llm_client = llm_client
         self.compiler = compiler
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.patience = patience
 
-    def fix_project(self, project_path: str) -> bool:
-        while True:
-            success, output = self.compiler.compile_project(project_path)
+    def fix_project(self, project_path: str, levels=None, user: Optional[str] = None) -> bool:
+        levels = levels or DEFAULT_VERIFY_LEVELS
+        deadline = time.monotonic() + self.time_budget
+        best = None
+        stalled = 0
+        rejected: List[str] = []
+
+        for iteration in range(self.max_iterations + 1):
+            success, report = self.compiler.verify_project(project_path, levels)
+            # Mechanical fixes (rustc suggestions, missing dependencies) cost a cargo run, not an LLM round
+            if not success and autofix(project_path, report['diagnostics']):
+                success, report = self.compiler.verify_project(project_path, levels)
             if success:
+                logger.info(f"Project verified after {iteration} fix round(s)")
                 return True
 
-            
-            fix_prompt = f"""
-            The Rust project has the following compiler error:
-            {output}
+            score = self._progress(report, levels)
+            if best is None or score > best:
+                best, stalled = score, 0
+            else:
+                stalled += 1
+            if stalled >= self.patience:
+                logger.warning(f"Giving up after {iteration} fix round(s): errors are not shrinking")
+                return False
+            if iteration == self.max_iterations:
+                logger.warning(f"Giving up after {iteration} fix round(s): iteration limit reached")
+                return False
+            if time.monotonic() >= deadline:
+                logger.warning(f"Giving up after {iteration} fix round(s): time budget of "
+                               f"{self.time_budget:.0f}s spent")
+                return False
+
+            RETRIES.inc(component='project_fixer')
+            fix_prompt = self.build_fix_prompt(report, project_path, rejected)
+            response = self.llm_client.generate(fix_prompt, [], stage='fix', user=user)
+            files, rejected = apply_response(response or '', project_path)
+            for message in rejected:
+                logger.warning(f"Patch did not apply: {message}")
+            if files:
+                try:
+                    changes = write_project(files, project_path, remove_stale=False)
+                except ValueError as e:
+                    logger.warning(f"Patch did not apply: {e}")
+                    rejected.append(str(e))
+                    continue
+                logger.info(f"Fix round {iteration + 1}: patched {', '.join(changes['written']) or 'nothing'}")
+        return False
+
+    @staticmethod
+    def _progress(report: Dict, levels) -> tuple:
+        """Orders failed reports: a later verification level, then fewer distinct errors, is better"""
+        level = list(levels).index(report['level']) if report['level'] in levels else -1
+        error_count = len({(d['code'], d['message'], d['file'], d['line'])
+                           for d in rustc_diagnostics.errors(report['diagnostics'])})
+        return level, -error_count
 
-            Please provide the corrected versions of the affected files.
-            """
+    def build_fix_prompt(self, report: Dict, project_path: str, rejected: List[str]) -> str:
+        """Errors, the current content of the files they point at, and the patch format"""
+        project_dir = Path(project_path)
+        paths = [d['file'] for d in rustc_diagnostics.errors(report['diagnostics'])]
+        paths = [p for p in dict.fromkeys(paths) if (project_dir / p).is_file()]
+        if not paths:
+            paths = [p for p in ENTRY_FILES if (project_dir / p).is_file()]
 
-            response = self.llm_client.generate(fix_prompt)
-            # Parse and save the fixed files
-            files = ProjectGenerator.parse_llm_response(response)
-            ProjectGenerator.save_files(files, project_path)
\ No newline at end of file
+        sections = [f"The Rust project fails `cargo {report['level']}` with:\n"
+                    f"{self.compiler.fix_context(report, project_path)}"]
+        for path in paths:
+            content = (project_dir / path).read_text(encoding='utf-8', errors='replace')
+            sections.append(f"Current {path}:\n```\n{content.rstrip()}\n```")
+        if rejected:
+            sections.append("These parts of your previous patch did not apply and were discarded:\n"
+                            + '\n'.join(f"- {message}" for message in rejected))
+        sections.append(FIX_INSTRUCTIONS)
+        return '\n\n'.join(sections)
@@ -0,0 +1,206 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.diagnostics import compact as compact_diagnostics
+from src.metrics import PARSE_SAVE_SECONDS
+from src.project_generator import ProjectGenerator
+from src.compile_executor import CompileExecutor
+from src.rust_compiler import RustCompiler
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+
+class JobStore:
+    """SQLite-backed store of project generation jobs, safe to share between threads"""
+
+    def __init__(self, db_path: Path = Path('.cache/project_jobs.db')):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    username TEXT,
+                    status TEXT NOT NULL,
+                    project_dir TEXT,
+                    timings TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def create(self, description: str, username: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, description, username, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, description, username, now, now)
+            )
+        return job_id
+
+    def update(self, job_id: str, status: Optional[str] = None, project_dir: Optional[str] = None,
+               timings: Optional[Dict] = None, result: Optional[Dict] = None):
+        fields = {'updated_at': datetime.utcnow().isoformat()}
+        if status is not None:
+            fields['status'] = status
+        if project_dir is not None:
+            fields['project_dir'] = project_dir
+        if timings is not None:
+            fields['timings'] = json.dumps(timings)
+        if result is not None:
+            fields['result'] = json.dumps(result, default=str)
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self.conn:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['timings'] = json.loads(job['timings'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def unfinished(self) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status NOT IN (?, ?) ORDER BY created_at", TERMINAL_STATUSES
+            ).fetchall()
+        return [self.get(row['id']) for row in rows]
+
+
+class ProjectJobRunner:
+    """Runs the generate_project pipeline for queued jobs.
+
+    Retrieval, the LLM call, parsing and saving run on ``llm_workers``
+    threads; verification runs on a CompileExecutor with up to
+    ``compile_workers`` concurrent builds sharing the machine's cores, so
+    slow compiles do not hold up generation of the next projects.
+    """
+
+    def __init__(self, llm_client, store: JobStore, jobs_dir: Path = Path('generated_projects'),
+                 llm_workers: int = 4, compile_workers: int = 2):
+        self.llm_client = llm_client
+        self.store = store
+        self.jobs_dir = jobs_dir
+        self.project_generator = ProjectGenerator(llm_client=llm_client)
+        self.compiler = RustCompiler()
+        self.llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix='project-llm')
+        self.compile_executor = CompileExecutor(self.compiler, max_concurrent=compile_workers)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def pending(self) -> int:
+        """Jobs accepted by this process that have not finished yet"""
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _track(self, job_id: str):
+        with self._pending_lock:
+            self._pending.add(job_id)
+
+    def _finish(self, job_id: str, **fields):
+        self.store.update(job_id, **fields)
+        with self._pending_lock:
+            self._pending.discard(job_id)
+
+    def submit(self, description: str, username: Optional[str] = None) -> str:
+        job_id = self.store.create(description, username)
+        self._track(job_id)
+        self.llm_pool.submit(self._generate_stage, job_id)
+        return job_id
+
+    def resume(self) -> int:
+        """Re-enqueue jobs left unfinished by a previous process"""
+        jobs = self.store.unfinished()
+        for job in jobs:
+            self._track(job['id'])
+            if job['status'] == 'compiling' and job['project_dir'] and Path(job['project_dir']).exists():
+                self._compile_stage(job['id'])
+            else:
+                self.llm_pool.submit(self._generate_stage, job['id'])
+        return len(jobs)
+
+    def shutdown(self):
+        self.llm_pool.shutdown(wait=False, cancel_futures=True)
+        self.compile_executor.shutdown()
+
+    def _generate_stage(self, job_id: str):
+        job = self.store.get(job_id)
+        timings = {}
+        try:
+            self.store.update(job_id, status='generating')
+
+            start = time.perf_counter()
+            kb_context = self.llm_client.kb.retrieve_relevant(job['description'])
+            timings['retrieve'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            code_response, usage = self.llm_client.generate_with_usage(
+                input=ProjectGenerator.build_project_prompt(job['description'], kb_context),
+                context=[{"prompt": job['description'], "response": "", "error": ""}],
+                stage='project_job',
+                user=job['username']
+            )
+            timings['llm'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            project_dir = self.jobs_dir / job_id
+            files = self.project_generator.parse_llm_response(code_response)
+            self.project_generator.save_files(files, str(project_dir))
+            timings['parse_save'] = time.perf_counter() - start
+            PARSE_SAVE_SECONDS.observe(timings['parse_save'])
+
+            self.store.update(job_id, status='compiling', project_dir=str(project_dir), timings=timings,
+                              result={'files': sorted(files), 'usage': usage})
+            self._compile_stage(job_id)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed during generation: {e}")
+            self._finish(job_id, status='failed', timings=timings, result={'error': str(e)})
+
+    def _compile_stage(self, job_id: str):
+        job = self.store.get(job_id)
+        future = self.compile_executor.submit(job['project_dir'])
+        future.add_done_callback(lambda f: self._compile_done(job_id, f))
+
+    def _compile_done(self, job_id: str, future):
+        if future.cancelled():
+            # Shutting down: the job stays 'compiling' and is picked up again by resume()
+            return
+        job = self.store.get(job_id)
+        timings = job['timings']
+        result = job['result'] or {}
+        try:
+            success, report = future.result()
+            timings['compile_queue'] = report.get('queue_wait', 0.0)
+            timings['compile'] = report.get('build_time', 0.0)
+            timings.update({f"cargo_{level}": elapsed for level, elapsed in report['timings'].items()})
+
+            result.update({'success': success, 'verified_level': report['level'],
+                           'verify_status': report['status'],
+                           'compiler_output': report['output'],
+                           'diagnostics': compact_diagnostics(report['diagnostics'])})
+            self._finish(job_id, status='succeeded' if success else 'failed',
+                         timings=timings, result=result)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed during compilation: {e}")
+            result['error'] = str(e)
+            self._finish(job_id, status='failed', timings=timings, result=result)
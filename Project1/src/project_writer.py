@@ -0,0 +1,88 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Build output and state that belongs to cargo or the user, never to a generated file set
+PRESERVED = ('target', 'Cargo.lock')
+# A file set without this is not a whole project (an empty or garbled reply, say)
+MANIFEST = 'Cargo.toml'
+
+
+def _is_preserved(relative: Path) -> bool:
+    first = relative.parts[0]
+    return first in PRESERVED or first.startswith('.')
+
+
+def _atomic_write(path: Path, data: bytes):
+    """Write via a temp file in the same directory and rename it over ``path``"""
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_project(files: Dict[str, str], project_dir, remove_stale: bool = True) -> Dict[str, List[str]]:
+    """Bring ``project_dir`` in line with ``files`` touching as little as possible.
+
+    Files whose content is unchanged keep their mtime, so cargo's
+    fingerprints and incremental state stay valid and a retry that edits
+    one file only rebuilds what that file affects. Changed files are
+    replaced atomically. Files from an earlier generation that are not in
+    ``files`` are removed, except ``target/``, ``Cargo.lock`` and dot-files,
+    and only when ``files`` is a whole project, with its ``Cargo.toml``.
+    """
+    project_path = Path(project_dir).resolve()
+    project_path.mkdir(parents=True, exist_ok=True)
+    (project_path / 'src').mkdir(exist_ok=True)
+    changes = {'written': [], 'unchanged': [], 'removed': []}
+
+    wanted = {}
+    for filepath, content in files.items():
+        full_path = (project_path / filepath.strip()).resolve()
+        if project_path not in full_path.parents:
+            raise ValueError(f"Refusing to write outside the project directory: {filepath}")
+        wanted[full_path] = content.encode('utf-8')
+
+    if remove_stale and project_path / MANIFEST not in wanted:
+        logger.warning(f"No {MANIFEST} among {len(files)} generated file(s); keeping the other files "
+                       f"in {project_path}")
+        remove_stale = False
+
+    for full_path, data in wanted.items():
+        relative = full_path.relative_to(project_path).as_posix()
+        if full_path.is_file() and full_path.read_bytes() == data:
+            changes['unchanged'].append(relative)
+            continue
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(full_path, data)
+        changes['written'].append(relative)
+
+    if remove_stale:
+        visited = []
+        for root, dirs, names in os.walk(project_path, topdown=True):
+            root_path = Path(root)
+            visited.append(root_path)
+            # Prune preserved trees such as target/ before descending into them
+            dirs[:] = [d for d in dirs if not _is_preserved((root_path / d).relative_to(project_path))]
+            for name in names:
+                full_path = root_path / name
+                if full_path not in wanted and not name.startswith('.') \
+                        and not _is_preserved(full_path.relative_to(project_path)):
+                    full_path.unlink()
+                    changes['removed'].append(full_path.relative_to(project_path).as_posix())
+        # Deepest first, so directories emptied by the removals above go too
+        for directory in sorted(visited, key=lambda d: len(d.parts), reverse=True):
+            if directory not in (project_path, project_path / 'src') and not any(directory.iterdir()):
+                directory.rmdir()
+
+    logger.info(f"Project files: {len(changes['written'])} written, {len(changes['unchanged'])} unchanged, "
+                f"{len(changes['removed'])} removed")
+    return changes
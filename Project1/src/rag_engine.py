@@ -1,52 +1,69 @@
 # src/rag_engine.py
+import hashlib
 import json
+from functools import lru_cache
 from pathlib import Path
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 from sentence_transformers import SentenceTransformer
 from sklearn.neighbors import NearestNeighbors
+from .metrics import CACHE_HITS, EMBEDDING_SECONDS, RETRIEVAL_SECONDS
+
+EMBEDDING_MODEL = 'sentence-transformers/all-mpnet-base-v2'
+
+@lru_cache(maxsize=None)
+def get_embedder(model_name: str = EMBEDDING_MODEL) -> SentenceTransformer:
+    """Load each embedding model once per process and share it between knowledge bases"""
+    return SentenceTransformer(model_name)
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
 class RustKnowledgeBase:
-    def __init__(self, kb_path: Path = Path('knowledge_base')):
+    def __init__(self, kb_path: Path = Path('knowledge_base'), embedder: Optional[SentenceTransformer] = None):
         self.kb_path = kb_path
         self.kb_path.mkdir(exist_ok=True)
         # Use a more powerful model for better full-document embeddings
-        self.embedder = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
+        self.embedder = embedder or get_embedder()
         self.kb_store: List[Dict] = []
         # Use cosine similarity with more neighbors
         self.nn = NearestNeighbors(n_neighbors=5, metric='cosine', algorithm='brute')
         
         # Add caching
         self.cache_file = self.kb_path / 'vector_cache.npz'
+        self._cached_vectors: Dict[str, np.ndarray] = {}
+        self._cache_dirty = False
         self._load_or_create_cache()
         self._load_knowledge_base()
 
     def _load_knowledge_base(self):
         """Load knowledge from files in knowledge_base directory"""
+        entries = []
         # Load Rust code files
         for file in self.kb_path.glob('*.rs'):
             content = file.read_text(encoding='utf-8')
-            metadata = {'filename': file.name, 'type': 'code'}
-            self.add_knowledge(content, metadata)
+            entries.append({'content': content, 'metadata': {'filename': file.name, 'type': 'code'}})
             
         # Load JSON entries
         for file in self.kb_path.glob('*.json'):
             data = json.loads(file.read_text(encoding='utf-8'))
-            for entry in data:
-                self.add_knowledge(entry['content'], entry.get('metadata', {}))
+            entries.extend(data)
                 
         # Load text documentation
         for file in self.kb_path.glob('*.txt'):
             content = file.read_text(encoding='utf-8')
-            metadata = {'filename': file.name, 'type': 'documentation'}
-            self.add_knowledge(content, metadata)
+            entries.append({'content': content, 'metadata': {'filename': file.name, 'type': 'documentation'}})
+
+        self.add_knowledge_batch(entries)
     
     def _load_or_create_cache(self):
+        """Load previously computed embeddings keyed by content hash"""
         if self.cache_file.exists():
             cache = np.load(self.cache_file)
-            self.embeddings = cache['embeddings']
-            self.nn.fit(self.embeddings)
-            return True
+            # Caches written before content hashing cannot be matched to entries
+            if 'hashes' in cache:
+                self._cached_vectors = dict(zip(cache['hashes'].tolist(), cache['embeddings']))
+                return True
         return False
 
     def save_knowledge(self, content: str, filename: str):
@@ -73,23 +90,48 @@ class RustKnowledgeBase:
             for entry in entries
         ]
         file_path.write_text(json.dumps(json_data, indent=2), encoding='utf-8')
-        for entry in entries:
-            self.add_knowledge(entry['content'], entry.get('metadata', {}))
+        self.add_knowledge_batch(json_data)
 
     def add_knowledge(self, content: str, metadata: Dict = None):
         """Add new knowledge entry with full document embedding"""
-        embedding = self.embedder.encode(content, normalize_embeddings=True)
-        entry = {
-            'content': content,
-            'metadata': metadata or {},
-            'embedding': embedding
-        }
-        self.kb_store.append(entry)
+        self.add_knowledge_batch([{'content': content, 'metadata': metadata}])
+
+    def add_knowledge_batch(self, entries: List[Dict]):
+        """Embed uncached entries in a single encode call and refit the index once"""
+        if not entries:
+            return
+        hashes = [content_hash(entry['content']) for entry in entries]
+        missing = [i for i, h in enumerate(hashes) if h not in self._cached_vectors]
+        if len(missing) < len(entries):
+            CACHE_HITS.inc(len(entries) - len(missing), cache='embedding')
+        if missing:
+            with EMBEDDING_SECONDS.time(operation='index'):
+                vectors = self.embedder.encode([entries[i]['content'] for i in missing],
+                                               normalize_embeddings=True)
+            for i, vector in zip(missing, vectors):
+                self._cached_vectors[hashes[i]] = vector
+            self._cache_dirty = True
+
+        for entry, h in zip(entries, hashes):
+            self.kb_store.append({
+                'content': entry['content'],
+                'metadata': entry.get('metadata') or {},
+                'embedding': self._cached_vectors[h]
+            })
         self._update_embeddings()
+
+    def warm_up(self):
+        """Run one query through the embedder and index so the first request is not slow"""
+        self.retrieve_relevant("warm up")
         
     def retrieve_relevant(self, query: str, top_k: int = 3) -> List[str]:
         """Retrieve most relevant full documents"""
-        query_embedding = self.embedder.encode(query, normalize_embeddings=True)
+        with RETRIEVAL_SECONDS.time():
+            return self._retrieve_relevant(query, top_k)
+
+    def _retrieve_relevant(self, query: str, top_k: int) -> List[str]:
+        with EMBEDDING_SECONDS.time(operation='query'):
+            query_embedding = self.embedder.encode(query, normalize_embeddings=True)
         if not self.kb_store:
             return []
             
@@ -106,12 +148,38 @@ class RustKnowledgeBase:
             })
         return [r['content'] for r in sorted(results, key=lambda x: x['similarity'], reverse=True)]
         
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed several query texts with a single encode call"""
+        with EMBEDDING_SECONDS.time(operation='query'):
+            return self.embedder.encode(texts, normalize_embeddings=True)
+
+    def retrieve_batch(self, queries: List[str], top_k: int = 3) -> List[List[Dict]]:
+        """Scored matches for several queries from one encode call and one index search"""
+        with RETRIEVAL_SECONDS.time():
+            query_embeddings = self.embed_batch(queries)
+            if not self.kb_store:
+                return [[] for _ in queries]
+            n_neighbors = min(top_k, len(self.kb_store))
+            distances, indices = self.nn.kneighbors(query_embeddings, n_neighbors=n_neighbors)
+            return [
+                [{
+                    'content': self.kb_store[idx]['content'],
+                    'similarity': float(1 - dist),
+                    'metadata': self.kb_store[idx]['metadata']
+                } for idx, dist in zip(row_indices, row_distances)]
+                for row_indices, row_distances in zip(indices, distances)
+            ]
+
     def _update_embeddings(self):
-        """Update vector index and cache"""
+        """Update vector index, and the on-disk cache only when new vectors were computed"""
         embeddings = np.array([entry['embedding'] for entry in self.kb_store])
         self.embeddings = embeddings
         self.nn.fit(embeddings)
-        np.savez(self.cache_file, embeddings=embeddings)
+        if self._cache_dirty:
+            hashes = list(self._cached_vectors)
+            np.savez(self.cache_file, hashes=np.array(hashes),
+                     embeddings=np.array([self._cached_vectors[h] for h in hashes]))
+            self._cache_dirty = False
 
 from src.rag_engine import RustKnowledgeBase
 from pathlib import Path
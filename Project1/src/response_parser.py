@@ -0,0 +1,114 @@
+import re
+import textwrap
+from typing import Dict, Iterator, Optional
+
+# A marker is a whole line: "[FILE: path]", "// FILE: path" (the comment form some prompts ask for)
+# or "[END FILE]". Source lines that merely mention FILE: are content, and so is the comment
+# form inside an open "[FILE: path]" block, where it is just a comment at the top of the file.
+MARKER = re.compile(r'(?P<indent>[ \t]*)(?:\[FILE:[ \t]*(?P<path>[^\]\n]+?)[ \t]*\]'
+                    r'|//[ \t]*FILE:[ \t]*(?P<comment_path>[^\s\]]+)'
+                    r'|(?P<end>\[END[ \t]+FILE\]))[ \t]*')
+FENCES = ('```', '~~~')
+OPENING_FENCE = re.compile(r'(?:```|~~~)[\w+#.-]*')
+FENCE_LINE = re.compile(r'^[ \t]*(?:```|~~~)', re.MULTILINE)
+
+
+def _markers(response: str) -> Iterator[re.Match]:
+    """Marker lines, found by jumping between occurrences of "FILE" rather than testing every line"""
+    length = len(response)
+    pos = response.find('FILE')
+    while pos != -1:
+        line_start = response.rfind('\n', 0, pos) + 1
+        line_end = response.find('\n', pos)
+        if line_end == -1:
+            line_end = length
+        marker = MARKER.fullmatch(response, line_start, line_end)
+        if marker:
+            yield marker
+        pos = response.find('FILE', line_end)
+
+
+def _clean_path(path: str) -> Optional[str]:
+    path = path.strip().strip('`\'"*').strip().replace('\\', '/')
+    while path.startswith('./'):
+        path = path[2:]
+    return path or None
+
+
+def _rstrip(text: str, start: int, end: int) -> int:
+    """End of ``text[start:end]`` without trailing whitespace, without copying it"""
+    while end > start and text[end - 1] in ' \t\n':
+        end -= 1
+    return end
+
+
+def _last_line(text: str, start: int, end: int) -> tuple:
+    line_start = max(text.rfind('\n', start, end) + 1, start)
+    return line_start, text[line_start:end].strip()
+
+
+def _content(response: str, start: int, end: int, indent: str) -> str:
+    """Text of the block in ``response[start:end]`` without the markdown fence around it"""
+    # Skip blank lines, keeping the indentation of the first real one
+    while start < end:
+        line_end = response.find('\n', start, end)
+        line_end = end if line_end == -1 else line_end
+        line = response[start:line_end].strip()
+        if line:
+            break
+        start = line_end + 1
+    else:
+        return ''
+    opened = line.startswith(FENCES) and OPENING_FENCE.fullmatch(line) is not None
+    if opened:
+        start = line_end + 1
+
+    end = _rstrip(response, start, end)
+    line_start, line = _last_line(response, start, end)
+    # A fence with a language tag at the very end opens the next file's block, not this one's
+    if line.startswith(FENCES) and line[3:] and OPENING_FENCE.fullmatch(line):
+        end = _rstrip(response, start, line_start)
+        line_start, line = _last_line(response, start, end)
+    # Without an opening fence of ours, a final fence only closes ours if the file's own are unbalanced
+    if line in FENCES and (opened or len(FENCE_LINE.findall(response, start, end)) % 2):
+        end = _rstrip(response, start, line_start)
+
+    content = response[start:end]
+    if indent:
+        # Markers copied from an indented prompt come with equally indented content
+        content = textwrap.dedent(content)
+    return content + '\n' if content.strip() else ''
+
+
+def parse_files(response: str) -> Dict[str, str]:
+    """Files in an LLM response given as ``[FILE: path] ... [END FILE]`` blocks.
+
+    One scan finds the marker lines and each file is sliced out of the
+    response between them, so the cost stays linear in the response size.
+    A new marker ends the previous file even without ``[END FILE]``; the
+    ``// FILE: path`` form only does so outside ``[FILE: ...]`` blocks. A
+    markdown fence around a file's content is dropped, but fences inside it
+    (code samples in a README, say) are kept. Files come back with a single
+    trailing newline; blocks with no content are skipped, and a path given
+    twice keeps its last content.
+    """
+    if '\r' in response:
+        response = response.replace('\r\n', '\n')
+    files = {}
+    path, start, indent = None, 0, ''
+    bracketed = False
+    for marker in _markers(response):
+        if bracketed and marker.group('comment_path'):
+            continue
+        if path:
+            content = _content(response, start, marker.start(), indent)
+            if content:
+                files[path] = content
+        path = None if marker.group('end') else _clean_path(marker.group('path') or marker.group('comment_path'))
+        bracketed = path is not None and marker.group('path') is not None
+        start, indent = marker.end() + 1, marker.group('indent')
+    if path:
+        content = _content(response, start, len(response), indent)
+        if content:
+            files[path] = content
+    return files
@@ -1,36 +1,164 @@
 import subprocess
+import os
+from contextlib import nullcontext
 from pathlib import Path
 import logging
+from typing import Dict, List, Optional, Sequence
+from .build_cache import BuildCache
+from .compile_cache import CompileCache, tree_hash
+from .sandbox import SandboxLimits, run_sandboxed
+from . import diagnostics as rustc_diagnostics
+from .metrics import CACHE_HITS, CARGO_SECONDS, COMPILE_RESULTS
 
 logger = logging.getLogger(__name__)
 
+# Verification levels from cheapest to most expensive; diagnostics come back as JSON lines
+VERIFY_COMMANDS = {
+    'check': ['cargo', 'check', '--message-format=json'],
+    'build': ['cargo', 'build', '--message-format=json'],
+    'test': ['cargo', 'test', '--message-format=json'],
+    'clippy': ['cargo', 'clippy', '--all-targets', '--message-format=json', '--', '-D', 'warnings'],
+}
+FIX_CONTEXT_ERRORS = int(os.getenv('FIX_CONTEXT_ERRORS', '5'))
+# What the fixer is told when cargo was killed rather than reporting compile errors
+RESOURCE_FAILURES = {
+    'timeout': "The build did not finish within the time limit. Look for build.rs scripts, "
+               "proc-macros or const evaluation that loop or do heavy work at compile time.",
+    'oom': "The build ran out of memory. Avoid huge generated code, deeply recursive macros "
+           "and large compile-time tables.",
+    'cpu_limit': "The build exceeded its CPU time limit. Avoid expensive build.rs work and "
+                 "compile-time computation.",
+}
+DEFAULT_VERIFY_LEVELS = tuple(os.getenv('VERIFY_LEVELS', 'check,build').split(','))
+
+def new_report() -> Dict:
+    return {'level': None, 'status': None, 'output': '', 'diagnostics': [], 'timings': {}}
+
 class RustCompiler:
+    def __init__(self, build_cache: Optional[BuildCache] = None, compile_cache: Optional[CompileCache] = None,
+                 limits: Optional[SandboxLimits] = None):
+        # Shared target directories so dependencies are not rebuilt for every project
+        self.build_cache = build_cache or BuildCache.from_env()
+        # Verdicts of trees already verified, so identical retries skip cargo entirely
+        self.compile_cache = compile_cache or CompileCache.from_env()
+        self._rust_version: Optional[str] = None
+        # Wall-clock, memory, CPU and output caps for every cargo run
+        self.limits = limits or SandboxLimits.from_env()
+
+    def lookup(self, project_dir: Path, levels: Sequence[str]) -> tuple[Optional[str], Optional[tuple]]:
+        """Cache key of the project tree and the memoized ``(success, report)`` if there is one"""
+        if self.compile_cache is None:
+            return None, None
+        if self.build_cache is not None:
+            self.build_cache.configure(project_dir)
+        if self._rust_version is None:
+            self._rust_version = self.get_rust_version()
+        key = tree_hash(project_dir, self._rust_version, levels)
+        cached = self.compile_cache.get(key)
+        if cached is not None:
+            CACHE_HITS.inc(cache='compile')
+            # No cargo ran for this answer, so it carries no timings of its own
+            cached[1].update(cached=True, timings={})
+        return key, cached
+
+    def remember(self, key: Optional[str], success: bool, report: Dict):
+        # Timeouts and resource kills depend on machine load, not just on the tree
+        if key is not None and report['status'] in ('ok', 'failed'):
+            self.compile_cache.put(key, success, {k: v for k, v in report.items()
+                                                  if k not in ('queue_wait', 'build_time')})
+
+    def cargo_env(self, project_dir):
+        """Context manager yielding the environment for cargo commands in ``project_dir``"""
+        if self.build_cache is None:
+            return nullcontext(None)
+        return self.build_cache.cargo_env(project_dir)
+
     def compile_project(self, project_path: str) -> tuple[bool, str]:
         """Compiles a Rust project with detailed error reporting."""
+        success, report = self.verify_project(project_path)
+        return success, report['output']
+
+    def verify_project(self, project_path: str, levels: Sequence[str] = None) -> tuple[bool, Dict]:
+        """Run verification levels in order, stopping at the first that fails.
+
+        ``cargo check`` only produces diagnostics, so a broken candidate is
+        rejected before any codegen or linking happens. Returns the overall
+        result and a report with the ``level`` reached, its ``output``, the
+        distinct ``diagnostics`` of that level and per-level ``timings``.
+        """
+        levels = levels or DEFAULT_VERIFY_LEVELS
+        report = new_report()
         try:
             project_dir = Path(project_path)
             if not (project_dir / 'Cargo.toml').exists():
-                return False, "Cargo.toml not found"
-                
-            result = subprocess.run(
-                ['cargo', 'build'],
-                cwd=str(project_dir),
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            
-            if result.returncode == 0:
-                logger.info("Compilation successful")
-                return True, result.stdout
-            else:
-                logger.error(f"Compilation failed: {result.stderr}")
-                return False, result.stderr
-                
-        except subprocess.CalledProcessError as e:
-            return False, f"Compilation error: {e}"
+                report['output'] = "Cargo.toml not found"
+                return False, report
+
+            key, cached = self.lookup(project_dir, levels)
+            if cached is not None:
+                return cached
+
+            with self.cargo_env(project_dir) as env:
+                for level in levels:
+                    result = run_sandboxed(self.command(level), str(project_dir), env, self.limits)
+                    if not self.record_level(report, level, result):
+                        self.remember(key, False, report)
+                        return False, report
+
+            self.record_success()
+            self.remember(key, True, report)
+            return True, report
+
+        except KeyError as e:
+            report['output'] = f"Unknown verification level: {e}"
         except Exception as e:
-            return False, f"Unexpected error: {e}"
+            report['output'] = f"Unexpected error: {e}"
+        report['status'] = 'error'
+        return False, report
+
+    @staticmethod
+    def command(level: str, jobs: Optional[int] = None) -> List[str]:
+        """cargo command line for a verification level, optionally capped at ``jobs`` parallel rustc"""
+        command = list(VERIFY_COMMANDS[level])
+        if jobs:
+            command[2:2] = ['-j', str(jobs)]
+        return command
+
+    @staticmethod
+    def record_level(report: Dict, level: str, result: Dict) -> bool:
+        """Fold one sandboxed cargo run into ``report``; returns whether it passed"""
+        CARGO_SECONDS.observe(result['elapsed'], level=level)
+        report['timings'][level] = result['elapsed']
+        report['level'] = level
+        report['status'] = result['status']
+
+        diagnostics = rustc_diagnostics.parse_cargo_messages(result['stdout'])
+        plain = rustc_diagnostics.plain_output(result['stdout'], result['stderr'])
+        report['diagnostics'] = diagnostics
+        report['output'] = rustc_diagnostics.render(diagnostics, fallback=plain)
+
+        if result['status'] != 'ok':
+            logger.error(f"Verification failed at cargo {level} ({result['status']}): "
+                         f"{len(rustc_diagnostics.errors(diagnostics))} distinct errors")
+            COMPILE_RESULTS.inc(result='failure' if result['status'] == 'failed' else result['status'])
+            if result['status'] != 'failed' or not rustc_diagnostics.errors(diagnostics):
+                # Killed runs and manifest, resolution or test failures have no useful compiler messages
+                report['output'] = plain
+            return False
+        return True
+
+    @staticmethod
+    def record_success():
+        logger.info("Compilation successful")
+        COMPILE_RESULTS.inc(result='success')
+
+    @staticmethod
+    def fix_context(report: Dict, project_path: str, top_n: int = FIX_CONTEXT_ERRORS) -> str:
+        """Top-N distinct errors with source snippets, for the next LLM prompt"""
+        if report['status'] in RESOURCE_FAILURES:
+            return f"{RESOURCE_FAILURES[report['status']]}\n{report['output'][-2000:]}"
+        return rustc_diagnostics.fix_context(report['diagnostics'], project_path, top_n,
+                                             fallback=report['output'])
 
     def get_rust_version(self) -> str:
         """Get the installed Rust version."""
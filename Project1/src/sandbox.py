@@ -0,0 +1,225 @@
+import asyncio
+import os
+import re
+import resource
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Outcomes a caller can react to differently from an ordinary compile error
+SANDBOX_STATUSES = ('ok', 'failed', 'timeout', 'oom', 'cpu_limit', 'cancelled')
+OOM_PATTERN = re.compile(r'memory allocation of \d+ bytes failed|out of memory|Cannot allocate memory'
+                         r'|signal: 9, SIGKILL', re.IGNORECASE)
+CPU_LIMIT_PATTERN = re.compile(r'SIGXCPU|signal: 24')
+# How often a blocking run checks its cancel event
+CANCEL_POLL_INTERVAL = 0.1
+# util-linux prlimit sets the limits and then execs the command, so nothing runs uncapped
+PRLIMIT = shutil.which('prlimit')
+
+
+class SandboxLimits:
+    """Resource caps for one cargo invocation and everything it spawns.
+
+    ``memory_bytes`` (RLIMIT_DATA) and ``cpu_seconds`` (RLIMIT_CPU) are
+    rlimits, inherited by every rustc, build script and proc-macro host
+    process (so they apply per process, not to the tree as a whole). The
+    memory cap is off by default: rustc and LLVM reserve far more address
+    space than they touch, so only a generous data limit is safe. ``timeout``
+    is wall-clock time for the whole command, after which its process group
+    is killed.
+
+    The limits are set without ``preexec_fn``, which is not safe in a
+    process with threads: through the ``prlimit`` tool when it is installed,
+    otherwise with :func:`resource.prlimit` on the child right after spawn.
+    """
+
+    def __init__(self, timeout: float = 300.0, memory_bytes: Optional[int] = None,
+                 cpu_seconds: Optional[int] = None, max_output_bytes: int = 2 * 1024 ** 2):
+        self.timeout = timeout
+        self.memory_bytes = memory_bytes
+        self.cpu_seconds = cpu_seconds
+        self.max_output_bytes = max_output_bytes
+
+    @classmethod
+    def from_env(cls) -> 'SandboxLimits':
+        memory_mb = int(os.getenv('COMPILE_MEMORY_MB', '0'))
+        cpu_seconds = int(os.getenv('COMPILE_CPU_SECONDS', '0'))
+        return cls(
+            timeout=float(os.getenv('COMPILE_TIMEOUT', '300')),
+            memory_bytes=memory_mb * 1024 ** 2 if memory_mb > 0 else None,
+            cpu_seconds=cpu_seconds or None,
+            max_output_bytes=int(os.getenv('COMPILE_MAX_OUTPUT_KB', '2048')) * 1024
+        )
+
+    def rlimits(self) -> List[tuple]:
+        limits = []
+        if self.memory_bytes:
+            limits.append((resource.RLIMIT_DATA, (self.memory_bytes, self.memory_bytes)))
+        if self.cpu_seconds:
+            limits.append((resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 5)))
+        return limits
+
+    def wrap(self, command: List[str]) -> List[str]:
+        """``command`` run through ``prlimit`` when there are limits to set and the tool exists"""
+        if not PRLIMIT or not self.rlimits():
+            return command
+        options = []
+        if self.memory_bytes:
+            options.append(f'--data={self.memory_bytes}')
+        if self.cpu_seconds:
+            options.append(f'--cpu={self.cpu_seconds}:{self.cpu_seconds + 5}')
+        return [PRLIMIT, *options, '--', *command]
+
+    def apply(self, pid: int):
+        """Set the limits on a just spawned process when :meth:`wrap` could not.
+
+        Anything the process forks before this call runs uncapped; cargo
+        spends its first milliseconds reading manifests, so in practice
+        every rustc starts under the limits.
+        """
+        if PRLIMIT:
+            return
+        for limit, values in self.rlimits():
+            try:
+                resource.prlimit(pid, limit, values)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+
+class _CappedBuffer:
+    """Keeps the first ``limit`` bytes of a stream and counts the rest"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.dropped = 0
+
+    def write(self, chunk: bytes):
+        room = self.limit - self.size
+        if room > 0:
+            self.chunks.append(chunk[:room])
+            self.size += min(room, len(chunk))
+        self.dropped += max(0, len(chunk) - max(room, 0))
+
+    def text(self) -> str:
+        text = b''.join(self.chunks).decode('utf-8', errors='replace')
+        if self.dropped:
+            # Cut at the last complete line so a JSON message is never half kept
+            text = text[:text.rfind('\n') + 1] + f"... [{self.dropped} bytes of output truncated]\n"
+        return text
+
+
+def _kill_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _result(returncode: Optional[int], stdout: _CappedBuffer, stderr: _CappedBuffer,
+            timed_out: bool, elapsed: float, limits: SandboxLimits, cancelled: bool = False) -> Dict:
+    out, err = stdout.text(), stderr.text()
+    if cancelled:
+        status = 'cancelled'
+    elif timed_out:
+        status = 'timeout'
+        err += f"\nerror: cargo was killed after exceeding the {limits.timeout:.0f}s time limit\n"
+    elif returncode == 0:
+        status = 'ok'
+    elif CPU_LIMIT_PATTERN.search(err):
+        status = 'cpu_limit'
+    elif OOM_PATTERN.search(err) or returncode == -signal.SIGKILL:
+        status = 'oom'
+    else:
+        status = 'failed'
+    return {
+        'returncode': returncode if returncode is not None else -signal.SIGKILL,
+        'stdout': out,
+        'stderr': err,
+        'status': status,
+        'truncated': bool(stdout.dropped or stderr.dropped),
+        'elapsed': elapsed,
+    }
+
+
+def run_sandboxed(command: List[str], cwd: str, env: Optional[Dict[str, str]],
+                  limits: SandboxLimits, cancel: Optional[threading.Event] = None) -> Dict:
+    """Run ``command`` in its own process group under ``limits``.
+
+    Setting ``cancel`` from another thread kills the process group, for
+    runs whose result is no longer wanted.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(limits.wrap(command), cwd=cwd, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, start_new_session=True)
+    limits.apply(process.pid)
+    buffers = (_CappedBuffer(limits.max_output_bytes), _CappedBuffer(limits.max_output_bytes))
+
+    def pump(stream, buffer):
+        for chunk in iter(lambda: stream.read(65536), b''):
+            buffer.write(chunk)
+
+    readers = [threading.Thread(target=pump, args=(stream, buffer), daemon=True)
+               for stream, buffer in zip((process.stdout, process.stderr), buffers)]
+    for reader in readers:
+        reader.start()
+
+    timed_out = cancelled = False
+    deadline = start + limits.timeout
+    try:
+        while True:
+            remaining = max(deadline - time.perf_counter(), 0)
+            try:
+                process.wait(timeout=min(remaining, CANCEL_POLL_INTERVAL) if cancel else remaining)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                elif time.perf_counter() < deadline:
+                    continue
+                else:
+                    timed_out = True
+                _kill_group(process.pid)
+                process.wait()
+                break
+    finally:
+        # Kill grandchildren (build scripts, rustc) that may still hold the pipes open
+        _kill_group(process.pid)
+    for reader in readers:
+        reader.join(timeout=5)
+    return _result(process.returncode, *buffers, timed_out, time.perf_counter() - start, limits, cancelled)
+
+
+async def arun_sandboxed(command: List[str], cwd: str, env: Optional[Dict[str, str]],
+                         limits: SandboxLimits) -> Dict:
+    """Async form of :func:`run_sandboxed`; cancellation kills the process group too"""
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *limits.wrap(command), cwd=cwd, env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    limits.apply(process.pid)
+    buffers = (_CappedBuffer(limits.max_output_bytes), _CappedBuffer(limits.max_output_bytes))
+
+    async def pump(stream, buffer):
+        while chunk := await stream.read(65536):
+            buffer.write(chunk)
+
+    readers = asyncio.gather(pump(process.stdout, buffers[0]), pump(process.stderr, buffers[1]))
+    timed_out = False
+    try:
+        await asyncio.wait_for(process.wait(), timeout=limits.timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        _kill_group(process.pid)
+        await process.wait()
+    try:
+        await asyncio.wait_for(readers, timeout=5)
+    except asyncio.TimeoutError:
+        pass
+    return _result(process.returncode, *buffers, timed_out, time.perf_counter() - start, limits)
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import CACHE_HITS
+
+# Request fields that change the upstream result; everything else (user, ids) is ignored
+KEY_FIELDS = ('model', 'messages', 'temperature', 'max_tokens', 'stream')
+
+
+def request_key(request: Dict) -> str:
+    """Normalized hash of a chat completion request used to detect duplicates"""
+    normalized = {field: request.get(field) for field in KEY_FIELDS}
+    normalized['messages'] = [
+        {'role': m['role'], 'content': ' '.join(m['content'].split())}
+        for m in request.get('messages') or []
+    ]
+    encoded = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    """One in-flight upstream call and the callers waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """Buffered fan-out of one async stream; late subscribers replay from the start"""
+
+    def __init__(self):
+        self.items: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+
+    async def pump(self, source: AsyncIterator):
+        try:
+            async for item in source:
+                async with self.changed:
+                    self.items.append(item)
+                    self.changed.notify_all()
+        except BaseException as e:
+            self.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            # Release whatever the source holds (e.g. an upstream slot) right away
+            await source.aclose()
+            async with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: position < len(self.items) or self.done)
+                batch = self.items[position:]
+                position = len(self.items)
+                finished = self.done
+            for item in batch:
+                yield item
+            if finished and position == len(self.items):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """Coalesce identical concurrent requests onto one upstream call.
+
+    The call runs as its own task, so a caller that goes away does not cancel
+    it for the others; it is only cancelled once every waiter has left.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._broadcasts: Dict[str, _Broadcast] = {}
+        self.stats = {'upstream_calls': 0, 'coalesced': 0,
+                      'stream_upstream_calls': 0, 'stream_coalesced': 0}
+
+    @staticmethod
+    def _forget(registry: Dict, key: str, entry):
+        # A newer call for the same key may already have replaced this one
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def in_flight(self) -> int:
+        return len(self._flights) + len(self._broadcasts)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+            self.stats['upstream_calls'] += 1
+        else:
+            self.stats['coalesced'] += 1
+            CACHE_HITS.inc(cache='singleflight')
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Forget it now: the done callback runs a loop iteration later, and
+                # a caller arriving in between must start a new call, not join this one
+                self._forget(self._flights, key, flight)
+                flight.task.cancel()
+
+    async def stream(self, key: str, source_factory: Callable[[], AsyncIterator]):
+        """Subscribe to the shared stream for ``key``, starting it if needed"""
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            broadcast.task = asyncio.ensure_future(broadcast.pump(source_factory()))
+            self._broadcasts[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._forget(self._broadcasts, key, broadcast))
+            self.stats['stream_upstream_calls'] += 1
+        else:
+            self.stats['stream_coalesced'] += 1
+            CACHE_HITS.inc(cache='singleflight')
+
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.task.done():
+                self._forget(self._broadcasts, key, broadcast)
+                broadcast.task.cancel()
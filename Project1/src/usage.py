@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+USAGE_DIMENSIONS = ('user', 'model', 'stage')
+TOKEN_FIELDS = ('prompt_tokens', 'completion_tokens', 'reasoning_tokens', 'total_tokens')
+
+
+def extract_usage(response_json: Dict, model: str, latency: float,
+                  time_to_first_token: Optional[float] = None,
+                  user: Optional[str] = None, stage: str = 'generate') -> Dict:
+    """Build a usage record from a provider response and client-side timings"""
+    usage = response_json.get('usage') or {}
+    details = usage.get('completion_tokens_details') or {}
+    prompt_tokens = usage.get('prompt_tokens') or 0
+    completion_tokens = usage.get('completion_tokens') or 0
+    return {
+        'timestamp': datetime.utcnow(),
+        'user': user or 'anonymous',
+        'model': response_json.get('model') or model,
+        'stage': stage,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'reasoning_tokens': details.get('reasoning_tokens') or 0,
+        'total_tokens': usage.get('total_tokens') or prompt_tokens + completion_tokens,
+        'cost': usage.get('cost') or 0.0,
+        'latency': latency,
+        # Only known for streamed calls; None means the body arrived in one piece
+        'time_to_first_token': time_to_first_token
+    }
+
+
+def api_usage(record: Optional[Dict]) -> Dict:
+    """OpenAI-style ``usage`` block for an API response"""
+    if not record:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    return {
+        "prompt_tokens": record['prompt_tokens'],
+        "completion_tokens": record['completion_tokens'],
+        "total_tokens": record['total_tokens'],
+        "completion_tokens_details": {"reasoning_tokens": record['reasoning_tokens']}
+    }
+
+
+class UsageTracker:
+    """Thread-safe usage log aggregated per user, model and pipeline stage"""
+
+    def __init__(self, max_records: int = 1000):
+        self.records = deque(maxlen=max_records)
+        self._totals: Dict[str, Dict[str, Dict]] = {dim: {} for dim in USAGE_DIMENSIONS}
+        self._lock = threading.Lock()
+
+    def record(self, usage: Dict):
+        with self._lock:
+            self.records.append(usage)
+            for dim in USAGE_DIMENSIONS:
+                bucket = self._totals[dim].setdefault(usage[dim], {
+                    'calls': 0, 'cost': 0.0, 'latency_total': 0.0, 'latency_max': 0.0,
+                    'ttft_total': 0.0, 'ttft_calls': 0,
+                    **{field: 0 for field in TOKEN_FIELDS}
+                })
+                bucket['calls'] += 1
+                bucket['cost'] += usage['cost']
+                bucket['latency_total'] += usage['latency']
+                bucket['latency_max'] = max(bucket['latency_max'], usage['latency'])
+                if usage['time_to_first_token'] is not None:
+                    bucket['ttft_total'] += usage['time_to_first_token']
+                    bucket['ttft_calls'] += 1
+                for field in TOKEN_FIELDS:
+                    bucket[field] += usage[field]
+
+    def summary(self) -> Dict[str, Dict]:
+        """Aggregates per dimension with average latency and TTFT"""
+        with self._lock:
+            result = {}
+            for dim, buckets in self._totals.items():
+                result[dim] = {}
+                for key, bucket in buckets.items():
+                    entry = {k: v for k, v in bucket.items() if k not in ('ttft_total', 'ttft_calls')}
+                    entry['latency_avg'] = bucket['latency_total'] / bucket['calls']
+                    entry['ttft_avg'] = (bucket['ttft_total'] / bucket['ttft_calls']
+                                         if bucket['ttft_calls'] else None)
+                    result[dim][key] = entry
+            return result
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self.records)[-limit:]
@@ -0,0 +1,260 @@
+"""Offline crate registry for generated projects, with a warm dependency cache.
+
+Vendor the curated crates once on a host with network access, then compile
+them into the warm cache:
+
+    python -m src.vendored_registry vendor
+    python -m src.vendored_registry warm
+
+Environment:
+    VENDOR_REGISTRY      on | off (default off; when on, only used once the registry has been vendored)
+    VENDOR_REGISTRY_DIR  registry root (default .cache/vendor); point every project at one shared path
+"""
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+VENDOR_SOURCE = 'vendored-sources'
+# Crates generated projects use most, with the features they usually enable
+CURATED_CRATES = {
+    'tokio': '{ version = "1", features = ["full"] }',
+    'futures': '"0.3"',
+    'serde': '{ version = "1", features = ["derive"] }',
+    'serde_json': '"1"',
+    'anyhow': '"1"',
+    'thiserror': '"1"',
+    'clap': '{ version = "4", features = ["derive"] }',
+    'axum': '"0.7"',
+    'reqwest': '{ version = "0.12", features = ["json"] }',
+    'rand': '"0.8"',
+    'regex': '"1"',
+    'chrono': '"0.4"',
+    'log': '"0.4"',
+    'env_logger': '"0.11"',
+    'tracing': '"0.1"',
+    'tracing-subscriber': '"0.3"',
+    'uuid': '{ version = "1", features = ["v4"] }',
+    'once_cell': '"1"',
+    'itertools': '"0.13"',
+    'wasm-bindgen': '"0.2"',
+}
+
+
+def copy_target(source: Path, target_dir: Path) -> bool:
+    """Create ``target_dir`` as a copy of the cargo target directory ``source``, if it does not exist.
+
+    File mtimes are kept, so cargo's fingerprints hold and the copied units
+    stay fresh. The copy is made beside ``target_dir`` and renamed into place.
+    """
+    if not source.is_dir() or target_dir.exists():
+        return False
+    target_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=str(target_dir.parent), prefix=f'.{target_dir.name}.'))
+    try:
+        shutil.copytree(source, staging / 'target', symlinks=True)
+        os.rename(staging / 'target', target_dir)
+        return True
+    except OSError as e:
+        # Lost the race to another build creating the same directory, or out of space
+        logger.debug(f"Could not copy {source} to {target_dir}: {e}")
+        return False
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+class VendoredRegistry:
+    """Local directory registry of curated crates, for builds without network access.
+
+    :meth:`build` vendors CURATED_CRATES once with ``cargo vendor`` (on a
+    host that can reach crates.io or a mirror). :meth:`configure` points a
+    generated project at the vendored crates with ``net.offline`` set, so
+    cargo never updates an index or downloads anything. :meth:`warm` then
+    compiles all the crates once into ``target/`` here; new shared target
+    directories are seeded from it (see BuildCache), so first builds do
+    not compile dependencies either. A project whose dependencies the
+    vendored crates cannot satisfy is left on the normal registry.
+    """
+
+    def __init__(self, root: Path = Path('.cache/vendor')):
+        self.root = Path(root).resolve()
+        self.crates_dir = self.root / 'crates'
+        self.seed_dir = self.root / 'seed'
+        self.warm_dir = self.root / 'target'
+        # Manifest digest -> whether it resolves from the vendored crates alone
+        self._resolves: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['VendoredRegistry']:
+        """The registry at VENDOR_REGISTRY_DIR if it has been built and ``VENDOR_REGISTRY=on``"""
+        if os.getenv('VENDOR_REGISTRY', 'off').lower() not in ('on', '1', 'true'):
+            return None
+        registry = cls(Path(os.getenv('VENDOR_REGISTRY_DIR', '.cache/vendor')))
+        return registry if registry.available() else None
+
+    def available(self) -> bool:
+        return self.crates_dir.is_dir() and any(self.crates_dir.iterdir())
+
+    def fingerprint(self) -> str:
+        """Identity of the vendored crate set (names and versions)"""
+        names = sorted(path.name for path in self.crates_dir.iterdir() if path.is_dir())
+        return hashlib.sha256('\n'.join(names).encode('utf-8')).hexdigest()[:16]
+
+    def config_text(self) -> str:
+        return (f'[source.crates-io]\nreplace-with = "{VENDOR_SOURCE}"\n\n'
+                f'[source.{VENDOR_SOURCE}]\ndirectory = "{self.crates_dir.as_posix()}"\n\n'
+                f'[net]\noffline = true\n')
+
+    def configure(self, project_dir) -> bool:
+        """Write ``.cargo/config.toml`` so the project resolves from the vendored crates, offline.
+
+        Only done when :meth:`resolves` says the vendored crates cover the
+        manifest; otherwise a config written earlier is removed and cargo
+        uses the normal registry. Returns whether the project is vendored.
+        """
+        config_path = Path(project_dir) / '.cargo' / 'config.toml'
+        text = self.config_text()
+        ours = config_path.is_file() and config_path.read_text(encoding='utf-8') == text
+        if not self.resolves(project_dir):
+            if ours:
+                config_path.unlink()
+            return False
+        if not ours:
+            config_path.parent.mkdir(parents=True, exist_ok=True)
+            config_path.write_text(text, encoding='utf-8')
+        return True
+
+    def resolves(self, project_dir) -> bool:
+        """Whether the project's dependencies resolve from the vendored crates alone.
+
+        Cargo resolves a copy of the manifest (and lock file) under the
+        vendored config once per distinct manifest, so crates outside the
+        curated set, versions it lacks and features they lack all count.
+        """
+        project_path = Path(project_dir)
+        manifest_path = project_path / 'Cargo.toml'
+        if not manifest_path.is_file():
+            return False
+        manifest = manifest_path.read_bytes()
+        lock_path = project_path / 'Cargo.lock'
+        lock = lock_path.read_bytes() if lock_path.is_file() else b''
+        key = hashlib.sha256(manifest + b'\0' + lock + b'\0' + self.fingerprint().encode()).hexdigest()
+        with self._lock:
+            if key not in self._resolves:
+                self._resolves[key] = self._probe(manifest, lock)
+                if not self._resolves[key]:
+                    logger.info(f"Vendored crates do not cover {manifest_path}; using the normal registry")
+            return self._resolves[key]
+
+    def _probe(self, manifest: bytes, lock: bytes) -> bool:
+        with tempfile.TemporaryDirectory(prefix='vendor-probe-') as probe:
+            probe_path = Path(probe)
+            (probe_path / 'src').mkdir()
+            (probe_path / 'src' / 'lib.rs').write_text('')
+            (probe_path / 'src' / 'main.rs').write_text('fn main() {}\n')
+            (probe_path / 'Cargo.toml').write_bytes(manifest)
+            if lock:
+                (probe_path / 'Cargo.lock').write_bytes(lock)
+            (probe_path / '.cargo').mkdir()
+            (probe_path / '.cargo' / 'config.toml').write_text(self.config_text(), encoding='utf-8')
+            try:
+                result = subprocess.run(['cargo', 'metadata', '--format-version', '1'], cwd=probe_path,
+                                        capture_output=True, text=True, timeout=120)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logger.warning(f"Could not check the manifest against the vendored crates: {e}")
+                return False
+            return result.returncode == 0
+
+    def seed_target(self, target_dir: Path) -> bool:
+        """Start a new shared target directory as a copy of the warm one.
+
+        Cargo's fingerprints for registry crates record source paths and
+        dependency hashes, not where the target directory lives, and the
+        copy keeps file mtimes, so cargo reports the copied dependencies
+        fresh instead of compiling them again (checked by
+        Project4/tests/test_vendored_registry.py). See :func:`copy_target`.
+        """
+        if copy_target(self.warm_dir, target_dir):
+            logger.info(f"Seeded {target_dir} from the warm dependency cache")
+            return True
+        return False
+
+    def _write_seed(self, crates: Dict[str, str]):
+        """A throwaway project depending on every curated crate"""
+        (self.seed_dir / 'src').mkdir(parents=True, exist_ok=True)
+        dependencies = '\n'.join(f'{name} = {requirement}' for name, requirement in sorted(crates.items()))
+        (self.seed_dir / 'Cargo.toml').write_text(
+            '[package]\nname = "vendor-seed"\nversion = "0.1.0"\nedition = "2021"\npublish = false\n\n'
+            f'[dependencies]\n{dependencies}\n', encoding='utf-8')
+        (self.seed_dir / 'src' / 'main.rs').write_text('fn main() {}\n', encoding='utf-8')
+
+    def build(self, crates: Dict[str, str] = None) -> int:
+        """Vendor ``crates`` (CURATED_CRATES by default) and everything they depend on; needs network.
+
+        Source replacement from the user's cargo config is honoured, so an
+        internal mirror works as the download source. Returns the number of
+        crates vendored.
+        """
+        self._write_seed(crates or CURATED_CRATES)
+        config = self.seed_dir / '.cargo' / 'config.toml'
+        if config.exists():
+            config.unlink()
+        staging = self.root / 'crates.new'
+        shutil.rmtree(staging, ignore_errors=True)
+        subprocess.run(['cargo', 'vendor', '--versioned-dirs', '--respect-source-config', str(staging)],
+                       cwd=self.seed_dir, check=True, capture_output=True, text=True)
+        shutil.rmtree(self.crates_dir, ignore_errors=True)
+        os.rename(staging, self.crates_dir)
+        count = sum(1 for path in self.crates_dir.iterdir() if path.is_dir())
+        logger.info(f"Vendored {count} crates into {self.crates_dir}")
+        return count
+
+    def warm(self, build_cache=None) -> float:
+        """Compile every vendored crate for ``cargo check`` and ``cargo build`` into the warm target dir"""
+        self.configure(self.seed_dir)
+        env = dict(os.environ, CARGO_TARGET_DIR=str(self.warm_dir))
+        # Builds later run under the build cache's wrapper; warm with the same one
+        if build_cache is not None and build_cache.sccache and 'RUSTC_WRAPPER' not in os.environ:
+            env['RUSTC_WRAPPER'] = build_cache.sccache
+        start = time.perf_counter()
+        for command in (['cargo', 'check'], ['cargo', 'build']):
+            subprocess.run(command, cwd=self.seed_dir, env=env, check=True, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Warmed the dependency cache in {elapsed:.0f}s")
+        return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['vendor', 'warm', 'all'])
+    parser.add_argument('--dir', default=os.getenv('VENDOR_REGISTRY_DIR', '.cache/vendor'),
+                        help='registry root')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    registry = VendoredRegistry(Path(args.dir))
+    try:
+        if args.command in ('vendor', 'all'):
+            registry.build()
+        if args.command in ('warm', 'all'):
+            if not registry.available():
+                parser.error(f"nothing vendored in {registry.crates_dir}; run the vendor command first")
+            from .build_cache import BuildCache
+            registry.warm(BuildCache.from_env())
+    except subprocess.CalledProcessError as e:
+        raise SystemExit(f"{' '.join(e.cmd)} failed:\n{e.stderr}")
+    print(f"Registry {registry.fingerprint()} ready in {registry.root}")
+
+
+if __name__ == "__main__":
+    main()
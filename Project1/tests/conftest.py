@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the package the way the entry points do: `from src.x import y` from Project1/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,43 @@
+import subprocess
+
+from src.build_cache import BuildCache
+
+
+def make_project(path):
+    """A project with a local path dependency, so a build has a dependency unit to reuse"""
+    (path / 'dep' / 'src').mkdir(parents=True)
+    (path / 'dep' / 'Cargo.toml').write_text('[package]\nname = "dep"\nversion = "0.1.0"\nedition = "2021"\n')
+    (path / 'dep' / 'src' / 'lib.rs').write_text('pub fn answer() -> u32 {\n    42\n}\n')
+    (path / 'src').mkdir()
+    (path / 'Cargo.toml').write_text('[package]\nname = "demo"\nversion = "0.1.0"\nedition = "2021"\n\n'
+                                     '[dependencies]\ndep = { path = "dep" }\n')
+    (path / 'src' / 'main.rs').write_text('fn main() {\n    println!("{}", dep::answer());\n}\n')
+    return path
+
+
+def build(build_cache, project, lane):
+    with build_cache.cargo_env(project, lane) as env:
+        return subprocess.run(['cargo', 'build', '-v'], cwd=project, env=env, capture_output=True, text=True)
+
+
+def test_new_lane_starts_from_lane_zero(tmp_path):
+    build_cache = BuildCache(root=tmp_path / 'cargo-target', use_sccache=False)
+    project = make_project(tmp_path / 'project')
+    assert build(build_cache, project, 0).returncode == 0
+
+    result = build(build_cache, project, 1)
+
+    assert result.returncode == 0, result.stderr
+    assert build_cache.target_dir(project, 1) != build_cache.target_dir(project, 0)
+    assert 'Fresh dep v0.1.0' in result.stderr
+
+
+def test_lanes_do_not_wait_for_a_missing_lane_zero(tmp_path):
+    build_cache = BuildCache(root=tmp_path / 'cargo-target', use_sccache=False)
+    project = make_project(tmp_path / 'project')
+
+    result = build(build_cache, project, 2)
+
+    assert result.returncode == 0, result.stderr
+    assert 'Compiling dep v0.1.0' in result.stderr
+    assert not build_cache.target_dir(project, 0).exists()
@@ -0,0 +1,58 @@
+import json
+import shutil
+
+from src.build_cache import BuildCache
+from src.compile_cache import CompileCache, tree_hash
+from src.rust_compiler import RustCompiler, new_report
+from src.vendored_registry import VendoredRegistry
+
+LEVELS = ('check',)
+
+
+def make_project(path, dependencies=''):
+    (path / 'src').mkdir(parents=True, exist_ok=True)
+    (path / 'Cargo.toml').write_text('[package]\nname = "demo"\nversion = "0.1.0"\nedition = "2021"\n\n'
+                                     f'[dependencies]\n{dependencies}')
+    (path / 'src' / 'main.rs').write_text('fn main() {}\n')
+    return path
+
+
+def test_tree_hash_covers_lock_file_and_cargo_config(tmp_path):
+    project = make_project(tmp_path)
+    plain = tree_hash(project, 'rustc 1.0', LEVELS)
+
+    (project / 'Cargo.lock').write_text('version = 3\n')
+    locked = tree_hash(project, 'rustc 1.0', LEVELS)
+    (project / '.cargo').mkdir()
+    (project / '.cargo' / 'config.toml').write_text('[net]\noffline = true\n')
+    configured = tree_hash(project, 'rustc 1.0', LEVELS)
+
+    assert len({plain, locked, configured}) == 3
+    (project / '.cargo' / 'config.toml').unlink()
+    assert tree_hash(project, 'rustc 1.0', LEVELS) == locked
+
+
+def test_switching_registries_misses_the_cache(tmp_path):
+    crate = tmp_path / 'vendor' / 'crates' / 'foo-1.0.0'
+    (crate / 'src').mkdir(parents=True)
+    (crate / 'Cargo.toml').write_text('[package]\nname = "foo"\nversion = "1.0.0"\nedition = "2021"\n')
+    (crate / 'src' / 'lib.rs').write_text('')
+    (crate / '.cargo-checksum.json').write_text(json.dumps({'files': {}, 'package': None}))
+    registry = VendoredRegistry(tmp_path / 'vendor')
+    compiler = RustCompiler(build_cache=BuildCache(root=tmp_path / 'cargo-target', use_sccache=False,
+                                                   vendor=registry),
+                            compile_cache=CompileCache(tmp_path / 'compile.db'))
+    project = make_project(tmp_path / 'project', 'foo = "1"\n')
+
+    key, cached = compiler.lookup(project, LEVELS)
+    assert cached is None and (project / '.cargo' / 'config.toml').is_file()
+    report = dict(new_report(), status='failed', level='check', output='error: vendored build failed')
+    compiler.remember(key, False, report)
+    assert compiler.lookup(project, LEVELS)[1] is not None
+
+    # The vendored crates no longer cover the project: it goes back to the normal registry
+    shutil.rmtree(crate.parent)
+    crate.parent.mkdir()
+    key_after, cached = compiler.lookup(project, LEVELS)
+    assert not (project / '.cargo' / 'config.toml').exists()
+    assert key_after != key and cached is None
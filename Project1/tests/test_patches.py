@@ -0,0 +1,43 @@
+from src.patches import apply_hunks, apply_response, parse_patches
+
+MAIN = 'fn main() {\n    let x = 1;\n    println!("{}", x);\n}\n'
+
+
+def test_clean_diff_applies(tmp_path):
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src/main.rs').write_text(MAIN)
+    response = ('--- a/src/main.rs\n+++ b/src/main.rs\n@@ -1,4 +1,4 @@\n fn main() {\n'
+                '-    let x = 1;\n+    let x = 2;\n     println!("{}", x);\n }\n')
+    files, failures = apply_response(response, tmp_path)
+    assert failures == []
+    assert files == {'src/main.rs': MAIN.replace('x = 1', 'x = 2')}
+
+
+def test_offset_hunk_is_found_by_context():
+    content = '// header\n// more\n' + MAIN
+    hunks = parse_patches('+++ b/src/main.rs\n@@ -1,2 +1,2 @@\n-    let x = 1;\n+    let x = 3;\n'
+                          '     println!("{}", x);\n')['src/main.rs']
+    patched, failures = apply_hunks(content, hunks)
+    assert failures == []
+    assert 'let x = 3;' in patched and patched.startswith('// header\n')
+
+
+def test_mismatched_hunk_is_rejected_and_file_left_alone(tmp_path):
+    (tmp_path / 'main.rs').write_text(MAIN)
+    response = '+++ b/main.rs\n@@ -2 +2 @@\n-    let y = 1;\n+    let y = 2;\n'
+    files, failures = apply_response(response, tmp_path)
+    assert files == {}
+    assert len(failures) == 1 and failures[0].startswith('main.rs: hunk 1')
+
+
+def test_paths_outside_the_project_are_rejected(tmp_path):
+    project = tmp_path / 'project'
+    project.mkdir()
+    (tmp_path / 'secret.rs').write_text(MAIN)
+    response = ('+++ b/../secret.rs\n@@ -2 +2 @@\n-    let x = 1;\n+    let x = 2;\n\n'
+                '[FILE: ../../escape.rs]\nfn main() {}\n[END FILE]\n'
+                '[FILE: src/lib.rs]\npub fn ok() {}\n[END FILE]\n')
+    files, failures = apply_response(response, project)
+    assert files == {'src/lib.rs': 'pub fn ok() {}\n'}
+    assert sorted(failures) == ['../../escape.rs: path is outside the project directory',
+                                '../secret.rs: path is outside the project directory']
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from src.project_writer import write_project
+
+MANIFEST = '[package]\nname = "demo"\nversion = "0.1.0"\n'
+PROJECT = {'Cargo.toml': MANIFEST, 'src/main.rs': 'fn main() {}\n', 'README.md': '# Demo\n'}
+
+
+def test_writes_only_changed_files(tmp_path):
+    write_project(PROJECT, tmp_path)
+    mtime = os.stat(tmp_path / 'Cargo.toml').st_mtime_ns
+
+    changes = write_project({**PROJECT, 'src/main.rs': 'fn main() { run(); }\n'}, tmp_path)
+
+    assert changes['written'] == ['src/main.rs']
+    assert sorted(changes['unchanged']) == ['Cargo.toml', 'README.md']
+    assert os.stat(tmp_path / 'Cargo.toml').st_mtime_ns == mtime
+
+
+def test_removes_stale_files_but_keeps_cargo_state(tmp_path):
+    write_project({**PROJECT, 'src/old.rs': 'pub fn old() {}\n'}, tmp_path)
+    (tmp_path / 'Cargo.lock').write_text('# lock\n')
+    (tmp_path / 'target').mkdir()
+    (tmp_path / '.cargo').mkdir()
+    (tmp_path / '.cargo' / 'config.toml').write_text('[net]\n')
+
+    changes = write_project(PROJECT, tmp_path)
+
+    assert changes['removed'] == ['src/old.rs']
+    assert (tmp_path / 'Cargo.lock').exists() and (tmp_path / 'target').is_dir()
+    assert (tmp_path / '.cargo' / 'config.toml').exists()
+
+
+def test_empty_or_partial_file_sets_do_not_wipe_the_project(tmp_path):
+    write_project(PROJECT, tmp_path)
+
+    assert write_project({}, tmp_path)['removed'] == []
+    changes = write_project({'src/main.rs': 'fn main() { run(); }\n'}, tmp_path)
+
+    assert changes['removed'] == []
+    assert sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob('*') if p.is_file()) == [
+        'Cargo.toml', 'README.md', 'src/main.rs']
+
+
+def test_refuses_paths_outside_the_project(tmp_path):
+    with pytest.raises(ValueError):
+        write_project({'../escape.rs': 'x\n'}, tmp_path / 'project')
+    assert not (tmp_path / 'escape.rs').exists()
@@ -0,0 +1,55 @@
+from src.response_parser import parse_files
+
+MAIN_RS = 'fn main() {\n    println!("hi");\n}\n'
+
+
+def test_fenced_blocks():
+    response = ('Here you go.\n\n[FILE: Cargo.toml]\n```toml\n[package]\nname = "demo"\n```\n[END FILE]\n\n'
+                f'[FILE: src/main.rs]\n```rust\n{MAIN_RS}```\n[END FILE]\nThat is all.\n')
+    assert parse_files(response) == {'Cargo.toml': '[package]\nname = "demo"\n', 'src/main.rs': MAIN_RS}
+
+
+def test_comment_marker_inside_an_open_block_is_content():
+    response = '[FILE: src/main.rs]\n// FILE: main.rs\nfn main(){}\n[END FILE]\n'
+    assert parse_files(response) == {'src/main.rs': '// FILE: main.rs\nfn main(){}\n'}
+
+
+def test_comment_markers_used_throughout():
+    response = f'// FILE: src/lib.rs\npub fn f() {{}}\n// FILE: src/main.rs\n{MAIN_RS}'
+    assert parse_files(response) == {'src/lib.rs': 'pub fn f() {}\n', 'src/main.rs': MAIN_RS}
+
+
+def test_crlf_line_endings():
+    response = f'[FILE: src/main.rs]\r\n```rust\r\n{MAIN_RS.replace(chr(10), chr(13) + chr(10))}```\r\n[END FILE]\r\n'
+    assert parse_files(response) == {'src/main.rs': MAIN_RS}
+
+
+def test_indented_markers_dedent_their_content():
+    response = '    [FILE: src/main.rs]\n    fn main() {\n        run();\n    }\n    [END FILE]\n'
+    assert parse_files(response) == {'src/main.rs': 'fn main() {\n    run();\n}\n'}
+
+
+def test_unterminated_blocks():
+    response = f'[FILE: src/lib.rs]\npub fn f() {{}}\n[FILE: src/main.rs]\n```rust\n{MAIN_RS}'
+    assert parse_files(response) == {'src/lib.rs': 'pub fn f() {}\n', 'src/main.rs': MAIN_RS}
+
+
+def test_fences_inside_a_file_are_kept():
+    readme = '# Demo\n\nRun it with:\n\n```bash\ncargo run\n```\n'
+    response = f'[FILE: README.md]\n```markdown\n{readme}```\n[END FILE]\n'
+    assert parse_files(response) == {'README.md': readme}
+
+
+def test_lines_mentioning_file_are_content():
+    source = 'fn main() {\n    let header = "FILE: data.csv";\n}\n'
+    response = f'Each FILE: marker starts a file.\n[FILE: ./src/main.rs]\n{source}[END FILE]\n'
+    assert parse_files(response) == {'src/main.rs': source}
+
+
+def test_empty_blocks_and_repeated_paths():
+    response = '[FILE: src/empty.rs]\n\n[END FILE]\n[FILE: src/a.rs]\nold\n[END FILE]\n[FILE: src/a.rs]\nnew\n[END FILE]\n'
+    assert parse_files(response) == {'src/a.rs': 'new\n'}
+
+
+def test_no_markers():
+    assert parse_files('I cannot help with that.') == {}
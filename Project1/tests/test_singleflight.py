@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def test_identical_calls_share_one_upstream_call():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            return 'done'
+
+        results = await asyncio.gather(*(flights.do('k', upstream) for _ in range(3)))
+        return flights, results
+
+    flights, results = asyncio.run(scenario())
+    assert results == ['done'] * 3
+    assert flights.stats['upstream_calls'] == 1 and flights.stats['coalesced'] == 2
+
+
+def test_caller_after_last_waiter_left_starts_a_new_call():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def upstream():
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        first = asyncio.ensure_future(flights.do('k', upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # The cancelled call's done callback has not run yet at this point
+        return await flights.do('k', upstream), flights
+
+    result, flights = asyncio.run(scenario())
+    assert result == 2
+    assert flights.in_flight() == 0
+
+
+def test_subscriber_after_last_one_left_gets_a_new_stream():
+    async def scenario():
+        flights = SingleFlight()
+        starts = []
+
+        async def source():
+            starts.append(None)
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                yield i
+
+        async def consume():
+            return [item async for item in flights.stream('k', source)]
+
+        first = asyncio.ensure_future(consume())
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await consume(), len(starts)
+
+    items, starts = asyncio.run(scenario())
+    assert items == [0, 1, 2]
+    assert starts == 2
@@ -8,8 +8,12 @@ from sentence_transformers import SentenceTransformer
 from sklearn.neighbors import NearestNeighbors
 import numpy as np
 import time
+from collections import deque
 from datetime import datetime
 from src.project_generator import ProjectGenerator
+from src.project_writer import write_project
+from src.llm_cassette import LLMCassette
+from src import response_parser
 
 class RustKnowledgeBase:
     def __init__(self):
@@ -23,6 +27,10 @@ class RustKnowledgeBase:
         if not self.api_key:
             raise ValueError("API_KEY not found in environment variables")
         
+        # Upstream endpoint and record/replay layer (see src/llm_cassette.py)
+        self.llm_api_url = os.getenv('LLM_API_URL', "https://openrouter.ai/api/v1/chat/completions")
+        self.llm_http = LLMCassette.from_env()
+        
         # Initialize Qdrant
         self.setup_qdrant_collection()
         
@@ -38,7 +46,8 @@ class RustKnowledgeBase:
         self.cache_file = self.kb_path / 'vector_cache.npz'
         self.project_generator = ProjectGenerator()
         self._initialize_knowledge_base()
-        self.inference_times = []
+        # Bounded so long-running sessions do not grow without limit
+        self.inference_times = deque(maxlen=1000)
 
     def _initialize_knowledge_base(self):
         """Initialize knowledge base from text files"""
@@ -113,6 +122,7 @@ class RustKnowledgeBase:
                                 'similarity': 1 - hit.get('score', 0)
                             })
                     if results:
+                        self._record_inference(query, start_time, 'qdrant')
                         return sorted(results, key=lambda x: x['similarity'], reverse=True)
             except Exception as e:
                 print(f"Qdrant search failed: {e}, falling back to local search")
@@ -129,12 +139,7 @@ class RustKnowledgeBase:
                 })
                 
             # Track inference time
-            inference_time = time.time() - start_time
-            self.inference_times.append({
-                'timestamp': datetime.now(),
-                'query_length': len(query),
-                'time': inference_time
-            })
+            self._record_inference(query, start_time, 'local')
             
             return sorted(results, key=lambda x: x['similarity'], reverse=True)
             
@@ -142,6 +147,14 @@ class RustKnowledgeBase:
             print(f"Search error: {e}")
             return []
 
+    def _record_inference(self, query: str, start_time: float, source: str):
+        self.inference_times.append({
+            'timestamp': datetime.now(),
+            'query_length': len(query),
+            'time': time.time() - start_time,
+            'source': source
+        })
+
     def generate_project(self, description: str, output_dir: str = "generated_project") -> tuple[bool, str]:
         """Generate a Rust project based on knowledge base context"""
         try:
@@ -182,8 +195,8 @@ class RustKnowledgeBase:
             
             try:
                 # Make API call
-                response = requests.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
+                response = self.llm_http.post(
+                    self.llm_api_url,
                     headers=headers,
                     json={
                         "model": "deepseek/deepseek-r1-distill-llama-70b",
@@ -229,7 +242,7 @@ class RustKnowledgeBase:
             metadata = {
                 "timestamp": timestamp,
                 "original_dir": str(src_dir),
-                "inference_times": self.inference_times[-10:] if self.inference_times else []  # Last 10 queries
+                "inference_times": list(self.inference_times)[-10:]  # Last 10 queries
             }
             
             with open(backup_dir / "metadata.json", "w") as f:
@@ -351,45 +364,16 @@ class RustKnowledgeBase:
 
     @staticmethod
     def parse_files(response: str) -> Dict[str, str]:
-        """Parse response into file dictionary"""
-        files = {}
-        current_file = None
-        current_content = []
-        
-        for line in response.strip().split('\n'):
-            if '[FILE:' in line:
-                if current_file and current_content:
-                    files[current_file] = '\n'.join(current_content).strip()
-                    current_content = []
-                current_file = line.split('[FILE:', 1)[1].split(']')[0].strip()
-            elif '[END FILE]' in line:
-                if current_file and current_content:
-                    files[current_file] = '\n'.join(current_content).strip()
-                    current_content = []
-                current_file = None
-            elif current_file:
-                current_content.append(line)
-        
-        if current_file and current_content:
-            files[current_file] = '\n'.join(current_content).strip()
-        
-        return files
+        """Parse response into file dictionary (see src/response_parser.py)"""
+        return response_parser.parse_files(response)
 
     @staticmethod
-    def save_files(files: Dict[str, str], project_dir: str):
-        """Save generated files to disk"""
-        project_path = Path(project_dir)
-        project_path.mkdir(parents=True, exist_ok=True)
-        
-        for filepath, content in files.items():
-            try:
-                full_path = project_path / filepath.strip()
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                full_path.write_text(content, encoding='utf-8')
-                print(f"Created {filepath}")
-            except Exception as e:
-                print(f"Error writing {filepath}: {e}")
-                raise
+    def save_files(files: Dict[str, str], project_dir: str) -> Dict[str, List[str]]:
+        """Save generated files to disk, rewriting only those whose content changed"""
+        changes = write_project(files, project_dir)
+        for filepath in changes['written']:
+            print(f"Created {filepath}")
+        return changes
 
 def main():
     kb = RustKnowledgeBase()
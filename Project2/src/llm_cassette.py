@@ -0,0 +1 @@
+../../Project1/src/llm_cassette.py
\ No newline at end of file
@@ -9,8 +9,16 @@ from sentence_transformers import SentenceTransformer
 from sklearn.neighbors import NearestNeighbors
 import numpy as np
 import time
+from collections import deque
+from contextlib import nullcontext
 from datetime import datetime
 from src.project_generator import ProjectGenerator
+from src.project_writer import write_project
+from src.autofix import format_project
+from src.llm_cassette import LLMCassette
+from src import response_parser
+from src.build_cache import BuildCache
+from src.sandbox import SandboxLimits, run_sandboxed
 from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
 
@@ -26,6 +34,14 @@ class RustKnowledgeBase:
         if not self.api_key:
             raise ValueError("API_KEY not found in environment variables")
         
+        # Upstream endpoint and record/replay layer (see src/llm_cassette.py)
+        self.llm_api_url = os.getenv('LLM_API_URL', "https://openrouter.ai/api/v1/chat/completions")
+        self.llm_http = LLMCassette.from_env()
+        # Shared cargo target directories (see src/build_cache.py)
+        self.build_cache = BuildCache.from_env()
+        # Time, memory and output caps for cargo runs (see src/sandbox.py)
+        self.sandbox_limits = SandboxLimits.from_env()
+        
         # Initialize Qdrant
         self.setup_qdrant_collection()
         
@@ -41,7 +57,8 @@ class RustKnowledgeBase:
         self.cache_file = self.kb_path / 'vector_cache.npz'
         self.project_generator = ProjectGenerator()
         self._initialize_knowledge_base()
-        self.inference_times = []
+        # Bounded so long-running sessions do not grow without limit
+        self.inference_times = deque(maxlen=1000)
 
     def _initialize_knowledge_base(self):
         """Initialize knowledge base from text files"""
@@ -116,6 +133,7 @@ class RustKnowledgeBase:
                                 'similarity': 1 - hit.get('score', 0)
                             })
                     if results:
+                        self._record_inference(query, start_time, 'qdrant')
                         return sorted(results, key=lambda x: x['similarity'], reverse=True)
             except Exception as e:
                 print(f"Qdrant search failed: {e}, falling back to local search")
@@ -132,12 +150,7 @@ class RustKnowledgeBase:
                 })
                 
             # Track inference time
-            inference_time = time.time() - start_time
-            self.inference_times.append({
-                'timestamp': datetime.now(),
-                'query_length': len(query),
-                'time': inference_time
-            })
+            self._record_inference(query, start_time, 'local')
             
             return sorted(results, key=lambda x: x['similarity'], reverse=True)
             
@@ -145,6 +158,14 @@ class RustKnowledgeBase:
             print(f"Search error: {e}")
             return []
 
+    def _record_inference(self, query: str, start_time: float, source: str):
+        self.inference_times.append({
+            'timestamp': datetime.now(),
+            'query_length': len(query),
+            'time': time.time() - start_time,
+            'source': source
+        })
+
     def generate_project(self, description: str, output_dir: str = "generated_project") -> tuple[bool, str]:
         try:
             # Get relevant knowledge for context
@@ -189,8 +210,8 @@ class RustKnowledgeBase:
             ]
             
             # Make API call
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
+            response = self.llm_http.post(
+                self.llm_api_url,
                 headers=headers,
                 json={
                     "model": "deepseek/deepseek-r1-distill-llama-70b",
@@ -241,7 +262,7 @@ class RustKnowledgeBase:
             metadata = {
                 "timestamp": timestamp,
                 "original_dir": str(src_dir),
-                "inference_times": self.inference_times[-10:] if self.inference_times else []  # Last 10 queries
+                "inference_times": list(self.inference_times)[-10:]  # Last 10 queries
             }
             
             with open(backup_dir / "metadata.json", "w") as f:
@@ -363,61 +384,16 @@ class RustKnowledgeBase:
 
     @staticmethod
     def parse_files(response: str) -> Dict[str, str]:
-        """Parse response into file dictionary"""
-        files = {}
-        current_file = None
-        current_content = []
-        
-        for line in response.strip().split('\n'):
-            if '[FILE:' in line:
-                # Handle previous file if exists
-                if current_file and current_content:
-                    content = '\n'.join(current_content).strip()
-                    # Remove any markdown code block markers
-                    content = content.replace('```toml', '').replace('```rust', '')
-                    content = content.replace('```markdown', '').replace('```', '')
-                    files[current_file] = content.strip()
-                    current_content = []
-                # Extract new filename
-                current_file = line.split('[FILE:', 1)[1].split(']')[0].strip()
-            elif '[END FILE]' in line:
-                # Save current file
-                if current_file and current_content:
-                    content = '\n'.join(current_content).strip()
-                    # Remove any markdown code block markers
-                    content = content.replace('```toml', '').replace('```rust', '')
-                    content = content.replace('```markdown', '').replace('```', '')
-                    files[current_file] = content.strip()
-                current_file = None
-                current_content = []
-            elif current_file and not line.startswith('```'):
-                # Only add content lines that aren't markdown code block markers
-                current_content.append(line)
-        
-        # Handle last file if exists
-        if current_file and current_content:
-            content = '\n'.join(current_content).strip()
-            content = content.replace('```toml', '').replace('```rust', '')
-            content = content.replace('```markdown', '').replace('```', '')
-            files[current_file] = content.strip()
-        
-        return files
+        """Parse response into file dictionary (see src/response_parser.py)"""
+        return response_parser.parse_files(response)
 
     @staticmethod
-    def save_files(files: Dict[str, str], project_dir: str):
-        """Save generated files to disk"""
-        project_path = Path(project_dir)
-        project_path.mkdir(parents=True, exist_ok=True)
-        
-        for filepath, content in files.items():
-            try:
-                full_path = project_path / filepath.strip()
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                full_path.write_text(content, encoding='utf-8')
-                print(f"Created {filepath}")
-            except Exception as e:
-                print(f"Error writing {filepath}: {e}")
-                raise
+    def save_files(files: Dict[str, str], project_dir: str) -> Dict[str, List[str]]:
+        """Save generated files to disk, rewriting only those whose content changed"""
+        changes = write_project(files, project_dir)
+        for filepath in changes['written']:
+            print(f"Created {filepath}")
+        return changes
 
     def add_feedback(self, project_id: str, rating: int, comments: str, code_snippets: Dict[str, str]) -> bool:
         """Add user feedback for generated code"""
@@ -459,15 +435,18 @@ class RustKnowledgeBase:
         }
         
         try:
-            # Run Clippy
-            clippy_result = subprocess.run(
-                ['cargo', 'clippy', '--all-targets', '--all-features', '--', '-D', 'warnings'],
-                cwd=project_dir,
-                capture_output=True,
-                text=True
-            )
-            results["clippy"] = clippy_result.stdout if clippy_result.returncode == 0 else clippy_result.stderr
-            results["status"] &= clippy_result.returncode == 0
+            # Format in place first, so rustfmt only reports code it cannot format (syntax errors)
+            format_project(project_dir)
+
+            # Run Clippy against the shared target directory so dependencies are already built
+            cargo_env = self.build_cache.cargo_env(project_dir) if self.build_cache else nullcontext(None)
+            with cargo_env as env:
+                clippy_result = run_sandboxed(
+                    ['cargo', 'clippy', '--all-targets', '--all-features', '--', '-D', 'warnings'],
+                    str(project_dir), env, self.sandbox_limits
+                )
+            results["clippy"] = clippy_result['stdout'] if clippy_result['status'] == 'ok' else clippy_result['stderr']
+            results["status"] &= clippy_result['status'] == 'ok'
             
             # Run rustfmt
             fmt_result = subprocess.run(
@@ -476,7 +455,7 @@ class RustKnowledgeBase:
                 capture_output=True,
                 text=True
             )
-            results["rustfmt"] = fmt_result.stdout if fmt_result.returncode == 0 else fmt_result.stderr
+            results["rustfmt"] = fmt_result.stdout if fmt_result.returncode == 0 else fmt_result.stderr or fmt_result.stdout
             results["status"] &= fmt_result.returncode == 0
             
             return True, results
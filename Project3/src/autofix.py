@@ -0,0 +1 @@
+../../Project1/src/autofix.py
\ No newline at end of file
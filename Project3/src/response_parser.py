@@ -0,0 +1 @@
+../../Project1/src/response_parser.py
\ No newline at end of file
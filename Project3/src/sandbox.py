@@ -0,0 +1 @@
+../../Project1/src/sandbox.py
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""Benchmark src/response_parser.parse_files against the parsers it replaced.
+
+Builds synthetic LLM responses of growing size (fenced files, README code
+samples, source lines mentioning FILE:) and reports the best of several
+runs for each parser, plus how many files each one found.
+
+    python bench_response_parser.py [--sizes 0.01,1,5] [--file-kb 0.3,20] [--repeat 5]
+
+Response sizes are in megabytes; every size is run once per source file
+size, from many small files to a few large ones.
+"""
+import argparse
+import time
+from typing import Callable, Dict
+
+from src.response_parser import parse_files
+
+
+def legacy_line_replace(response: str) -> Dict[str, str]:
+    """Project1 ProjectGenerator.parse_llm_response / Project2 ProjectGenerator.parse_files"""
+    files = {}
+    current_file = None
+    current_content = []
+    for line in response.strip().split('\n'):
+        if '[FILE:' in line or 'FILE:' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+                current_content = []
+            current_file = line.replace('[FILE:', '').replace('FILE:', '').replace(']', '').strip()
+        elif '[END FILE]' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+                current_content = []
+            current_file = None
+        elif current_file:
+            current_content.append(line)
+    if current_file and current_content:
+        files[current_file] = '\n'.join(current_content).strip()
+    return files
+
+
+def legacy_split(response: str) -> Dict[str, str]:
+    """Project2 RustKnowledgeBase.parse_files"""
+    files = {}
+    current_file = None
+    current_content = []
+    for line in response.strip().split('\n'):
+        if '[FILE:' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+                current_content = []
+            current_file = line.split('[FILE:', 1)[1].split(']')[0].strip()
+        elif '[END FILE]' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+                current_content = []
+            current_file = None
+        elif current_file:
+            current_content.append(line)
+    if current_file and current_content:
+        files[current_file] = '\n'.join(current_content).strip()
+    return files
+
+
+def legacy_fence_replace(response: str) -> Dict[str, str]:
+    """Project3/Project4 RustKnowledgeBase.parse_files"""
+    files = {}
+    current_file = None
+    current_content = []
+    response = response.replace('```toml', '').replace('```rust', '')
+    response = response.replace('```markdown', '').replace('```', '')
+    for line in response.strip().split('\n'):
+        line = line.rstrip()
+        if '[FILE:' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+            current_file = line.split('[FILE:', 1)[1].split(']')[0].strip()
+            current_content = []
+        elif '[END FILE]' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+            current_file = None
+            current_content = []
+        elif current_file:
+            if line.strip():
+                if current_file == 'Cargo.toml':
+                    line = line.replace('```', '').strip()
+                current_content.append(line)
+    if current_file and current_content:
+        files[current_file] = '\n'.join(current_content).strip()
+    return files
+
+
+def legacy_fence_lines(content: str) -> Dict[str, str]:
+    """Project4 ProjectGenerator.parse_files"""
+    files = {}
+    current_file = None
+    lines = []
+
+    def close():
+        if lines[0].strip() == '```':
+            lines.pop(0)
+        if lines and lines[-1].strip() == '```':
+            lines.pop()
+        files[current_file] = '\n'.join(lines)
+
+    for line in content.splitlines():
+        if line.startswith('[FILE:'):
+            if current_file and lines:
+                close()
+            current_file = line[6:].strip().rstrip(']')
+            lines = []
+        elif line.startswith('[END FILE]'):
+            if current_file and lines:
+                close()
+            current_file = None
+            lines = []
+        elif current_file:
+            lines.append(line)
+    if current_file and lines:
+        close()
+    return files
+
+
+def legacy_strip_lines(response: str) -> Dict[str, str]:
+    """Project4 module-level parse_files"""
+    files = {}
+    current_file = None
+    current_content = []
+    response = response.replace('```toml', '').replace('```rust', '')
+    response = response.replace('```markdown', '').replace('```', '')
+    for line in response.strip().split('\n'):
+        line = line.strip()
+        if '[FILE:' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+                current_content = []
+            current_file = line.split('[FILE:', 1)[1].split(']')[0].strip()
+        elif '[END FILE]' in line:
+            if current_file and current_content:
+                files[current_file] = '\n'.join(current_content).strip()
+            current_file = None
+            current_content = []
+        elif current_file:
+            if line and not line.startswith('```'):
+                current_content.append(line)
+    if current_file and current_content:
+        files[current_file] = '\n'.join(current_content).strip()
+    return files
+
+
+PARSERS: Dict[str, Callable[[str], Dict[str, str]]] = {
+    'response_parser': parse_files,
+    'legacy line replace (P1, P2 generator)': legacy_line_replace,
+    'legacy split (P2 main)': legacy_split,
+    'legacy fence replace (P3/P4 main)': legacy_fence_replace,
+    'legacy fence lines (P4 generator)': legacy_fence_lines,
+    'legacy strip lines (P4 module)': legacy_strip_lines,
+}
+
+RUST_FILE = '''```rust
+use std::collections::HashMap;
+
+/// Reads the FILE: header of a record
+pub fn module_{i}(input: &str) -> HashMap<String, usize> {{
+    let mut counts = HashMap::new();
+    for word in input.split_whitespace() {{
+        *counts.entry(word.to_string()).or_insert(0) += 1;
+    }}
+    counts
+}}
+```'''
+README = '''# Generated project
+
+Run it with:
+
+```bash
+cargo run --release
+```
+'''
+
+
+def build_response(megabytes: float, file_kb: float = 0.3) -> str:
+    parts = ['Here is the project.\n', '[FILE: Cargo.toml]\n```toml\n[package]\nname = "bench"\n'
+             'version = "0.1.0"\nedition = "2021"\n```\n[END FILE]\n']
+    size, i = sum(map(len, parts)), 0
+    while size < megabytes * 1024 ** 2:
+        source = RUST_FILE.format(i=i)
+        # Repeat the code inside the fence to reach the requested file size
+        opening, code = source.split('\n', 1)
+        source = opening + '\n' + code[:-3] * max(1, int(file_kb * 1024 / len(source))) + '```'
+        part = f"\n[FILE: src/module_{i}.rs]\n{source}\n[END FILE]\n"
+        parts.append(part)
+        size += len(part)
+        i += 1
+    parts.append(f"\n[FILE: README.md]\n{README}[END FILE]\n")
+    return ''.join(parts)
+
+
+def best_time(parser: Callable[[str], Dict[str, str]], response: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(response)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='0.01,1,5', help='comma separated response sizes in MB')
+    parser.add_argument('--file-kb', default='0.3,20', help='comma separated source file sizes in KB')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for megabytes in (float(s) for s in args.sizes.split(',')):
+        for file_kb in (float(s) for s in args.file_kb.split(',')):
+            response = build_response(megabytes, file_kb)
+            print(f"\n{len(response) / 1024 ** 2:.2f} MB response, {file_kb:g} KB files")
+            run(response, args.repeat)
+
+
+def run(response: str, repeat: int):
+    baseline = None
+    for name, parse in PARSERS.items():
+        elapsed = best_time(parse, response, repeat)
+        baseline = baseline or elapsed
+        print(f"  {name:<42} {elapsed * 1000:9.2f} ms  {elapsed / baseline:5.1f}x  "
+              f"{len(parse(response))} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,16 @@ from sentence_transformers import SentenceTransformer
 from sklearn.neighbors import NearestNeighbors
 import numpy as np
 import time
+from collections import deque
+from contextlib import nullcontext
 from datetime import datetime
 from src.project_generator import ProjectGenerator
+from src.project_writer import write_project
+from src.autofix import format_project
+from src.llm_cassette import LLMCassette
+from src import response_parser
+from src.build_cache import BuildCache
+from src.sandbox import SandboxLimits, run_sandboxed
 from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
 
@@ -26,6 +34,14 @@ class RustKnowledgeBase:
         if not self.api_key:
             raise ValueError("API_KEY not found in environment variables")
         
+        # Upstream endpoint and record/replay layer (see src/llm_cassette.py)
+        self.llm_api_url = os.getenv('LLM_API_URL', "https://openrouter.ai/api/v1/chat/completions")
+        self.llm_http = LLMCassette.from_env()
+        # Shared cargo target directories (see src/build_cache.py)
+        self.build_cache = BuildCache.from_env()
+        # Time, memory and output caps for cargo runs (see src/sandbox.py)
+        self.sandbox_limits = SandboxLimits.from_env()
+        
         # Initialize Qdrant
         self.setup_qdrant_collection()
         
@@ -40,9 +56,10 @@ class RustKnowledgeBase:
         self.knowledge_store = []
         self.nn = NearestNeighbors(n_neighbors=5, metric='cosine')
         self.cache_file = self.kb_path / 'vector_cache.npz'
-        self.project_generator = ProjectGenerator()
+        self.project_generator = ProjectGenerator(knowledge_base=self)
         self._initialize_knowledge_base()
-        self.inference_times = []
+        # Bounded so long-running sessions do not grow without limit
+        self.inference_times = deque(maxlen=1000)
 
     def _initialize_knowledge_base(self):
         """Initialize knowledge base from text files"""
@@ -117,6 +134,7 @@ class RustKnowledgeBase:
                                 'similarity': 1 - hit.get('score', 0)
                             })
                     if results:
+                        self._record_inference(query, start_time, 'qdrant')
                         return sorted(results, key=lambda x: x['similarity'], reverse=True)
             except Exception as e:
                 print(f"Qdrant search failed: {e}, falling back to local search")
@@ -133,12 +151,7 @@ class RustKnowledgeBase:
                 })
                 
             # Track inference time
-            inference_time = time.time() - start_time
-            self.inference_times.append({
-                'timestamp': datetime.now(),
-                'query_length': len(query),
-                'time': inference_time
-            })
+            self._record_inference(query, start_time, 'local')
             
             return sorted(results, key=lambda x: x['similarity'], reverse=True)
             
@@ -146,83 +159,17 @@ class RustKnowledgeBase:
             print(f"Search error: {e}")
             return []
 
+    def _record_inference(self, query: str, start_time: float, source: str):
+        self.inference_times.append({
+            'timestamp': datetime.now(),
+            'query_length': len(query),
+            'time': time.time() - start_time,
+            'source': source
+        })
+
     def generate_project(self, description: str, output_dir: str = "generated_project") -> tuple[bool, str]:
-        try:
-            # Get relevant knowledge for context
-            relevant_results = self.search(description, top_k=3)
-            kb_context = "\n".join(r['content'] for r in relevant_results)
-            
-            # If local knowledge base results aren't sufficient, try web search
-            if not kb_context or len(kb_context.split()) < 50:
-                web_results = self.web_search(description)
-                web_context = "\n".join(f"From {r['url']}: {r['snippet']}" for r in web_results)
-                kb_context = f"{kb_context}\n\nAdditional context from web:\n{web_context}"
-            
-            # Prepare request  
-            headers = {
-                "Content-Type": "application/json", 
-                "Authorization": f"Bearer {self.api_key}",
-                "HTTP-Referer": "http://localhost:8000",
-                "X-Title": "Rust Code Generator"
-            }
-            
-            messages = [
-                {"role": "system", "content": """You are an expert Rust developer specializing in project generation and error handling.Generate the project in a way that is already tested to remove dependenices clash and other related issues."""},
-                {"role": "user", "content": f"""
-                Create a complete Rust project for: {description}
-                
-                Use these patterns and best practices:
-                {kb_context}
-                
-                Format the response as:
-                [FILE: Cargo.toml]
-                <content>
-                [END FILE]
-                
-                [FILE: src/main.rs]
-                <content>
-                [END FILE]
-                
-                [FILE: README.md]
-                <content>
-                [END FILE]
-                """}
-            ]
-            
-            # Make API call
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json={
-                    "model": "deepseek/deepseek-r1-distill-llama-70b",
-                    "messages": messages
-                }
-            )
-            
-            if response.status_code == 200:
-                code_response = response.json()['choices'][0]['message']['content']
-                
-                # Parse and save files
-                files = self.project_generator.parse_files(code_response)
-                self.project_generator.save_files(files, output_dir)
-                
-                # Clean up the files after saving
-                self.project_generator.cleanup_files(output_dir)
-                
-                # Run static analysis
-                analysis_success, analysis_results = self.analyze_code(output_dir)
-                if analysis_success:
-                    if analysis_results["status"]:
-                        return True, f"Project generated and analyzed successfully in {output_dir}"
-                    return False, f"Project generated but has style/lint issues:\nClippy: {analysis_results['clippy']}\nFormat: {analysis_results['rustfmt']}"
-                return False, f"Analysis failed: {analysis_results.get('error', 'Unknown error')}"
-                
-            return False, f"API Error: {response.status_code} - {response.text}"
-            
-        except requests.exceptions.RequestException as e:
-            return False, f"API request failed: {str(e)}"
-        except Exception as e:
-            return False, f"Project generation failed: {str(e)}"
+        """Generate a project with compiler-driven retries (see ProjectGenerator.generate_project)"""
+        return self.project_generator.generate_project(description, output_dir)
 
     def save_project_state(self, output_dir: str = "generated_project") -> tuple[bool, str]:
         """Save current project state with timestamp"""
@@ -245,7 +192,7 @@ class RustKnowledgeBase:
             metadata = {
                 "timestamp": timestamp,
                 "original_dir": str(src_dir),
-                "inference_times": self.inference_times[-10:] if self.inference_times else []  # Last 10 queries
+                "inference_times": list(self.inference_times)[-10:]  # Last 10 queries
             }
             
             with open(backup_dir / "metadata.json", "w") as f:
@@ -388,62 +335,16 @@ class RustKnowledgeBase:
 
     @staticmethod
     def parse_files(response: str) -> Dict[str, str]:
-        """Parse response into file dictionary"""
-        files = {}
-        current_file = None
-        current_content = []
-        
-        # Remove code block markers from entire response first
-        response = response.replace('```toml', '').replace('```rust', '')
-        response = response.replace('```markdown', '').replace('```', '')
-        
-        for line in response.strip().split('\n'):
-            line = line.rstrip()
-            if '[FILE:' in line:
-                # Handle previous file
-                if current_file and current_content:
-                    content = '\n'.join(current_content).strip()
-                    files[current_file] = content
-                    current_content = []
-                # Extract new filename    
-                current_file = line.split('[FILE:', 1)[1].split(']')[0].strip()
-            elif '[END FILE]' in line:
-                # Save current file
-                if current_file and current_content:
-                    content = '\n'.join(current_content).strip()
-                    files[current_file] = content
-                current_file = None
-                current_content = []
-            elif current_file:
-                # Only add non-empty lines
-                if line.strip():
-                    # Special handling for Cargo.toml to remove any remaining markers
-                    if current_file == 'Cargo.toml':
-                        line = line.replace('```', '').strip()
-                    current_content.append(line)
-
-        # Handle last file
-        if current_file and current_content:
-            content = '\n'.join(current_content).strip()
-            files[current_file] = content
-
-        return files
+        """Parse response into file dictionary (see src/response_parser.py)"""
+        return response_parser.parse_files(response)
 
     @staticmethod
-    def save_files(files: Dict[str, str], project_dir: str):
-        """Save generated files to disk"""
-        project_path = Path(project_dir)
-        project_path.mkdir(parents=True, exist_ok=True)
-        
-        for filepath, content in files.items():
-            try:
-                full_path = project_path / filepath.strip()
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                full_path.write_text(content, encoding='utf-8')
-                print(f"Created {filepath}")
-            except Exception as e:
-                print(f"Error writing {filepath}: {e}")
-                raise
+    def save_files(files: Dict[str, str], project_dir: str) -> Dict[str, List[str]]:
+        """Save generated files to disk, rewriting only those whose content changed"""
+        changes = write_project(files, project_dir)
+        for filepath in changes['written']:
+            print(f"Created {filepath}")
+        return changes
 
     def add_feedback(self, project_id: str, rating: int, comments: str, code_snippets: Dict[str, str]) -> bool:
         """Add user feedback for generated code"""
@@ -485,15 +386,18 @@ class RustKnowledgeBase:
         }
         
         try:
-            # Run Clippy
-            clippy_result = subprocess.run(
-                ['cargo', 'clippy', '--all-targets', '--all-features', '--', '-D', 'warnings'],
-                cwd=project_dir,
-                capture_output=True,
-                text=True
-            )
-            results["clippy"] = clippy_result.stdout if clippy_result.returncode == 0 else clippy_result.stderr
-            results["status"] &= clippy_result.returncode == 0
+            # Format in place first, so rustfmt only reports code it cannot format (syntax errors)
+            format_project(project_dir)
+
+            # Run Clippy against the shared target directory so dependencies are already built
+            cargo_env = self.build_cache.cargo_env(project_dir) if self.build_cache else nullcontext(None)
+            with cargo_env as env:
+                clippy_result = run_sandboxed(
+                    ['cargo', 'clippy', '--all-targets', '--all-features', '--', '-D', 'warnings'],
+                    str(project_dir), env, self.sandbox_limits
+                )
+            results["clippy"] = clippy_result['stdout'] if clippy_result['status'] == 'ok' else clippy_result['stderr']
+            results["status"] &= clippy_result['status'] == 'ok'
             
             # Run rustfmt
             fmt_result = subprocess.run(
@@ -502,7 +406,7 @@ class RustKnowledgeBase:
                 capture_output=True,
                 text=True
             )
-            results["rustfmt"] = fmt_result.stdout if fmt_result.returncode == 0 else fmt_result.stderr
+            results["rustfmt"] = fmt_result.stdout if fmt_result.returncode == 0 else fmt_result.stderr or fmt_result.stdout
             results["status"] &= fmt_result.returncode == 0
             
             return True, results
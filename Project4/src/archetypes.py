@@ -0,0 +1,250 @@
+"""Prebuilt project archetypes for the shapes most generation requests take.
+
+A request classified as one of ARCHETYPES starts from that archetype's
+manifest and lock file, and the model only writes the files under ``src/``.
+The archetype workspaces are built once into the shared build cache, so
+generated projects with the same manifest find their dependencies compiled.
+Generation starts that build in the background and does not wait for it;
+prebuilding ahead of time is better:
+
+    python -m src.archetypes        # prebuild every archetype
+
+Environment:
+    ARCHETYPES                   on | off (default on)
+    ARCHETYPES_DIR               where the archetype workspaces are built (default .cache/archetypes)
+    ARCHETYPES_PREBUILD_TIMEOUT  seconds one prebuild may take (default 1800)
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.project_writer import write_project
+from src.sandbox import SandboxLimits, run_sandboxed
+from src.vendored_registry import CURATED_CRATES
+
+logger = logging.getLogger(__name__)
+
+# A request is classified by ``patterns`` (each naming the archetype outright) and ``hints``
+# (suggestive on their own, not enough alone); see classify()
+ARCHETYPES = {
+    'wasm-module': {
+        'summary': 'a WebAssembly module exporting functions to JavaScript through wasm-bindgen',
+        'patterns': [r'\bwasm\b', r'webassembly', r'wasm[-_]bindgen'],
+        'hints': [r'\bbrowser\b'],
+        'manifest': '[package]\nname = "wasm_module"\nversion = "0.1.0"\nedition = "2021"\n\n'
+                    '[lib]\ncrate-type = ["cdylib", "rlib"]\n\n'
+                    '[dependencies]\nwasm-bindgen = "0.2"\n',
+        'stub': {'src/lib.rs': 'use wasm_bindgen::prelude::*;\n\n'
+                               '#[wasm_bindgen]\npub fn ping() -> u32 {\n    0\n}\n'},
+    },
+    'axum-service': {
+        'summary': 'an HTTP service on axum and tokio, with serde for JSON and tracing for logs',
+        'patterns': [r'\baxum\b', r'\bhttp (?:server|service|api)\b', r'\bweb (?:server|service)\b',
+                     r'\brest(?:ful)? api\b', r'\bmicroservice'],
+        'hints': [r'\bendpoints?\b', r'\bweb app'],
+        'manifest': '[package]\nname = "axum_service"\nversion = "0.1.0"\nedition = "2021"\n\n'
+                    '[dependencies]\naxum = "0.7"\ntokio = { version = "1", features = ["full"] }\n'
+                    'serde = { version = "1", features = ["derive"] }\nserde_json = "1"\n'
+                    'tracing = "0.1"\ntracing-subscriber = "0.3"\n',
+        'stub': {'src/main.rs': 'use axum::{routing::get, Router};\n\n#[tokio::main]\nasync fn main() {\n'
+                                '    let _app: Router = Router::new().route("/", get(|| async { "ok" }));\n}\n'},
+    },
+    'library': {
+        'summary': 'a library crate with unit tests in #[cfg(test)] modules next to the code',
+        'patterns': [r'\blibrary\b'],
+        'hints': [r'\bcrate\b', r'\bunit tests?\b', r'\bwith tests\b', r'\bdata structure'],
+        'manifest': '[package]\nname = "library"\nversion = "0.1.0"\nedition = "2021"\n\n'
+                    '[dependencies]\nthiserror = "1"\n',
+        'stub': {'src/lib.rs': 'pub fn ping() -> u32 {\n    0\n}\n\n#[cfg(test)]\nmod tests {\n'
+                               '    #[test]\n    fn ping() {\n        assert_eq!(super::ping(), 0);\n    }\n}\n'},
+    },
+    'tokio-cli': {
+        'summary': 'a command-line tool with clap for arguments, tokio for async I/O and anyhow for errors',
+        'patterns': [r'\bcli\b', r'command[- ]line', r'\btokio\b'],
+        'hints': [r'\bterminal\b', r'\barguments?\b'],
+        'manifest': '[package]\nname = "tokio_cli"\nversion = "0.1.0"\nedition = "2021"\n\n'
+                    '[dependencies]\ntokio = { version = "1", features = ["full"] }\n'
+                    'clap = { version = "4", features = ["derive"] }\nanyhow = "1"\n',
+        'stub': {'src/main.rs': '#[tokio::main]\nasync fn main() -> anyhow::Result<()> {\n    Ok(())\n}\n'},
+    },
+}
+PREBUILT_MARKER = '.prebuilt'
+FAILED_MARKER = '.prebuild-failed'
+# A pattern scores 2 and a hint 1; the best archetype needs this much and a strict lead
+PATTERN_SCORE, HINT_SCORE, MIN_SCORE = 2, 1, 2
+# Crates a description can ask for by name; those that are also everyday words say nothing
+NAMED_CRATES = {crate: re.compile(r'\b' + re.sub(r'[-_]', '[-_]', crate) + r'\b')
+                for crate in CURATED_CRATES if crate not in ('log', 'futures', 'tracing')}
+
+
+def _manifest_crates(manifest: str) -> set:
+    dependencies = manifest.split('[dependencies]', 1)[-1]
+    return {line.split('=', 1)[0].strip() for line in dependencies.splitlines() if '=' in line}
+
+
+def _score(archetype: Dict, text: str, named: set) -> int:
+    if named - _manifest_crates(archetype['manifest']):
+        return 0
+    return (PATTERN_SCORE * sum(1 for pattern in archetype['patterns'] if re.search(pattern, text))
+            + HINT_SCORE * sum(1 for hint in archetype['hints'] if re.search(hint, text)))
+
+
+def classify(description: str) -> Optional[str]:
+    """Archetype ``description`` clearly asks for, or None when unsure.
+
+    A wrong archetype costs more than none (the model gets a manifest it
+    cannot change), so a lone hint or a tie between archetypes is not
+    enough, and archetypes without a crate the description names are out.
+    """
+    text = description.lower()
+    named = {crate for crate, pattern in NAMED_CRATES.items() if pattern.search(text)}
+    scores = {name: _score(archetype, text, named) for name, archetype in ARCHETYPES.items()}
+    ranked = sorted(scores, key=lambda name: scores[name], reverse=True)
+    best, runner_up = scores[ranked[0]], scores[ranked[1]]
+    return ranked[0] if best >= MIN_SCORE and best > runner_up else None
+
+
+class ArchetypeLibrary:
+    """Archetype workspaces under ``root``, each prebuilt once per manifest and toolchain"""
+
+    def __init__(self, root: Path = Path('.cache/archetypes'), limits: Optional[SandboxLimits] = None):
+        self.root = Path(root)
+        # Prebuilds compile every dependency, so they get far more time than one verification
+        self.limits = limits or SandboxLimits(timeout=1800.0)
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Thread] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional['ArchetypeLibrary']:
+        """Configure from ARCHETYPES* variables; ``ARCHETYPES=off`` always generates whole projects"""
+        if os.getenv('ARCHETYPES', 'on').lower() in ('off', '0', 'false'):
+            return None
+        limits = SandboxLimits.from_env()
+        limits.timeout = float(os.getenv('ARCHETYPES_PREBUILD_TIMEOUT', '1800'))
+        return cls(Path(os.getenv('ARCHETYPES_DIR', '.cache/archetypes')), limits)
+
+    @staticmethod
+    def classify(description: str) -> Optional[str]:
+        return classify(description)
+
+    def workspace(self, name: str) -> Path:
+        return self.root / name
+
+    @staticmethod
+    def _stamp(name: str, build_cache=None) -> str:
+        toolchain = build_cache.toolchain if build_cache is not None else ''
+        return hashlib.sha256(f"{ARCHETYPES[name]['manifest']}\0{toolchain}".encode('utf-8')).hexdigest()[:16]
+
+    def _has_stamp(self, name: str, marker: str, stamp: str) -> bool:
+        path = self.workspace(name) / marker
+        return path.is_file() and path.read_text() == stamp
+
+    def ready(self, name: str, build_cache=None) -> bool:
+        workspace = self.workspace(name)
+        return (self._has_stamp(name, PREBUILT_MARKER, self._stamp(name, build_cache))
+                and (workspace / 'Cargo.lock').is_file()
+                and (build_cache is None or build_cache.target_dir(workspace).exists()))
+
+    def prepare(self, name: str, build_cache=None, wait: bool = False) -> bool:
+        """Whether the archetype is prebuilt, starting its prebuild in the background if not.
+
+        Generation does not wait: until the prebuild is done, requests take
+        the normal path. A failed prebuild is remembered per manifest and
+        toolchain and not retried by generation; with ``wait`` (the CLI)
+        the prebuild runs in the foreground and failures are retried.
+        """
+        if self.ready(name, build_cache):
+            return True
+        stamp = self._stamp(name, build_cache)
+        with self._lock:
+            thread = self._building.get(name)
+            if thread is None and (wait or not self._has_stamp(name, FAILED_MARKER, stamp)):
+                thread = threading.Thread(target=self._prebuild, args=(name, stamp, build_cache),
+                                          name=f'prebuild-{name}', daemon=True)
+                self._building[name] = thread
+                thread.start()
+        if thread is not None and wait:
+            thread.join()
+            return self.ready(name, build_cache)
+        return False
+
+    def _prebuild(self, name: str, stamp: str, build_cache=None):
+        """Build the workspace, compiling its dependencies into the shared target dir.
+
+        The workspace's Cargo.lock is what projects started from it use, so
+        they resolve to exactly the versions compiled here.
+        """
+        workspace = self.workspace(name)
+        try:
+            write_project({'Cargo.toml': ARCHETYPES[name]['manifest'], **ARCHETYPES[name]['stub']}, workspace)
+            # Without a shared target dir there is nothing to warm; locking the versions is still worth it
+            commands = [['cargo', 'check'], ['cargo', 'build']] if build_cache is not None else [
+                ['cargo', 'generate-lockfile']]
+            cargo_env = build_cache.cargo_env(workspace) if build_cache is not None else nullcontext(None)
+            with cargo_env as env:
+                for command in commands:
+                    result = run_sandboxed(command, str(workspace), env, self.limits)
+                    if result['status'] != 'ok':
+                        raise RuntimeError(f"{' '.join(command)} {result['status']}:\n{result['stderr'][-2000:]}")
+            (workspace / PREBUILT_MARKER).write_text(stamp)
+            (workspace / FAILED_MARKER).unlink(missing_ok=True)
+            logger.info(f"Prebuilt archetype {name}")
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Could not prebuild archetype {name}: {e}")
+            try:
+                (workspace / FAILED_MARKER).write_text(stamp)
+            except OSError:
+                pass
+        finally:
+            with self._lock:
+                self._building.pop(name, None)
+
+    def project_files(self, name: str, generated: Dict[str, str]) -> Dict[str, str]:
+        """The archetype's manifest and lock file with the ``src/`` files the model wrote"""
+        files = {'Cargo.toml': ARCHETYPES[name]['manifest']}
+        lock_path = self.workspace(name) / 'Cargo.lock'
+        if lock_path.is_file():
+            files['Cargo.lock'] = lock_path.read_text(encoding='utf-8')
+        # Anything else the model sends (a Cargo.toml of its own, say) would undo the prebuilt manifest
+        files.update({path.strip(): content for path, content in generated.items()
+                      if path.strip().startswith('src/')})
+        return files
+
+    def prompt(self, name: str, description: str, context: str) -> str:
+        """User message asking only for the ``src/`` files of an archetype project"""
+        archetype = ARCHETYPES[name]
+        entry = next(iter(archetype['stub']))
+        return f"""
+                    Write the source code of a Rust project for: {description}
+
+                    The project is {archetype['summary']}.
+                    It already has this Cargo.toml, with every dependency compiled; do not repeat or change it:
+                    ```toml
+{archetype['manifest']}```
+
+                    Use these patterns and best practices:
+                    {context}
+
+                    Reply only with the files under src/, starting with {entry}, formatted as:
+                    [FILE: {entry}]
+                    <content>
+                    [END FILE]
+                    """
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from src.build_cache import BuildCache
+    library = ArchetypeLibrary.from_env() or ArchetypeLibrary()
+    build_cache = BuildCache.from_env()
+    for name in ARCHETYPES:
+        print(f"{name}: {'ready' if library.prepare(name, build_cache, wait=True) else 'failed'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+../../Project1/src/build_cache.py
\ No newline at end of file
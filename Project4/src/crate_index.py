@@ -0,0 +1,275 @@
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from src.vendored_registry import VendoredRegistry
+
+logger = logging.getLogger(__name__)
+
+VERSION = re.compile(r'^(\d+)(?:\.(\d+|\*))?(?:\.(\d+|\*))?(?:-([0-9A-Za-z.-]+))?(?:\+\S+)?$')
+CRATE_FILE = re.compile(r'^(.+?)-(\d+\.\d+\.\d+\S*)\.crate$')
+SOURCE_DIR = re.compile(r'^(.+?)-(\d+\.\d+\.\d+\S*)$')
+DEPENDENCY_SECTIONS = ('dependencies', 'dev-dependencies', 'build-dependencies')
+DEPENDENCY_LINE = re.compile(r'^\s*([A-Za-z0-9_-]+)\s*=\s*(.+?)\s*$')
+
+
+def parse_version(version: str) -> Optional[Tuple[int, int, int, str]]:
+    match = VERSION.match(version.strip())
+    if not match or '*' in version:
+        return None
+    major, minor, patch, pre = match.groups()
+    return int(major), int(minor or 0), int(patch or 0), pre or ''
+
+
+def version_key(version: str) -> tuple:
+    """Sort key ordering releases above their pre-releases"""
+    parsed = parse_version(version) or (0, 0, 0, '')
+    return parsed[:3] + (parsed[3] == '', parsed[3])
+
+
+def _comparator_matches(comparator: str, version: Tuple[int, int, int, str]) -> bool:
+    match = re.match(r'^(\^|~|=|>=|>|<=|<)?\s*(.+)$', comparator.strip())
+    if not match:
+        return False
+    op, required = match.group(1) or '^', match.group(2)
+    if required == '*':
+        return True
+    parts = VERSION.match(required)
+    if not parts:
+        return False
+    major, minor, patch = (None if p in (None, '*') else int(p) for p in parts.groups()[:3])
+    # "=1.2" and "1.2.*" cover every patch release of 1.2, exactly like "~1.2"
+    if (op == '=' and patch is None) or '*' in required:
+        op = '~'
+    low = (major, minor or 0, patch or 0)
+    current = version[:3]
+
+    if op == '^':
+        if major > 0 or minor is None:
+            high = (major + 1, 0, 0)
+        elif minor > 0 or patch is None:
+            high = (0, minor + 1, 0)
+        else:
+            high = (0, 0, patch + 1)
+        return low <= current < high
+    if op == '~':
+        high = (major + 1, 0, 0) if minor is None else (major, minor + 1, 0)
+        return low <= current < high
+    if op == '=':
+        return current == low and version[3] == (parts.group(4) or '')
+    return {'>=': current >= low, '>': current > low, '<=': current <= low, '<': current < low}[op]
+
+
+def satisfies(version: str, requirement: str) -> bool:
+    """Whether ``version`` meets a Cargo version requirement (``"1.2"``, ``"^0.8"``, ``">=1, <2"``, ...)"""
+    parsed = parse_version(version)
+    if parsed is None:
+        return False
+    # Pre-releases only match requirements that name a pre-release themselves
+    if parsed[3] and '-' not in requirement:
+        return False
+    return all(_comparator_matches(part, parsed) for part in requirement.split(','))
+
+
+class CrateIndex:
+    """Versions and features of the crates available in the local cargo registry.
+
+    Built from what cargo already keeps under ``$CARGO_HOME/registry``: the
+    index cache (every published version with its features), unpacked
+    sources and downloaded ``.crate`` files. Names are looked up with ``-``
+    and ``_`` treated alike, as they are in ``use`` paths. Nothing here
+    touches the network; crates the machine has never seen are unknown.
+    Crates in ``vendor_dir`` (a VendoredRegistry) count as downloaded, so
+    offline builds get pinned to the vendored versions.
+    """
+
+    def __init__(self, registry_dir: Optional[Path] = None, vendor_dir: Optional[Path] = None):
+        cargo_home = Path(os.getenv('CARGO_HOME', Path.home() / '.cargo'))
+        self.registry_dir = Path(registry_dir) if registry_dir else cargo_home / 'registry'
+        self.vendor_dir = Path(vendor_dir) if vendor_dir else None
+        # crate name -> version -> {'features': set, 'yanked': bool, 'downloaded': bool}
+        self.crates: Dict[str, Dict[str, Dict]] = {}
+        self._names: Dict[str, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['CrateIndex']:
+        """Configure from CRATE_INDEX* variables; ``CRATE_INDEX=off`` disables it"""
+        if os.getenv('CRATE_INDEX', 'on').lower() in ('off', '0', 'false'):
+            return None
+        registry_dir = os.getenv('CRATE_INDEX_REGISTRY')
+        vendor = VendoredRegistry.from_env()
+        return cls(Path(registry_dir) if registry_dir else None, vendor.crates_dir if vendor else None)
+
+    def load(self):
+        """Scan the registry once; later calls are free"""
+        with self._lock:
+            if self._loaded:
+                return
+            for cache_file in self.registry_dir.glob('index/*/.cache/**/*'):
+                if cache_file.is_file():
+                    self._load_index_cache(cache_file)
+            source_dirs = list(self.registry_dir.glob('src/*/*'))
+            if self.vendor_dir is not None:
+                source_dirs += self.vendor_dir.iterdir() if self.vendor_dir.is_dir() else []
+            for source_dir in source_dirs:
+                match = SOURCE_DIR.match(source_dir.name)
+                if match and (source_dir / 'Cargo.toml').is_file():
+                    self._add(match.group(1), match.group(2), self._manifest_features(source_dir / 'Cargo.toml'),
+                              downloaded=True)
+            for crate_file in self.registry_dir.glob('cache/*/*.crate'):
+                match = CRATE_FILE.match(crate_file.name)
+                if match:
+                    self._add(match.group(1), match.group(2), None, downloaded=True)
+            self._names = {name.replace('-', '_'): name for name in self.crates}
+            self._loaded = True
+        logger.info(f"Crate index: {len(self.crates)} crates from {self.registry_dir}")
+
+    def _add(self, name: str, version: str, features: Optional[set], yanked: bool = False,
+             downloaded: bool = False):
+        entry = self.crates.setdefault(name, {}).setdefault(
+            version, {'features': None, 'yanked': yanked, 'downloaded': False})
+        entry['downloaded'] |= downloaded
+        if features is not None:
+            entry['features'] = set(features) | (entry['features'] or set())
+
+    def _load_index_cache(self, path: Path):
+        """Entries of one index cache file: a small header, then NUL-separated version / JSON pairs"""
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return
+        for chunk in data.split(b'\0'):
+            if not chunk.startswith(b'{'):
+                continue
+            try:
+                record = json.loads(chunk)
+            except ValueError:
+                continue
+            features = set(record.get('features') or {}) | set(record.get('features2') or {})
+            # Optional dependencies are implicit features unless referenced with "dep:"
+            features |= {dep['name'] for dep in record.get('deps') or [] if dep.get('optional')}
+            self._add(record['name'], record['vers'], features, record.get('yanked', False))
+
+    @staticmethod
+    def _manifest_features(manifest_path: Path) -> Optional[set]:
+        if tomllib is None:
+            return None
+        try:
+            manifest = tomllib.loads(manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        features = set(manifest.get('features') or {})
+        features |= {name for name, spec in (manifest.get('dependencies') or {}).items()
+                     if isinstance(spec, dict) and spec.get('optional')}
+        return features
+
+    def name(self, crate: str) -> Optional[str]:
+        """Registry spelling of a crate name as written in code or a manifest"""
+        self.load()
+        return self._names.get(crate.replace('-', '_'))
+
+    def versions(self, crate: str) -> List[str]:
+        """Known, non-yanked versions of ``crate``: downloaded ones first, each group newest first"""
+        name = self.name(crate)
+        if name is None:
+            return []
+        entries = self.crates[name]
+        return sorted((v for v, entry in entries.items() if not entry['yanked']),
+                      key=lambda v: (entries[v]['downloaded'], version_key(v)), reverse=True)
+
+    def features(self, crate: str, version: str) -> Optional[set]:
+        """Features of one version, or None when only the version is known"""
+        name = self.name(crate)
+        entry = self.crates.get(name, {}).get(version) if name else None
+        return entry['features'] if entry else None
+
+    def resolve(self, crate: str, requirement: str = '*') -> Optional[str]:
+        """Newest version meeting ``requirement``, preferring ones already downloaded, or None"""
+        return next((v for v in self.versions(crate) if satisfies(v, requirement)), None)
+
+    def requirement(self, crate: str) -> Optional[str]:
+        """Dependency spec for ``crate`` at its newest release (downloaded if any), e.g. ``"1.0.197"``"""
+        releases = [v for v in self.versions(crate) if parse_version(v) and not parse_version(v)[3]]
+        return f'"{releases[0]}"' if releases else None
+
+
+def _toml_value(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return '[' + ', '.join(_toml_value(v) for v in value) + ']'
+    return json.dumps(value)
+
+
+def format_dependency(name: str, spec: Dict) -> str:
+    if set(spec) == {'version'}:
+        return f'{name} = {_toml_value(spec["version"])}'
+    return f'{name} = {{ ' + ', '.join(f'{key} = {_toml_value(value)}' for key, value in spec.items()) + ' }'
+
+
+def resolve_manifest(manifest: str, index: CrateIndex) -> Tuple[str, List[str]]:
+    """Rewrite dependency lines so every crate the index knows resolves to a local version.
+
+    Requirements no known version meets are replaced by the newest known
+    release, and features that version does not have are dropped. Crates
+    that come from a path or git, or that the index does not know, are
+    left untouched. Returns the manifest and a note per change.
+    """
+    if tomllib is None:
+        return manifest, []
+    lines = manifest.splitlines()
+    changes = []
+    section = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith('['):
+            section = stripped.strip('[]').strip()
+            continue
+        match = DEPENDENCY_LINE.match(stripped)
+        if section not in DEPENDENCY_SECTIONS or not match:
+            continue
+        try:
+            name, spec = next(iter(tomllib.loads(stripped).items()))
+        except (ValueError, StopIteration):
+            continue
+        spec = {'version': spec} if isinstance(spec, str) else dict(spec)
+        crate = spec.get('package', name)
+        if 'path' in spec or 'git' in spec or not index.versions(crate):
+            continue
+
+        requirement = spec.get('version', '*')
+        version = index.resolve(crate, requirement)
+        changed = False
+        if version is None:
+            version = index.requirement(crate)
+            if version is None:
+                continue
+            version = version.strip('"')
+            spec['version'] = version
+            changes.append(f"{name}: {requirement} -> {version}")
+            changed = True
+        available = index.features(crate, version)
+        if available is not None and spec.get('features'):
+            kept = [f for f in spec['features'] if f in available]
+            if kept != spec['features']:
+                changes.append(f"{name}: dropped features {sorted(set(spec['features']) - set(kept))}")
+                spec['features'] = kept
+                if not kept:
+                    del spec['features']
+                changed = True
+        if changed:
+            lines[i] = format_dependency(name, spec)
+    if not changes:
+        return manifest, []
+    return '\n'.join(lines) + ('\n' if manifest.endswith('\n') else ''), changes
@@ -0,0 +1,140 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Keys of a diagnostic record as returned by parse_cargo_messages
+DIAGNOSTIC_FIELDS = ('level', 'code', 'message', 'file', 'line', 'column', 'spans', 'suggestions', 'rendered')
+LEVEL_ORDER = {'error': 0, 'warning': 1}
+
+
+def _spans(span_list: List[Dict]) -> List[Dict]:
+    return [{
+        'file': span['file_name'],
+        'line_start': span['line_start'],
+        'line_end': span['line_end'],
+        'column_start': span['column_start'],
+        'column_end': span['column_end'],
+        'label': span.get('label'),
+        'is_primary': span.get('is_primary', False),
+    } for span in span_list]
+
+
+def _suggestions(message: Dict) -> List[Dict]:
+    """Replacements offered by rustc in the children of a diagnostic (``help: ...``)"""
+    suggestions = []
+    for child in message.get('children') or []:
+        for span in child.get('spans') or []:
+            if span.get('suggested_replacement') is None:
+                continue
+            suggestions.append({
+                'message': child['message'],
+                'file': span['file_name'],
+                'line_start': span['line_start'],
+                'line_end': span['line_end'],
+                'column_start': span['column_start'],
+                'column_end': span['column_end'],
+                'byte_start': span['byte_start'],
+                'byte_end': span['byte_end'],
+                'replacement': span['suggested_replacement'],
+                'applicability': span.get('suggestion_applicability'),
+            })
+    return suggestions
+
+
+def parse_cargo_messages(stdout: str) -> List[Dict]:
+    """Distinct compiler diagnostics from ``cargo ... --message-format=json`` output, errors first"""
+    diagnostics = []
+    seen = set()
+    for line in stdout.splitlines():
+        if not line.startswith('{'):
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get('reason') != 'compiler-message':
+            continue
+        message = record['message']
+        level = message.get('level')
+        # Summaries such as "aborting due to 2 previous errors" carry no location
+        if level not in LEVEL_ORDER or not message.get('spans'):
+            continue
+
+        spans = _spans(message['spans'])
+        primary = next((s for s in spans if s['is_primary']), spans[0])
+        code = (message.get('code') or {}).get('code')
+        key = (level, code, message['message'], primary['file'], primary['line_start'], primary['column_start'])
+        if key in seen:
+            continue
+        seen.add(key)
+        diagnostics.append({
+            'level': level,
+            'code': code,
+            'message': message['message'],
+            'file': primary['file'],
+            'line': primary['line_start'],
+            'column': primary['column_start'],
+            'spans': spans,
+            'suggestions': _suggestions(message),
+            'rendered': message.get('rendered') or message['message'],
+        })
+    diagnostics.sort(key=lambda d: LEVEL_ORDER[d['level']])
+    return diagnostics
+
+
+def errors(diagnostics: Iterable[Dict]) -> List[Dict]:
+    return [d for d in diagnostics if d['level'] == 'error']
+
+
+def plain_output(stdout: str, stderr: str) -> str:
+    """Everything cargo printed that is not a JSON message (test output, manifest errors, ...)"""
+    lines = [line for line in stdout.splitlines() if not line.startswith('{')]
+    return '\n'.join(filter(None, [stderr.strip(), '\n'.join(lines).strip()]))
+
+
+def render(diagnostics: List[Dict], fallback: str = '') -> str:
+    """Human-readable compiler output, one rendered block per distinct diagnostic"""
+    if not diagnostics:
+        return fallback
+    return '\n'.join(d['rendered'].rstrip() for d in diagnostics)
+
+
+def source_snippet(project_dir: Path, file: str, line: int, context: int = 3) -> Optional[str]:
+    """Numbered source lines around ``line`` of ``file`` (relative to the project)"""
+    path = Path(project_dir) / file
+    if not path.is_file():
+        return None
+    lines = path.read_text(encoding='utf-8', errors='replace').splitlines()
+    start = max(line - context, 1)
+    end = min(line + context, len(lines))
+    return '\n'.join(f"{n:>4} | {lines[n - 1]}" for n in range(start, end + 1))
+
+
+def fix_context(diagnostics: List[Dict], project_dir, top_n: int = 5, fallback: str = '') -> str:
+    """Compact error summary for a fix prompt: top-N distinct errors with their source snippets"""
+    selected = errors(diagnostics)[:top_n]
+    if not selected:
+        return fallback
+    sections = []
+    for i, diagnostic in enumerate(selected, 1):
+        code = f"[{diagnostic['code']}]" if diagnostic['code'] else ''
+        section = [f"{i}. error{code}: {diagnostic['message']}",
+                   f"   --> {diagnostic['file']}:{diagnostic['line']}:{diagnostic['column']}"]
+        labels = [s['label'] for s in diagnostic['spans'] if s['label']]
+        if labels:
+            section.append("   note: " + "; ".join(labels))
+        snippet = source_snippet(project_dir, diagnostic['file'], diagnostic['line'])
+        if snippet:
+            section.append(snippet)
+        for suggestion in diagnostic['suggestions'][:2]:
+            section.append(f"   help: {suggestion['message']}: `{suggestion['replacement']}`")
+        sections.append('\n'.join(section))
+    remaining = len(errors(diagnostics)) - len(selected)
+    if remaining > 0:
+        sections.append(f"... and {remaining} more error(s)")
+    return '\n\n'.join(sections)
+
+
+def compact(diagnostics: List[Dict]) -> List[Dict]:
+    """Diagnostics without the rendered text, small enough to store with every interaction"""
+    return [{k: v for k, v in d.items() if k != 'rendered'} for d in diagnostics]
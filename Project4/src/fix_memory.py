@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+USE_LINE = re.compile(r'^\s*(pub\s+)?use\s+[\w:{}, *]+;\s*$')
+DEPENDENCY_LINE = re.compile(r'^\s*([A-Za-z0-9_-]+)\s*=')
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+# A remembered fix that failed this often, and more often than it worked, is no longer tried
+MAX_FAILURES = 2
+
+
+def error_signature(diagnostic: Dict) -> str:
+    """Error code and message with numbers normalized, so the same mistake matches across projects"""
+    message = re.sub(r'\d+', 'N', ' '.join(diagnostic['message'].split()))
+    return f"{diagnostic['code'] or ''}:{message}"
+
+
+def snapshot(project_dir) -> Dict[str, str]:
+    """Cargo.toml and Rust sources of a project, keyed by path relative to it"""
+    project_path = Path(project_dir)
+    paths = [project_path / 'Cargo.toml'] + sorted(project_path.glob('src/**/*.rs'))
+    return {p.relative_to(project_path).as_posix(): p.read_text(encoding='utf-8', errors='replace')
+            for p in paths if p.is_file()}
+
+
+def _dependencies(manifest: str) -> Dict[str, str]:
+    """``[dependencies]`` entries of a manifest, name to line"""
+    entries, section = {}, None
+    for line in manifest.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('['):
+            section = stripped.strip('[]').strip()
+        elif section == 'dependencies':
+            match = DEPENDENCY_LINE.match(stripped)
+            if match:
+                entries[match.group(1)] = stripped
+    return entries
+
+
+def _set_dependencies(manifest: str, dependencies: Dict[str, str]) -> str:
+    """Replace or add ``[dependencies]`` lines, creating the table if needed"""
+    lines = manifest.splitlines()
+    pending = dict(dependencies)
+    section, insert_at = None, None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith('['):
+            section = stripped.strip('[]').strip()
+            if section == 'dependencies':
+                insert_at = i + 1
+        elif section == 'dependencies':
+            match = DEPENDENCY_LINE.match(stripped)
+            if match and match.group(1) in pending:
+                lines[i] = pending.pop(match.group(1))
+            if stripped:
+                insert_at = i + 1
+    if pending:
+        if insert_at is None:
+            lines += ['', '[dependencies]']
+            insert_at = len(lines)
+        lines[insert_at:insert_at] = list(pending.values())
+    return '\n'.join(lines) + '\n'
+
+
+def _add_uses(source: str, uses: List[str]) -> str:
+    """Insert ``use`` lines that are not there yet after the existing ones"""
+    lines = source.splitlines()
+    present = {line.strip() for line in lines}
+    missing = [use for use in uses if use not in present]
+    if not missing:
+        return source
+    last_use = max((i for i, line in enumerate(lines) if USE_LINE.match(line)), default=-1)
+    lines[last_use + 1:last_use + 1] = missing
+    return '\n'.join(lines) + '\n'
+
+
+def _names(diagnostic: Dict) -> set:
+    """Identifiers the diagnostic talks about, including in rustc's suggestions"""
+    text = ' '.join(re.findall(r'`([^`]+)`', diagnostic['message']))
+    text += ' ' + ' '.join(s['replacement'] + ' ' + s['message'] for s in diagnostic.get('suggestions') or [])
+    return set(IDENTIFIER.findall(text))
+
+
+def extract_fix(diagnostic: Dict, before: Dict[str, str], after: Dict[str, str],
+                only_error: bool = False) -> Optional[Dict]:
+    """The dependency and ``use`` changes between two trees that plausibly fixed ``diagnostic``.
+
+    Changes are attributed by the names the error mentions; when it was
+    the only error, every such change is attributed to it.
+    """
+    names = _names(diagnostic)
+    old_deps = _dependencies(before.get('Cargo.toml', ''))
+    dependencies = {name: line for name, line in _dependencies(after.get('Cargo.toml', '')).items()
+                    if old_deps.get(name) != line and (only_error or name.replace('-', '_') in names)}
+
+    old_lines = {line.strip() for line in before.get(diagnostic['file'], '').splitlines()}
+    uses = [line.strip() for line in after.get(diagnostic['file'], '').splitlines()
+            if USE_LINE.match(line) and line.strip() not in old_lines
+            and (only_error or names & set(IDENTIFIER.findall(line)))]
+
+    if not dependencies and not uses:
+        return None
+    return {'dependencies': dependencies, 'uses': uses}
+
+
+class FixMemory:
+    """Persistent map from normalized error signatures to the fixes that made them go away.
+
+    Fixes are the ``[dependencies]`` entries and ``use`` lines that changed
+    between a failing attempt and the next green one, which covers the
+    errors that recur most (unresolved imports, traits not in scope,
+    missing crates and features). All entries are held in a dict for O(1)
+    lookup and written through to SQLite.
+    """
+
+    def __init__(self, db_path: Path = Path('.cache/fix_memory.db')):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self.stats = {'applied': 0, 'recorded': 0}
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS fix_memory (
+                    signature TEXT PRIMARY KEY,
+                    fix TEXT NOT NULL,
+                    successes INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            rows = self.conn.execute("SELECT signature, fix, successes, failures FROM fix_memory").fetchall()
+        self.entries: Dict[str, Dict] = {
+            signature: {'fix': json.loads(fix), 'successes': successes, 'failures': failures}
+            for signature, fix, successes, failures in rows
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional['FixMemory']:
+        """Configure from FIX_MEMORY_* variables; ``FIX_MEMORY=off`` disables it"""
+        if os.getenv('FIX_MEMORY', 'on').lower() in ('off', '0', 'false'):
+            return None
+        return cls(db_path=Path(os.getenv('FIX_MEMORY_DB', '.cache/fix_memory.db')))
+
+    def lookup(self, diagnostic: Dict) -> Optional[Dict]:
+        entry = self.entries.get(error_signature(diagnostic))
+        if entry is None or (entry['failures'] >= MAX_FAILURES and entry['failures'] > entry['successes']):
+            return None
+        return entry['fix']
+
+    def record(self, diagnostics: List[Dict], before: Dict[str, str], after: Dict[str, str]) -> int:
+        """Remember what changed between a failing tree and the green one that followed it"""
+        failed = [d for d in diagnostics if d['level'] == 'error']
+        recorded = 0
+        for diagnostic in failed:
+            fix = extract_fix(diagnostic, before, after, only_error=len(failed) == 1)
+            if fix is None:
+                continue
+            signature = error_signature(diagnostic)
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO fix_memory (signature, fix) VALUES (?, ?) "
+                    "ON CONFLICT(signature) DO UPDATE SET fix = excluded.fix",
+                    (signature, json.dumps(fix))
+                )
+                entry = self.entries.setdefault(signature, {'successes': 0, 'failures': 0})
+                entry['fix'] = fix
+            recorded += 1
+        self.stats['recorded'] += recorded
+        if recorded:
+            logger.info(f"Remembered fixes for {recorded} error signature(s)")
+        return recorded
+
+    def apply(self, files: Dict[str, str], diagnostics: List[Dict]) -> Tuple[Dict[str, str], List[str]]:
+        """Files changed by the remembered fixes for ``diagnostics`` and the signatures used"""
+        patched: Dict[str, str] = {}
+        used = []
+        for diagnostic in diagnostics:
+            if diagnostic['level'] != 'error':
+                continue
+            fix = self.lookup(diagnostic)
+            if fix is None:
+                continue
+            if fix['dependencies'] and 'Cargo.toml' in files:
+                current = patched.get('Cargo.toml', files['Cargo.toml'])
+                patched['Cargo.toml'] = _set_dependencies(current, fix['dependencies'])
+            if fix['uses'] and diagnostic['file'] in files:
+                current = patched.get(diagnostic['file'], files[diagnostic['file']])
+                patched[diagnostic['file']] = _add_uses(current, fix['uses'])
+            used.append(error_signature(diagnostic))
+        patched = {path: content for path, content in patched.items() if content != files[path]}
+        if patched:
+            self.stats['applied'] += 1
+        return patched, list(dict.fromkeys(used))
+
+    def feedback(self, signatures: List[str], success: bool):
+        """Count whether remembered fixes helped, so ones that keep failing stop being tried"""
+        column = 'successes' if success else 'failures'
+        with self._lock, self.conn:
+            for signature in signatures:
+                self.conn.execute(f"UPDATE fix_memory SET {column} = {column} + 1 WHERE signature = ?",
+                                  (signature,))
+                if signature in self.entries:
+                    self.entries[signature][column] += 1
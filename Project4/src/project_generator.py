@@ -1,104 +1,136 @@
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 import logging
+from src.project_writer import write_project
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+import requests
+from src.llm_cassette import LLMCassette
+from src.build_cache import BuildCache
+from src.compile_cache import CompileCache, tree_hash
+from src.sandbox import SandboxLimits, run_sandboxed
+from src.fix_memory import FixMemory, snapshot
+from src.autofix import add_dependencies, autofix, missing_dependencies
+from src.crate_index import CrateIndex, resolve_manifest
+from src.archetypes import ArchetypeLibrary
+from src.response_parser import parse_files
+from src import diagnostics as rustc_diagnostics
 
 logger = logging.getLogger(__name__)
 
+# Verification levels from cheapest to most expensive; check yields diagnostics without codegen
+VERIFY_COMMANDS = {
+    'check': ['cargo', 'check', '--message-format=json'],
+    'build': ['cargo', 'build', '--message-format=json'],
+    'test': ['cargo', 'test', '--message-format=json'],
+}
+# Distinct errors (with source snippets) fed back into the next attempt
+FIX_CONTEXT_ERRORS = int(os.getenv('FIX_CONTEXT_ERRORS', '5'))
+# Best-of-N: candidates requested concurrently per attempt, cycling through these models and temperatures
+BEST_OF_N = int(os.getenv('BEST_OF_N', '1'))
+CANDIDATE_MODELS = os.getenv('CANDIDATE_MODELS', 'deepseek/deepseek-r1-distill-llama-70b').split(',')
+CANDIDATE_TEMPERATURES = [float(t) for t in os.getenv('CANDIDATE_TEMPERATURES', '0.2,0.6,1.0').split(',')]
+
 class ProjectGenerator:
-    def __init__(self, llm_client=None):
+    def __init__(self, llm_client=None, knowledge_base=None):
         self.llm_client = llm_client
+        # Supplies search/web_search context, the API key and analyze_code (main.RustKnowledgeBase)
+        self.knowledge_base = knowledge_base
         self.cache_dir = Path("./generated_projects")
         self.cache_dir.mkdir(exist_ok=True)
+        self.llm_api_url = os.getenv('LLM_API_URL', "https://openrouter.ai/api/v1/chat/completions")
+        self.llm_http = LLMCassette.from_env()
+        self.build_cache = BuildCache.from_env()
+        # Retries often re-emit identical projects; their verdicts are memoized
+        self.compile_cache = CompileCache.from_env()
+        self._rust_version = None
+        # Timeouts, memory/CPU rlimits and output caps for cargo (see src/sandbox.py)
+        self.sandbox_limits = SandboxLimits.from_env()
+        # Fixes that turned earlier builds green, tried before asking the model again
+        self.fix_memory = FixMemory.from_env()
+        # Versions and features available in the local cargo registry, for resolvable manifests
+        self.crate_index = CrateIndex.from_env()
+        # Prebuilt manifests for common request shapes; the model then writes only src/ (see src/archetypes.py)
+        self.archetypes = ArchetypeLibrary.from_env()
 
-    def parse_files(self, content: str) -> Dict[str, str]:
-        files = {}
-        current_file = None
-        lines = []
-        
-        for line in content.splitlines():
-            if line.startswith('[FILE:') or line.startswith('[FILE: '):
-                # Start new file
-                if current_file and lines:
-                    # Remove first and last line if they contain backticks
-                    if lines[0].strip() == '```':
-                        lines.pop(0)
-                    if lines and lines[-1].strip() == '```':
-                        lines.pop()
-                    files[current_file] = '\n'.join(lines)
-                current_file = line[6:].strip().rstrip(']')
-                lines = []
-            elif line.startswith('[END FILE]'):
-                if current_file and lines:
-                    # Remove first and last line if they contain backticks
-                    if lines[0].strip() == '```':
-                        lines.pop(0)
-                    if lines and lines[-1].strip() == '```':
-                        lines.pop()
-                    files[current_file] = '\n'.join(lines)
-                current_file = None
-                lines = []
-            elif current_file:
-                lines.append(line)
-        
-        # Handle last file if exists
-        if current_file and lines:
-            if lines[0].strip() == '```':
-                lines.pop(0)
-            if lines and lines[-1].strip() == '```':
-                lines.pop()
-            files[current_file] = '\n'.join(lines)
-        
-        return files
+    @staticmethod
+    def parse_files(response: str) -> Dict[str, str]:
+        """Parse an LLM response into a file dictionary (see src/response_parser.py)"""
+        return parse_files(response)
 
     @staticmethod
-    def save_files(files: Dict[str, str], project_dir: str):
-        """Save generated files to disk"""
-        project_path = Path(project_dir)
-        project_path.mkdir(parents=True, exist_ok=True)
-        (project_path / 'src').mkdir(exist_ok=True)
-        
-        for filepath, content in files.items():
-            try:
-                full_path = project_path / filepath.strip()
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                full_path.write_text(content, encoding='utf-8')
-                logger.info(f"Wrote {filepath}")
-            except Exception as e:
-                logger.error(f"Error writing {filepath}: {e}")
-                raise
-
-    def cleanup_files(self, project_dir: str):
-        """Clean up and organize project files"""
+    def save_files(files: Dict[str, str], project_dir: str) -> Dict[str, List[str]]:
+        """Save generated files to disk, rewriting only those whose content changed"""
+        changes = write_project(files, project_dir)
+        for filepath in changes['written']:
+            logger.info(f"Wrote {filepath}")
+        return changes
+
+    def cleanup_files(self, project_dir: str, clean_manifest: bool = True):
+        """Clean up and organize project files; an archetype's manifest is left as it is"""
         project_path = Path(project_dir)
         
         try:
             # Fix Cargo.toml first
             cargo_path = project_path / 'Cargo.toml' 
-            if cargo_path.exists():
+            if cargo_path.exists() and clean_manifest:
                 content = cargo_path.read_text()
-                cleaned = clean_cargo_toml(content)
-                cargo_path.write_text(cleaned)
+                cleaned = clean_cargo_toml(content) + '\n'
+                if cleaned != content:
+                    write_project({'Cargo.toml': cleaned}, project_path, remove_stale=False)
                 
                 # Validate dependencies after cleaning
                 if not self.validate_dependencies(cargo_path):
                     logger.warning("Failed to validate dependencies")
             
-            # Clean up source files
+            # Clean up source files; only those that change are rewritten, so the rest keep their mtime
+            cleaned_sources = {}
             for path in project_path.rglob('*.rs'):
-                if path.is_file():
-                    content = path.read_text()
-                    # Remove markdown code blocks
-                    content = content.strip()
-                    content = content.removeprefix('```rust')
-                    content = content.removeprefix('```')
-                    content = content.removesuffix('```')
-                    content = content.strip()
-                    path.write_text(content)
+                relative = path.relative_to(project_path)
+                # Generated code under target/ belongs to cargo
+                if not path.is_file() or relative.parts[0] == 'target' or relative.parts[0].startswith('.'):
+                    continue
+                content = path.read_text()
+                # Remove markdown code blocks
+                cleaned = content.strip()
+                cleaned = cleaned.removeprefix('```rust')
+                cleaned = cleaned.removeprefix('```')
+                cleaned = cleaned.removesuffix('```')
+                cleaned = cleaned.strip()
+                cleaned = cleaned + '\n' if cleaned else ''
+                if cleaned != content:
+                    cleaned_sources[relative.as_posix()] = cleaned
+            if cleaned_sources:
+                write_project(cleaned_sources, project_path, remove_stale=False)
+
+            if cargo_path.exists() and self.crate_index is not None:
+                self.resolve_dependencies(project_path)
 
         except Exception as e:
             logger.error(f"Project cleanup failed: {e}")
             raise
 
+    def resolve_dependencies(self, project_path: Path) -> List[str]:
+        """Declare crates the sources use and pin every dependency to what the local registry has.
+
+        Unsatisfiable requirements and unknown features would otherwise make
+        cargo fail resolution, or go to the registry, on every attempt.
+        """
+        cargo_path = project_path / 'Cargo.toml'
+        manifest = cargo_path.read_text()
+        missing = missing_dependencies(project_path, self.crate_index)
+        resolved, changes = resolve_manifest(add_dependencies(manifest, missing) if missing else manifest,
+                                             self.crate_index)
+        changes = [f"added {name}" for name in missing] + changes
+        if changes:
+            write_project({'Cargo.toml': resolved}, project_path, remove_stale=False)
+            logger.info(f"Resolved dependencies against the local registry: {'; '.join(changes)}")
+        return changes
+
     def validate_dependencies(self, cargo_path: Path) -> bool:
         """Validate Cargo.toml dependencies and dev-dependencies"""
         if not cargo_path.exists():
@@ -153,7 +185,8 @@ class ProjectGenerator:
                     elif not (in_deps or in_dev_deps):
                         new_content.append(line)
                         
-                cargo_path.write_text('\n'.join(new_content))
+                write_project({cargo_path.name: '\n'.join(new_content) + '\n'}, cargo_path.parent,
+                              remove_stale=False)
                 
             return True
                 
@@ -161,22 +194,209 @@ class ProjectGenerator:
             logger.error(f"Failed to validate dependencies: {e}")
             return False
 
-    def generate_project(self, description: str, output_dir: str = "generated_project", max_attempts: int = 10) -> tuple[bool, str]:
-        """Generate Rust project with iterative error fixing"""
+    def rust_version(self) -> str:
+        if self._rust_version is None:
+            try:
+                self._rust_version = subprocess.run(['rustc', '--version'], capture_output=True,
+                                                    text=True, check=True).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                self._rust_version = "Unknown"
+        return self._rust_version
+
+    def verify_project(self, project_dir: str, levels=('check', 'build'), lane: int = 0,
+                       cancel: threading.Event = None) -> tuple[bool, str, str, List[Dict]]:
+        """Run cargo verification levels in order and stop at the first failure.
+
+        Returns whether every level passed, the last level run, its output and
+        diagnostics; on failure the output is the top distinct errors with
+        source snippets.
+        A tree verified before is answered from the compile cache. ``lane``
+        selects a separate shared target directory and ``cancel`` stops cargo
+        early, for verifications that run side by side.
+        """
+        key = None
+        if self.compile_cache is not None:
+            if self.build_cache is not None:
+                self.build_cache.configure(project_dir)
+            key = tree_hash(Path(project_dir), self.rust_version(), levels)
+            cached = self.compile_cache.get(key)
+            if cached is not None:
+                success, report = cached
+                return success, report['level'], report['output'], report.get('diagnostics', [])
+
+        success, level, output, status, diagnostics = self._run_levels(project_dir, levels, lane, cancel)
+        # Timeouts and resource kills depend on machine load, so they are not memoized
+        if key is not None and status in ('ok', 'failed'):
+            self.compile_cache.put(key, success, {'level': level, 'output': output,
+                                                  'diagnostics': rustc_diagnostics.compact(diagnostics)})
+        return success, level, output, diagnostics
+
+    def _run_levels(self, project_dir: str, levels, lane: int = 0,
+                    cancel: threading.Event = None) -> tuple[bool, str, str, str, List[Dict]]:
+        cargo_env = self.build_cache.cargo_env(project_dir, lane) if self.build_cache else nullcontext(None)
+        level, output = None, ""
+        with cargo_env as env:
+            for level in levels:
+                result = run_sandboxed(VERIFY_COMMANDS[level], project_dir, env, self.sandbox_limits, cancel)
+                diagnostics = rustc_diagnostics.parse_cargo_messages(result['stdout'])
+                output = rustc_diagnostics.plain_output(result['stdout'], result['stderr'])
+                if result['status'] == 'cancelled':
+                    return False, level, "cancelled", 'cancelled', []
+                if result['status'] == 'failed':
+                    return False, level, rustc_diagnostics.fix_context(
+                        diagnostics, project_dir, FIX_CONTEXT_ERRORS, fallback=output), 'failed', diagnostics
+                if result['status'] != 'ok':
+                    # Killed for time or memory: tell the model why instead of showing partial output
+                    return False, level, (f"cargo {level} was stopped ({result['status']}): the build hung or "
+                                          f"used too many resources, check build.rs and proc-macros.\n"
+                                          f"{output[-2000:]}"), result['status'], []
+        return True, level, output, 'ok', []
+
+    def prepare_project(self, code_response: str, project_dir: str, archetype: str = None) -> Dict[str, str]:
+        """Parse, save and clean up an LLM response; returns the files as written.
+
+        For an ``archetype`` only the response's ``src/`` files are used,
+        on top of the archetype's manifest and lock file.
+        """
+        files = self.parse_files(code_response)
+        if archetype:
+            files = self.archetypes.project_files(archetype, files)
+        self.save_files(files, project_dir)
+        self.cleanup_files(project_dir, clean_manifest=not archetype)
+        project_path = Path(project_dir)
+        return {path.strip(): (project_path / path.strip()).read_text() for path in files}
+
+    def generate_candidates(self, headers: Dict, messages: List[Dict], output_dir: str,
+                            count: int, archetype: str = None) -> tuple[bool, str, str, List[Dict]]:
+        """Request ``count`` candidates concurrently and keep the first that passes ``cargo check``.
+
+        Candidate ``i`` uses the ``i``-th of CANDIDATE_MODELS and
+        CANDIDATE_TEMPERATURES and is written to ``<output_dir>.candidates/i``
+        and checked in target lane ``i``, so the checks do not wait on each
+        other's cargo locks. Once one is green the others are cancelled,
+        cargo processes included, and the winner is copied to ``output_dir``
+        and verified at every level. If none is green, the candidate with the
+        shortest error report is copied there instead, for the next attempt.
+        """
+        cancel = threading.Event()
+        candidates_root = Path(f"{output_dir}.candidates")
+        pool = ThreadPoolExecutor(max_workers=count, thread_name_prefix='candidate')
+        futures = [pool.submit(self._candidate, headers, messages, str(candidates_root / str(i)), i, cancel,
+                               archetype)
+                   for i in range(count)]
+        winner, failures = None, []
+        try:
+            for future in as_completed(futures):
+                compiled, files, output, diagnostics = future.result()
+                if compiled:
+                    winner = files
+                    break
+                failures.append((output, files, diagnostics))
+        finally:
+            cancel.set()
+            # Do not wait for LLM calls still in flight; their candidates are dropped on return
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if winner is None:
+            logger.info(f"None of {count} candidates passed cargo check")
+            output, files, diagnostics = min(failures, key=lambda failure: len(failure[0]))
+            if files:
+                self.save_files(files, output_dir)
+            return False, 'check', output, diagnostics
+        logger.info(f"Candidate passed cargo check after {len(failures)} failed candidate(s)")
+        self.save_files(winner, output_dir)
+        return self.verify_project(output_dir)
+
+    def _candidate(self, headers: Dict, messages: List[Dict], project_dir: str, index: int,
+                   cancel: threading.Event, archetype: str = None) -> tuple[bool, Dict[str, str], str, List[Dict]]:
+        model = CANDIDATE_MODELS[index % len(CANDIDATE_MODELS)]
+        temperature = CANDIDATE_TEMPERATURES[index % len(CANDIDATE_TEMPERATURES)]
+        try:
+            response = self.llm_http.post(
+                self.llm_api_url,
+                headers=headers,
+                json={"model": model, "messages": messages, "temperature": temperature}
+            )
+            if response.status_code != 200:
+                return False, {}, f"API Error: {response.status_code} - {response.text}", []
+            if cancel.is_set():
+                return False, {}, "cancelled", []
+            files = self.prepare_project(response.json()['choices'][0]['message']['content'], project_dir,
+                                         archetype)
+            compiled, _, output, diagnostics = self.verify_project(project_dir, levels=('check',), lane=index,
+                                                                   cancel=cancel)
+            return compiled, files, output, diagnostics
+        except Exception as e:
+            logger.error(f"Candidate {index} ({model}, temperature {temperature}) failed: {e}")
+            return False, {}, f"Candidate generation failed: {e}", []
+
+    def apply_autofix(self, project_dir: str, result: tuple) -> tuple:
+        """Apply rustc's machine-applicable suggestions and missing dependencies, then re-verify"""
+        before = snapshot(project_dir)
+        if not autofix(project_dir, result[3], self.crate_index):
+            return result
+        retried = self.verify_project(project_dir)
+        if retried[0] or rustc_diagnostics.errors(retried[3]):
+            return retried
+        # Failing without compiler messages (an unresolvable dependency, say) is worse than before
+        write_project(before, project_dir, remove_stale=False)
+        return result
+
+    def apply_known_fixes(self, project_dir: str, result: tuple) -> tuple:
+        """Try remembered fixes for the errors in ``result`` before another LLM round.
+
+        The fixes are kept if the project then verifies or has fewer errors,
+        and reverted otherwise; returns the verification result to go on with.
+        """
+        diagnostics = result[3]
+        before = snapshot(project_dir)
+        patched, signatures = self.fix_memory.apply(before, diagnostics)
+        if not patched:
+            return result
+        logger.info(f"Trying remembered fixes for {len(signatures)} error(s) in {', '.join(patched)}")
+        write_project(patched, project_dir, remove_stale=False)
+        retried = self.verify_project(project_dir)
+        remaining = len(rustc_diagnostics.errors(retried[3]))
+        # No diagnostics at all means cargo was killed or failed outside the compiler, not progress
+        improved = retried[0] or 0 < remaining < len(rustc_diagnostics.errors(diagnostics))
+        self.fix_memory.feedback(signatures, improved)
+        if improved:
+            return retried
+        write_project({path: before[path] for path in patched}, project_dir, remove_stale=False)
+        return result
+
+    def generate_project(self, description: str, output_dir: str = "generated_project", max_attempts: int = 10,
+                         candidates: int = None) -> tuple[bool, str]:
+        """Generate Rust project with iterative error fixing.
+
+        With ``candidates`` (or BEST_OF_N) above one, every attempt requests
+        that many candidates concurrently and keeps the first that compiles.
+        A description matching an archetype starts from its prebuilt manifest
+        and asks the model for the ``src/`` files only. Context, the API key
+        and the final clippy/rustfmt analysis come from ``knowledge_base``.
+        """
+        kb = self.knowledge_base
+        candidates = candidates or BEST_OF_N
+        archetype = self.archetypes.classify(description) if self.archetypes is not None else None
+        if archetype and not self.archetypes.prepare(archetype, self.build_cache):
+            archetype = None
+        if archetype:
+            logger.info(f"Generating from the {archetype} archetype")
         try:
             attempt = 0
             last_error = None
+            failed_attempt = None
             
             while attempt < max_attempts:
                 attempt += 1
                 print(f"\nAttempt {attempt}/{max_attempts}")
                 
                 # Get relevant knowledge for context 
-                relevant_results = self.search(description, top_k=3)
+                relevant_results = kb.search(description, top_k=3)
                 kb_context = "\n".join(r['content'] for r in relevant_results)
                 
                 if not kb_context or len(kb_context.split()) < 50:
-                    web_results = self.web_search(description)
+                    web_results = kb.web_search(description)
                     web_context = "\n".join(f"From {r['url']}: {r['snippet']}" for r in web_results)
                     kb_context = f"{kb_context}\n\nAdditional context from web:\n{web_context}"
 
@@ -187,7 +407,7 @@ class ProjectGenerator:
 
                 headers = {
                     "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}",
+                    "Authorization": f"Bearer {kb.api_key}",
                     "HTTP-Referer": "http://localhost:8000", 
                     "X-Title": "Rust Code Generator"
                 }
@@ -196,7 +416,8 @@ class ProjectGenerator:
                     {"role": "system", "content": """You are an expert Rust developer specializing in project generation and error handling.
                     Generate the project in a way that is already tested to remove dependencies clash and other related issues.
                     When given compiler errors, analyze them carefully and fix the code while maintaining the original functionality."""},
-                    {"role": "user", "content": f"""
+                    {"role": "user", "content": self.archetypes.prompt(
+                        archetype, description, f"{kb_context}\n{error_context}") if archetype else f"""
                     Create a complete Rust project for: {description}
                     
                     Use these patterns and best practices:
@@ -218,54 +439,58 @@ class ProjectGenerator:
                     """}
                 ]
 
-                # Make API call
-                response = requests.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers=headers,
-                    json={
-                        "model": "deepseek/deepseek-r1-distill-llama-70b",
-                        "messages": messages
-                    }
-                )
-
-                if response.status_code == 200:
-                    code_response = response.json()['choices'][0]['message']['content']
-                    
-                    # Parse and save files
-                    files = self.project_generator.parse_files(code_response)
-                    self.project_generator.save_files(files, output_dir)
-                    
-                    # Clean up the files after saving
-                    self.project_generator.cleanup_files(output_dir)
-
-                    # First try to compile
-                    compile_result = subprocess.run(
-                        ['cargo', 'build'],
-                        cwd=output_dir,
-                        capture_output=True,
-                        text=True
+                if candidates > 1:
+                    result = self.generate_candidates(headers, messages, output_dir, candidates, archetype)
+                else:
+                    # Make API call
+                    response = self.llm_http.post(
+                        self.llm_api_url,
+                        headers=headers,
+                        json={
+                            "model": "deepseek/deepseek-r1-distill-llama-70b",
+                            "messages": messages
+                        }
                     )
+                    if response.status_code != 200:
+                        return False, f"API Error: {response.status_code} - {response.text}"
 
-                    if compile_result.returncode == 0:
-                        # If compilation succeeds, run analysis
-                        analysis_success, analysis_results = self.analyze_code(output_dir)
-                        if analysis_success and analysis_results["status"]:
-                            print(f"Project successfully generated after {attempt} attempts")
-                            return True, f"Project generated and analyzed successfully in {output_dir}"
-                        else:
-                            # Store linting errors for next iteration
-                            last_error = analysis_results.get('clippy', '') + "\n" + analysis_results.get('rustfmt', '')
-                    else:
-                        # Store compilation errors for next iteration
-                        last_error = compile_result.stderr
+                    code_response = response.json()['choices'][0]['message']['content']
+                    self.prepare_project(code_response, output_dir, archetype)
 
-                    if attempt == max_attempts:
-                        return False, f"Failed to generate error-free code after {max_attempts} attempts. Last errors:\n{last_error}"
-                    
-                    print(f"Attempt {attempt} failed. Retrying with error feedback...")
-                    continue
+                    # cargo check first; only candidates that pass it get a full build
+                    result = self.verify_project(output_dir)
+
+                # Mechanical fixes first, then remembered ones; the model only sees what is left
+                if not result[0]:
+                    result = self.apply_autofix(output_dir, result)
+                if not result[0] and self.fix_memory is not None:
+                    result = self.apply_known_fixes(output_dir, result)
+                compiled, level, compile_output, diagnostics = result
+
+                if compiled and failed_attempt is not None and self.fix_memory is not None:
+                    # Whatever turned the last failing tree green is worth remembering
+                    self.fix_memory.record(failed_attempt[1], failed_attempt[0], snapshot(output_dir))
+                failed_attempt = None if compiled else (snapshot(output_dir), diagnostics)
 
-                return False, f"API Error: {response.status_code} - {response.text}"
+                if compiled:
+                    # If compilation succeeds, run analysis
+                    analysis_success, analysis_results = kb.analyze_code(output_dir)
+                    if analysis_success and analysis_results["status"]:
+                        print(f"Project successfully generated after {attempt} attempts")
+                        return True, f"Project generated and analyzed successfully in {output_dir}"
+                    else:
+                        # Store linting errors for next iteration
+                        last_error = analysis_results.get('clippy', '') + "\n" + analysis_results.get('rustfmt', '')
+                else:
+                    # Store compilation errors for next iteration
+                    print(f"cargo {level} failed")
+                    last_error = compile_output
+
+                if attempt == max_attempts:
+                    return False, f"Failed to generate error-free code after {max_attempts} attempts. Last errors:\n{last_error}"
+                
+                print(f"Attempt {attempt} failed. Retrying with error feedback...")
+                continue
 
         except requests.exceptions.RequestException as e:
             return False, f"API request failed: {str(e)}"
@@ -307,45 +532,6 @@ def fix_dependency_line(line: str) -> str:
     # Simple version string
     return f'{package} = "{spec}"'
 
-def parse_files(response: str) -> Dict[str, str]:
-    """Parse response into file dictionary"""
-    files = {}
-    current_file = None
-    current_content = []
-    
-    # Handle potential leading/trailing code blocks
-    response = response.replace('```toml', '').replace('```rust', '')
-    response = response.replace('```markdown', '').replace('```', '')
-    
-    for line in response.strip().split('\n'):
-        line = line.strip()
-        if '[FILE:' in line:
-            # Handle previous file if exists
-            if current_file and current_content:
-                content = '\n'.join(current_content).strip()
-                files[current_file] = content
-                current_content = []
-            # Extract new filename
-            current_file = line.split('[FILE:', 1)[1].split(']')[0].strip()
-        elif '[END FILE]' in line:
-            # Save current file
-            if current_file and current_content:
-                content = '\n'.join(current_content).strip()
-                files[current_file] = content
-            current_file = None
-            current_content = []
-        elif current_file:
-            # Add non-empty content lines
-            if line and not line.startswith('```'):
-                current_content.append(line)
-    
-    # Handle last file if exists
-    if current_file and current_content:
-        content = '\n'.join(current_content).strip()
-        files[current_file] = content
-    
-    return files
-
 def clean_cargo_toml(content: str) -> str:
     """Clean and validate Cargo.toml content"""
     # Remove markdown code block markers at start and end
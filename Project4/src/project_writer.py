@@ -0,0 +1 @@
+../../Project1/src/project_writer.py
\ No newline at end of file
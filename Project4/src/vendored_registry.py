@@ -0,0 +1 @@
+../../Project1/src/vendored_registry.py
\ No newline at end of file
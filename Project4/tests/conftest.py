@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the project the way main.py does: `from src.x import y` from Project4/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+MANIFEST = '[package]\nname = "generated"\nversion = "0.1.0"\nedition = "2021"\n\n[dependencies]\n'
+
+
+def project_response(main_rs: str, manifest: str = MANIFEST) -> str:
+    """An LLM reply in the format the generation prompt asks for"""
+    return (f"Here is the project.\n\n[FILE: Cargo.toml]\n```toml\n{manifest}```\n[END FILE]\n\n"
+            f"[FILE: src/main.rs]\n```rust\n{main_rs}```\n[END FILE]\n")
+
+
+class FakeResponse:
+    def __init__(self, content: str):
+        self.status_code = 200
+        self.text = content
+
+    def json(self):
+        return {'choices': [{'message': {'content': self.text}}]}
+
+
+class FakeLLM:
+    """Stands in for the LLMCassette: answers chat completions from a list, in order"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    def post(self, url, headers=None, json=None):
+        self.requests.append(json)
+        return FakeResponse(self.replies.pop(0))
+
+    def prompt(self, index: int) -> str:
+        return self.requests[index]['messages'][-1]['content']
+
+
+class FakeKnowledgeBase:
+    """The parts of main.RustKnowledgeBase the generation loop uses, without Qdrant or embeddings"""
+    api_key = 'test-key'
+
+    def __init__(self, lint_clean: bool = True):
+        self.lint_clean = lint_clean
+        self.analyzed = []
+
+    def search(self, query, top_k=3):
+        return [{'content': 'Prefer std and small functions. ' * 10}]
+
+    def web_search(self, query, num_results=3):
+        return []
+
+    def analyze_code(self, project_dir):
+        self.analyzed.append(project_dir)
+        return True, {'clippy': '', 'rustfmt': '', 'status': self.lint_clean}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in a scratch directory, with caches there and nothing shared with the host"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BUILD_CACHE', 'off')
+    monkeypatch.setenv('COMPILE_CACHE', 'off')
+    monkeypatch.setenv('ARCHETYPES', 'off')
+    monkeypatch.setenv('VENDOR_REGISTRY', 'off')
+    monkeypatch.setenv('CRATE_INDEX', 'off')
+    monkeypatch.setenv('FIX_MEMORY_DB', str(tmp_path / 'fix_memory.db'))
+    monkeypatch.setenv('CARGO_NET_OFFLINE', 'true')
+    return tmp_path
+
+
+@pytest.fixture
+def make_generator(workdir):
+    """ProjectGenerator wired to a knowledge base and an LLM replying with ``replies``"""
+    from src.project_generator import ProjectGenerator
+
+    def make(replies, knowledge_base=None):
+        generator = ProjectGenerator(knowledge_base=knowledge_base or FakeKnowledgeBase())
+        generator.llm_http = FakeLLM(replies)
+        return generator
+    return make
@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import MANIFEST
+from src.archetypes import ARCHETYPES, FAILED_MARKER, ArchetypeLibrary, classify
+
+
+@pytest.mark.parametrize('description', [
+    'Dijkstra shortest route finder',
+    'an async web scraper using reqwest',
+    'a JavaScript-free terminal game',
+    'a CLI that downloads pages with reqwest',
+    'a CLI library for colored output',
+])
+def test_classify_is_none_when_unsure(description):
+    assert classify(description) is None
+
+
+@pytest.mark.parametrize('description, archetype', [
+    ('a library for computing shortest routes in a graph', 'library'),
+    ('a REST API for a todo list with axum', 'axum-service'),
+    ('an HTTP server exposing a health endpoint', 'axum-service'),
+    ('a WebAssembly module that resizes images in the browser', 'wasm-module'),
+    ('a command-line tool that counts lines in files', 'tokio-cli'),
+    ('a tokio CLI that tails a log file with arguments for the path', 'tokio-cli'),
+])
+def test_classify_picks_a_clear_match(description, archetype):
+    assert classify(description) == archetype
+
+
+@pytest.fixture
+def library(workdir, monkeypatch):
+    monkeypatch.setitem(ARCHETYPES, 'plain', {'manifest': MANIFEST, 'stub': {'src/main.rs': 'fn main() {}\n'}})
+    # Offline, a dependency nobody has vendored cannot be locked
+    monkeypatch.setitem(ARCHETYPES, 'broken', {'manifest': MANIFEST + 'no-such-crate-here = "1"\n',
+                                               'stub': {'src/main.rs': 'fn main() {}\n'}})
+    return ArchetypeLibrary(workdir / 'archetypes')
+
+
+def test_prepare_builds_in_the_background(library):
+    assert not library.prepare('plain')
+    # Joins the prebuild already running rather than starting another
+    assert library.prepare('plain', wait=True)
+
+    assert library.prepare('plain')
+    assert (library.workspace('plain') / 'Cargo.lock').is_file()
+
+
+def test_failed_prebuild_is_not_retried_by_generation(library):
+    assert not library.prepare('broken', wait=True)
+    assert (library.workspace('broken') / FAILED_MARKER).is_file()
+
+    assert not library.prepare('broken')
+    assert 'broken' not in library._building
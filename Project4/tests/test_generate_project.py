@@ -0,0 +1,104 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import MANIFEST, FakeKnowledgeBase, FakeLLM, project_response
+
+HELLO = 'fn main() {\n    println!("Hello, world!");\n}\n'
+UNDEFINED_CALL = 'fn main() {\n    greet();\n}\n'
+
+
+def test_generate_project_retries_with_compiler_errors(make_generator):
+    knowledge_base = FakeKnowledgeBase()
+    generator = make_generator([project_response(UNDEFINED_CALL), project_response(HELLO)], knowledge_base)
+
+    success, message = generator.generate_project('print a greeting', max_attempts=3)
+
+    assert success, message
+    assert len(generator.llm_http.requests) == 2
+    assert 'Prefer std and small functions' in generator.llm_http.prompt(0)
+    assert 'greet' in generator.llm_http.prompt(1)
+    assert knowledge_base.analyzed == ['generated_project']
+    assert Path('generated_project/src/main.rs').read_text() == HELLO
+
+
+def test_generate_project_gives_up_after_max_attempts(make_generator):
+    generator = make_generator([project_response(UNDEFINED_CALL)] * 2)
+
+    success, message = generator.generate_project('print a greeting', max_attempts=2)
+
+    assert not success
+    assert 'after 2 attempts' in message
+    assert len(generator.llm_http.requests) == 2
+
+
+def test_knowledge_base_generate_project_runs_the_generation_loop(workdir):
+    for module in ('sentence_transformers', 'sklearn', 'qdrant_client', 'bs4'):
+        pytest.importorskip(module)
+    from main import RustKnowledgeBase
+    from src.project_generator import ProjectGenerator
+    from src.sandbox import SandboxLimits
+
+    # Everything but Qdrant and the embedding model, which generation does not need
+    kb = RustKnowledgeBase.__new__(RustKnowledgeBase)
+    kb.api_key = 'test-key'
+    kb.build_cache = None
+    kb.sandbox_limits = SandboxLimits()
+    kb.search = FakeKnowledgeBase().search
+    kb.project_generator = ProjectGenerator(knowledge_base=kb)
+    kb.project_generator.llm_http = FakeLLM([project_response(UNDEFINED_CALL), project_response(HELLO)])
+
+    success, message = kb.generate_project('print a greeting')
+
+    assert success, message
+    assert len(kb.project_generator.llm_http.requests) == 2
+
+MISSING_IMPORT = ('fn main() {\n    let mut counts = HashMap::new();\n    counts.insert("a", 1);\n'
+                  '    println!("{:?}", counts);\n}\n')
+WITH_IMPORT = 'use std::collections::HashMap;\n\n' + MISSING_IMPORT
+
+
+def test_generate_project_reuses_a_remembered_fix(make_generator):
+    first = make_generator([project_response(MISSING_IMPORT), project_response(WITH_IMPORT)])
+    assert first.generate_project('count words', max_attempts=2)[0]
+    assert first.fix_memory.stats['recorded'] == 1
+
+    # Same mistake in a later session: fixed from memory, without a second LLM round
+    second = make_generator([project_response(MISSING_IMPORT)])
+    success, message = second.generate_project('count words', output_dir='again', max_attempts=1)
+
+    assert success, message
+    assert len(second.llm_http.requests) == 1
+    assert second.fix_memory.stats['applied'] == 1
+    assert Path('again/src/main.rs').read_text().startswith('use std::collections::HashMap;')
+
+BORROW_MISSING = ('fn count(text: &String) -> usize {\n    text.len()\n}\n\n'
+                  'fn main() {\n    let text = String::from("hello");\n    println!("{}", count(text));\n}\n')
+
+
+def test_generate_project_applies_compiler_suggestions_before_asking_again(make_generator):
+    generator = make_generator([project_response(BORROW_MISSING)])
+
+    success, message = generator.generate_project('count characters', max_attempts=1)
+
+    assert success, message
+    assert len(generator.llm_http.requests) == 1
+    assert generator.fix_memory.stats['applied'] == 0
+    assert 'count(&text)' in Path('generated_project/src/main.rs').read_text()
+
+
+def test_generate_project_pins_the_manifest_to_the_local_registry(make_generator, workdir, monkeypatch):
+    # A cargo registry that has only serde 1.0.200, unpacked, with a "derive" feature
+    source = workdir / 'registry' / 'src' / 'index.crates.io-0000000000000000' / 'serde-1.0.200'
+    source.mkdir(parents=True)
+    (source / 'Cargo.toml').write_text('[package]\nname = "serde"\nversion = "1.0.200"\n\n'
+                                       '[features]\nderive = []\nstd = []\n')
+    monkeypatch.setenv('CRATE_INDEX', 'on')
+    monkeypatch.setenv('CRATE_INDEX_REGISTRY', str(workdir / 'registry'))
+    manifest = MANIFEST + 'serde = { version = "9", features = ["derive", "rc"] }\n'
+    generator = make_generator([project_response(HELLO, manifest)])
+
+    generator.generate_project('print a greeting', max_attempts=1)
+
+    assert Path('generated_project/Cargo.toml').read_text().endswith(
+        '[dependencies]\nserde = { version = "1.0.200", features = ["derive"] }\n')
@@ -0,0 +1,60 @@
+import json
+import subprocess
+
+import pytest
+
+from conftest import MANIFEST
+from src.build_cache import BuildCache
+from src.vendored_registry import VendoredRegistry
+
+
+@pytest.fixture
+def registry(workdir):
+    """A vendored registry holding one local crate, foo 1.0.0"""
+    crate = workdir / 'vendor' / 'crates' / 'foo-1.0.0'
+    (crate / 'src').mkdir(parents=True)
+    (crate / 'Cargo.toml').write_text('[package]\nname = "foo"\nversion = "1.0.0"\nedition = "2021"\n')
+    (crate / 'src' / 'lib.rs').write_text('pub fn answer() -> u32 {\n    42\n}\n')
+    (crate / '.cargo-checksum.json').write_text(json.dumps({'files': {}, 'package': None}))
+    return VendoredRegistry(workdir / 'vendor')
+
+
+def make_project(path, dependency):
+    (path / 'src').mkdir(parents=True, exist_ok=True)
+    (path / 'Cargo.toml').write_text(MANIFEST + dependency + '\n')
+    (path / 'src' / 'main.rs').write_text('fn main() {\n    println!("{}", foo::answer());\n}\n')
+    return path
+
+
+def test_registry_is_opt_in(registry, monkeypatch):
+    monkeypatch.delenv('VENDOR_REGISTRY')
+    monkeypatch.setenv('VENDOR_REGISTRY_DIR', str(registry.root))
+    assert VendoredRegistry.from_env() is None
+    monkeypatch.setenv('VENDOR_REGISTRY', 'on')
+    assert VendoredRegistry.from_env().root == registry.root
+
+
+def test_projects_the_vendored_crates_do_not_cover_use_the_normal_registry(registry, workdir):
+    project = make_project(workdir / 'project', 'foo = "1"')
+    config = project / '.cargo' / 'config.toml'
+    assert registry.configure(project)
+    assert config.read_text() == registry.config_text()
+
+    for dependency in ('foo = "2"', 'bar = "1"'):
+        make_project(project, dependency)
+        assert not registry.configure(project)
+        assert not config.exists()
+
+
+def test_seeded_target_dir_keeps_dependencies_fresh(registry, workdir):
+    registry._write_seed({'foo': '"1"'})
+    registry.warm()
+    build_cache = BuildCache(root=workdir / 'cargo-target', use_sccache=False, vendor=registry)
+    project = make_project(workdir / 'project', 'foo = "1"')
+
+    with build_cache.cargo_env(project) as env:
+        result = subprocess.run(['cargo', 'build', '-v'], cwd=project, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert 'Fresh foo v1.0.0' in result.stderr
+    assert 'Compiling foo' not in result.stderr